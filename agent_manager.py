@@ -6,11 +6,25 @@ Manages multiple domain-specific agents, each with:
 - A knowledge base Markdown file for Q&A
 """
 
+import asyncio
 import os
+import re
+import json
+import time
+import hashlib
+import threading
 import yaml
 from pathlib import Path
-from dataclasses import dataclass
-from cerebras.cloud.sdk import Cerebras
+from dataclasses import dataclass, field
+from typing import AsyncIterator, Iterator
+from cerebras.cloud.sdk import AsyncCerebras, Cerebras
+
+from answer_cache import AnswerCache, get_answer_cache
+from knowledge_index import KnowledgeIndex, RetrievalResult, estimate_tokens
+from semantic_cache import SemanticCache, get_semantic_cache
+from term_snapper import Replacement, TermSnapper, SnapResult, DEFAULT_THRESHOLD
+from transcription import AsrProfile, AsrStats, Transcript
+from vocab_bias import DecodingBias, build_bias
 
 
 AGENTS_DIR = Path(__file__).parent / "agents"
@@ -25,6 +39,25 @@ class AgentConfig:
     terms_file: str
     knowledge_file: str
     folder: Path
+    retrieval_top_k: int = 6
+    retrieval_token_budget: int = 1500
+    snap_threshold: float = DEFAULT_THRESHOLD
+    semantic_cache_threshold: float = 0.8
+    asr: AsrProfile = field(default_factory=AsrProfile)
+    # Whisper word probability below which a word goes to the LLM (0 = off)
+    word_confidence_threshold: float = 0.0
+    correction_context_words: int = 2
+    _index: KnowledgeIndex | None = field(default=None, init=False, repr=False, compare=False)
+    _snapper: TermSnapper | None = field(default=None, init=False, repr=False, compare=False)
+    _bias: DecodingBias | None = field(default=None, init=False, repr=False, compare=False)
+    
+    @property
+    def agent_id(self) -> str:
+        return self.folder.name
+    
+    @property
+    def config_path(self) -> Path:
+        return self.folder / "config.yaml"
     
     @property
     def terms_path(self) -> Path:
@@ -45,14 +78,68 @@ class AgentConfig:
         if self.knowledge_path.exists():
             return self.knowledge_path.read_text(encoding="utf-8")
         return ""
+    
+    def file_mtimes(self) -> tuple[int, ...]:
+        """Modification times (ns) of the config, terms and knowledge files; 0 if missing."""
+        return tuple(p.stat().st_mtime_ns if p.exists() else 0
+                     for p in (self.config_path, self.terms_path, self.knowledge_path))
+    
+    def content_hash(self) -> str:
+        """Hash of the config, terms and knowledge file contents."""
+        digest = hashlib.sha256()
+        for path in (self.config_path, self.terms_path, self.knowledge_path):
+            digest.update(path.read_bytes() if path.exists() else b"")
+            digest.update(b"\0")
+        return digest.hexdigest()
+    
+    def build_index(self) -> KnowledgeIndex:
+        """(Re)build the retrieval index over the knowledge base."""
+        self._index = KnowledgeIndex.from_markdown(self.load_knowledge())
+        return self._index
+    
+    @property
+    def knowledge_index(self) -> KnowledgeIndex:
+        """Retrieval index over the knowledge base, built on first use."""
+        if self._index is None:
+            self.build_index()
+        return self._index
+    
+    def build_snapper(self) -> TermSnapper:
+        """(Re)build the local term snapper from the terms YAML."""
+        self._snapper = TermSnapper.from_yaml(self.load_terms(), threshold=self.snap_threshold)
+        return self._snapper
+    
+    @property
+    def term_snapper(self) -> TermSnapper:
+        """Local phonetic/trigram term corrector, built on first use."""
+        if self._snapper is None:
+            self.build_snapper()
+        return self._snapper
+    
+    def build_bias(self) -> DecodingBias:
+        """(Re)build the Whisper vocabulary bias from the terms and knowledge base."""
+        self._bias = build_bias(self.term_snapper.terms, self.load_knowledge(), self.asr.bias_tokens)
+        return self._bias
+    
+    @property
+    def decoding_bias(self) -> DecodingBias:
+        """Ranked, token-budgeted terms for Whisper's prompt, built on first use."""
+        if self._bias is None:
+            self.build_bias()
+        return self._bias
 
 
 class AgentManager:
     """Manages loading and accessing domain-specific agents."""
     
-    def __init__(self, agents_dir: Path = AGENTS_DIR):
+    def __init__(self, agents_dir: Path = AGENTS_DIR, base_url: str | None = None):
         self.agents_dir = agents_dir
+        # Chat-completions endpoint for every DomainAgent (e.g. a local mock server)
+        self.base_url = base_url
         self._agents: dict[str, AgentConfig] = {}
+        # agent_id -> (file mtimes, content hash, DomainAgent)
+        self._domain_agents: dict[str, tuple[tuple[int, ...], str, DomainAgent]] = {}
+        self._cache_lock = threading.Lock()
         self._load_agents()
     
     def _load_agents(self):
@@ -63,23 +150,37 @@ class AgentManager:
         
         for folder in self.agents_dir.iterdir():
             if folder.is_dir():
-                config_path = folder / "config.yaml"
-                if config_path.exists():
-                    try:
-                        with open(config_path, "r") as f:
-                            config_data = yaml.safe_load(f)
-                        
-                        agent = AgentConfig(
-                            name=config_data.get("name", folder.name),
-                            description=config_data.get("description", ""),
-                            icon=config_data.get("icon", "🤖"),
-                            terms_file=config_data.get("terms_file", "terms.yaml"),
-                            knowledge_file=config_data.get("knowledge_file", "knowledge.md"),
-                            folder=folder
-                        )
-                        self._agents[folder.name] = agent
-                    except Exception as e:
-                        print(f"Error loading agent {folder.name}: {e}")
+                agent = self._load_agent(folder)
+                if agent:
+                    self._agents[folder.name] = agent
+    
+    def _load_agent(self, folder: Path) -> AgentConfig | None:
+        """Load a single agent config from its folder."""
+        config_path = folder / "config.yaml"
+        if not config_path.exists():
+            return None
+        try:
+            with open(config_path, "r") as f:
+                config_data = yaml.safe_load(f)
+            
+            return AgentConfig(
+                name=config_data.get("name", folder.name),
+                description=config_data.get("description", ""),
+                icon=config_data.get("icon", "🤖"),
+                terms_file=config_data.get("terms_file", "terms.yaml"),
+                knowledge_file=config_data.get("knowledge_file", "knowledge.md"),
+                folder=folder,
+                retrieval_top_k=config_data.get("retrieval_top_k", 6),
+                retrieval_token_budget=config_data.get("retrieval_token_budget", 1500),
+                snap_threshold=config_data.get("snap_threshold", DEFAULT_THRESHOLD),
+                semantic_cache_threshold=config_data.get("semantic_cache_threshold", 0.8),
+                asr=AsrProfile.from_dict(config_data.get("asr")),
+                word_confidence_threshold=config_data.get("word_confidence_threshold", 0.0),
+                correction_context_words=config_data.get("correction_context_words", 2)
+            )
+        except Exception as e:
+            print(f"Error loading agent {folder.name}: {e}")
+            return None
     
     def list_agents(self) -> list[AgentConfig]:
         """Return list of all available agents."""
@@ -130,13 +231,212 @@ class AgentManager:
             folder=agent_folder
         )
         self._agents[agent_id] = agent
+        self._domain_agents.pop(agent_id, None)
         
         return agent
     
+    def get_domain_agent(self, agent_id: str, api_key: str | None = None) -> "DomainAgent":
+        """
+        Get a cached DomainAgent, rebuilding it only when its files changed.
+        
+        Files are re-hashed only when an mtime changes, so touching a file
+        without editing it keeps the warm instance. All cached agents share
+        one pooled Cerebras client.
+        """
+        with self._cache_lock:
+            cached = self._domain_agents.get(agent_id)
+            config = cached[2].config if cached else self.get_agent(agent_id)
+            if config is None:
+                raise KeyError(f"Unknown agent: {agent_id}")
+            
+            mtimes = config.file_mtimes()
+            if cached and cached[0] == mtimes:
+                return cached[2]
+            
+            content_hash = config.content_hash()
+            if cached and cached[1] == content_hash:
+                self._domain_agents[agent_id] = (mtimes, content_hash, cached[2])
+                return cached[2]
+            
+            if cached:
+                # Files changed: reload the config so index and snapper are rebuilt
+                config = self._load_agent(config.folder) or config
+                self._agents[agent_id] = config
+            agent = DomainAgent(config, api_key=api_key, base_url=self.base_url)
+            self._domain_agents[agent_id] = (mtimes, content_hash, agent)
+            return agent
+    
     def refresh(self):
         """Reload all agents from disk."""
-        self._agents.clear()
-        self._load_agents()
+        with self._cache_lock:
+            self._agents.clear()
+            self._domain_agents.clear()
+            self._load_agents()
+
+
+def accept_correction(raw_text: str, corrected: str) -> str:
+    """Safety check: reject corrections that grew or shrank implausibly."""
+    if len(corrected) > len(raw_text) * 3 or len(corrected) < len(raw_text) * 0.3:
+        return raw_text
+    return corrected
+
+
+def _apply_replacements(text: str, replacements: list[Replacement], start: int, end: int) -> str:
+    """`text[start:end]` with the snapped replacements that fall inside it applied."""
+    out, pos = [], start
+    for r in replacements:
+        if r.start >= start and r.end <= end:
+            out.append(text[pos:r.start])
+            out.append(r.canonical)
+            pos = r.end
+    out.append(text[pos:end])
+    return "".join(out)
+
+
+def _widen_spans(spans: list[tuple[int, int]], snapped: SnapResult) -> list[tuple[int, int]]:
+    """Grow spans so no snapped or uncertain term is cut in half, then merge."""
+    terms = snapped.replacements + snapped.uncertain
+    merged: list[tuple[int, int]] = []
+    for start, end in spans:
+        for r in terms:
+            if r.start < end and r.end > start:
+                start, end = min(start, r.start), max(end, r.end)
+        if merged and start <= merged[-1][1]:
+            merged[-1] = (merged[-1][0], max(end, merged[-1][1]))
+        else:
+            merged.append((start, end))
+    return merged
+
+
+def parse_json_response(content: str) -> dict | None:
+    """
+    Parse a JSON object from an LLM response.
+    
+    Tolerates Markdown code fences and prose around the object.
+    Returns None when no valid JSON object can be recovered.
+    """
+    if not content:
+        return None
+    text = re.sub(r"^```(?:json)?\s*|\s*```$", "", content.strip())
+    candidates = [text]
+    start, end = text.find("{"), text.rfind("}")
+    if start != -1 and end > start:
+        candidates.append(text[start:end + 1])
+    for candidate in candidates:
+        try:
+            data = json.loads(candidate)
+        except ValueError:
+            continue
+        if isinstance(data, dict):
+            return data
+    return None
+
+
+@dataclass
+class AnswerStats:
+    """Per-call accounting for a DomainAgent answer."""
+    chunk_count: int = 0
+    total_chunks: int = 0
+    prompt_chars: int = 0
+    prompt_tokens: int = 0
+    ttft_s: float | None = None
+    total_s: float = 0.0
+    completion_tokens: int = 0
+    cache_hit: bool = False
+    # Set when the returned text is an error message rather than an answer
+    error: str | None = None
+    # Why correct_and_answer fell back to separate correction and answer calls
+    fallback: str | None = None
+    # With fallback: time and prompt size of the combined attempt that failed
+    combined_s: float = 0.0
+    combined_prompt_chars: int = 0
+    
+    @property
+    def tokens_per_s(self) -> float:
+        """Generation rate after the first token arrived."""
+        gen_time = self.total_s - (self.ttft_s or 0.0)
+        if self.completion_tokens and gen_time > 0:
+            return self.completion_tokens / gen_time
+        return 0.0
+
+
+def stream_chat_completion(client: Cerebras, model: str, messages: list[dict],
+                           stats: AnswerStats) -> Iterator[str]:
+    """
+    Yield text deltas from a streaming chat completion.
+    
+    Time-to-first-token, total time and completion tokens are written to
+    `stats` as the stream is consumed.
+    """
+    start = time.perf_counter()
+    chunks = 0
+    stream = client.chat.completions.create(model=model, messages=messages, stream=True)
+    try:
+        for chunk in stream:
+            usage = getattr(chunk, "usage", None)
+            if usage and usage.completion_tokens:
+                stats.completion_tokens = usage.completion_tokens
+            if not chunk.choices:
+                continue
+            delta = chunk.choices[0].delta
+            text = delta.content if delta else None
+            if text:
+                if stats.ttft_s is None:
+                    stats.ttft_s = time.perf_counter() - start
+                chunks += 1
+                yield text
+    finally:
+        # Abandoning the generator early (e.g. a cancelled request) drops the connection
+        if hasattr(stream, "close"):
+            stream.close()
+        stats.total_s = time.perf_counter() - start
+        # Servers that don't report usage send roughly one token per chunk
+        if not stats.completion_tokens:
+            stats.completion_tokens = chunks
+
+
+@dataclass
+class CorrectionPlan:
+    """
+    How one transcript will be corrected.
+
+    `spans` are the character ranges of the raw transcript to send to the
+    LLM: the low-confidence words plus the terms the snapper was unsure of.
+    None means there are no word confidences, and the whole (snapped)
+    transcript is sent if any term is uncertain.
+    """
+    snapped: SnapResult
+    spans: list[tuple[int, int]] | None = None
+    # Whisper was sure of every word (the snapper may still be unsure of a term)
+    asr_confident: bool = False
+    # Set when the LLM call failed and the snapped text was used instead
+    error: str | None = None
+
+    @property
+    def needs_llm(self) -> bool:
+        if self.spans is not None:
+            return bool(self.spans)
+        return not self.snapped.confident
+
+
+@dataclass
+class CorrectionStats:
+    """How often local snapping or ASR confidence made the LLM correction call unnecessary."""
+    skipped: int = 0
+    llm_calls: int = 0
+    # Of skipped: Whisper was confident in every word
+    asr_confident: int = 0
+    # Of llm_calls: only low-confidence spans were sent
+    span_calls: int = 0
+    prompt_chars: int = 0
+    
+    @property
+    def total(self) -> int:
+        return self.skipped + self.llm_calls
+    
+    @property
+    def skip_rate(self) -> float:
+        return self.skipped / self.total if self.total else 0.0
 
 
 class DomainAgent:
@@ -144,19 +444,79 @@ class DomainAgent:
     An LLM-powered agent that uses domain-specific terms and knowledge.
     """
     
-    def __init__(self, config: AgentConfig, api_key: str | None = None):
+    def __init__(self, config: AgentConfig, api_key: str | None = None,
+                 client: Cerebras | None = None, cache: AnswerCache | None = None,
+                 semantic_cache: SemanticCache | None = None, base_url: str | None = None):
         self.config = config
         self.api_key = api_key or os.environ.get("CEREBRAS_API_KEY")
         if not self.api_key:
             raise ValueError("Cerebras API key is required")
+        self.base_url = base_url or os.environ.get("CEREBRAS_BASE_URL")
         
-        self.client = Cerebras(api_key=self.api_key)
+        self.client = client or get_cerebras_client(self.api_key, self.base_url)
+        self._async_client = None
         self.model = "llama-3.3-70b"
-        self._knowledge = config.load_knowledge()
         self._terms = config.load_terms()
+        self.cache = cache if cache is not None else get_answer_cache()
+        self.semantic_cache = semantic_cache if semantic_cache is not None else get_semantic_cache()
+        self.content_hash = config.content_hash()
+        # Entries written against older knowledge/terms can never be served again
+        self.cache.invalidate(config.agent_id, self.content_hash)
+        # Cached instances are shared across sessions; per-call results are per thread
+        self._local = threading.local()
+        self.correction_stats = CorrectionStats()
+        self._stats_lock = threading.Lock()
+        # Transcriptions made with this agent's ASR profile (cascade escalations, latency)
+        self.asr_stats = AsrStats()
     
-    def get_correction_prompt(self) -> str:
-        """Generate the correction system prompt using domain terms."""
+    @property
+    def async_client(self) -> AsyncCerebras:
+        """Shared async Cerebras client, created on first use."""
+        if self._async_client is None:
+            self._async_client = get_async_cerebras_client(self.api_key, self.base_url)
+        return self._async_client
+    
+    @property
+    def last_stats(self) -> AnswerStats:
+        """Stats for the most recent answer made from the current thread."""
+        if not hasattr(self._local, "stats"):
+            self._local.stats = AnswerStats()
+        return self._local.stats
+    
+    @last_stats.setter
+    def last_stats(self, stats: AnswerStats):
+        self._local.stats = stats
+    
+    @property
+    def last_snap(self) -> SnapResult | None:
+        """Local term snapping result of the most recent correction in this thread."""
+        return getattr(self._local, "snap", None)
+    
+    @last_snap.setter
+    def last_snap(self, snap: SnapResult | None):
+        self._local.snap = snap
+    
+    @property
+    def last_plan(self) -> CorrectionPlan | None:
+        """Correction plan of the most recent correction in this thread."""
+        return getattr(self._local, "plan", None)
+    
+    @last_plan.setter
+    def last_plan(self, plan: CorrectionPlan | None):
+        self._local.plan = plan
+    
+    def get_correction_prompt(self, terms: str | None = None, fragments: bool = False) -> str:
+        """
+        Generate the correction system prompt using domain terms.
+        
+        `terms` replaces the full terms YAML (e.g. with just the candidates for
+        a few fragments); `fragments` asks for a JSON map of numbered fragments.
+        """
+        if fragments:
+            output = ('Respond with ONLY a JSON object mapping each fragment number to its corrected text, '
+                      'e.g. {"1": "..."}. If unsure, return the fragment unchanged.')
+        else:
+            output = "Return ONLY the corrected text. If unsure, return the original with minimal changes."
         return f"""You are a conservative terminology corrector for {self.config.name}.
 
 IMPORTANT RULES:
@@ -167,63 +527,500 @@ IMPORTANT RULES:
 5. Preserve the original question structure
 
 KNOWN DOMAIN TERMS (from semantic model):
-{self._terms}
+{self._terms if terms is None else terms}
 
-Return ONLY the corrected text. If unsure, return the original with minimal changes."""
+{output}"""
+    
+    def correct_transcript(self, raw_text: str, transcript: Transcript | None = None) -> str:
+        """
+        Correct transcript using domain-specific terms.
+        
+        Misheard terms are snapped locally first; the LLM is only asked when
+        some span looks like a domain term but isn't a confident match. With
+        Whisper's word confidences (`transcript`), low-confidence words are
+        also sent, and only those words and uncertain terms (with a little
+        context) go to the LLM rather than the whole transcript.
+        """
+        plan = self.plan_correction(raw_text, transcript)
+        if not plan.needs_llm:
+            return plan.snapped.text
+        return self.correct_with_plan(raw_text, plan)
+    
+    def plan_correction(self, raw_text: str, transcript: Transcript | None = None,
+                        record: bool = True) -> CorrectionPlan:
+        """
+        Snap domain terms locally and decide what, if anything, the LLM must see.
+        
+        With `record=False` the caller counts the plan in correction_stats itself.
+        """
+        snapped = self.config.term_snapper.snap(raw_text)
+        self.last_snap = snapped
+        plan = CorrectionPlan(snapped)
+        threshold = self.config.word_confidence_threshold
+        # Word offsets only line up with the exact text Whisper produced
+        if threshold and transcript is not None and transcript.text == raw_text:
+            uncertain = [(r.start, r.end) for r in snapped.uncertain]
+            spans = transcript.low_confidence_spans(threshold, self.config.correction_context_words, uncertain)
+            if spans is not None:
+                plan.spans = _widen_spans(spans, snapped)
+                plan.asr_confident = transcript.is_confident(threshold)
+        self.last_plan = plan
+        if record:
+            self._record_plan(plan, plan.needs_llm)
+        return plan
+    
+    def _record_plan(self, plan: CorrectionPlan, llm_call: bool):
+        with self._stats_lock:
+            if llm_call:
+                self.correction_stats.llm_calls += 1
+                self.correction_stats.span_calls += plan.spans is not None
+            else:
+                self.correction_stats.skipped += 1
+                self.correction_stats.asr_confident += plan.asr_confident
+    
+    def build_correction_messages(self, raw_text: str) -> list[dict]:
+        """Build the LLM correction request for a transcript."""
+        return [
+            {"role": "system", "content": self.get_correction_prompt()},
+            {"role": "user", "content": f"Correct this transcript (be conservative): {raw_text}"},
+        ]
+    
+    def build_fragment_messages(self, fragments: list[str], plan: CorrectionPlan) -> list[dict]:
+        """
+        Build the LLM correction request for low-confidence fragments only.
+        
+        The prompt lists just the domain terms the fragments resemble rather
+        than the whole terms file.
+        """
+        terms = self.config.term_snapper.candidates(" ".join(fragments))
+        for r in plan.snapped.uncertain:
+            if r.canonical not in terms:
+                terms.append(r.canonical)
+        numbered = "\n".join(f"{i}. {fragment}" for i, fragment in enumerate(fragments, 1))
+        return [
+            {"role": "system", "content": self.get_correction_prompt(
+                terms="\n".join(f"- {t}" for t in terms) if terms else None, fragments=True)},
+            {"role": "user", "content": f"Correct these transcript fragments (be conservative):\n{numbered}"},
+        ]
+    
+    def _plan_request(self, raw_text: str, plan: CorrectionPlan) -> tuple[dict, list[str]]:
+        """Chat-completion arguments for a plan, and the snapped fragments they ask about."""
+        request = {"model": self.model}
+        if plan.spans is None:
+            request["messages"] = self.build_correction_messages(plan.snapped.text)
+            fragments = [plan.snapped.text]
+        else:
+            fragments = [_apply_replacements(raw_text, plan.snapped.replacements, start, end)
+                         for start, end in plan.spans]
+            request["messages"] = self.build_fragment_messages(fragments, plan)
+            request["response_format"] = {"type": "json_object"}
+        with self._stats_lock:
+            self.correction_stats.prompt_chars += sum(len(m["content"]) for m in request["messages"])
+        return request, fragments
+    
+    def _merge_fragments(self, raw_text: str, plan: CorrectionPlan, fragments: list[str],
+                         content: str | None) -> str:
+        """Splice corrected fragments back into the snapped transcript."""
+        data = parse_json_response(content) if content else None
+        if data is None:
+            plan.error = "invalid fragment response"
+        out, pos = [], 0
+        for i, (start, end) in enumerate(plan.spans):
+            out.append(_apply_replacements(raw_text, plan.snapped.replacements, pos, start))
+            fixed = data.get(str(i + 1)) if data else None
+            if isinstance(fixed, str) and fixed.strip():
+                out.append(accept_correction(fragments[i], fixed.strip()))
+            else:
+                out.append(fragments[i])
+            pos = end
+        out.append(_apply_replacements(raw_text, plan.snapped.replacements, pos, len(raw_text)))
+        return "".join(out)
     
-    def correct_transcript(self, raw_text: str) -> str:
-        """Correct transcript using domain-specific terms."""
+    def _apply_plan_response(self, raw_text: str, plan: CorrectionPlan, fragments: list[str],
+                             response) -> str:
+        content = None
+        if response.choices and response.choices[0].message:
+            content = response.choices[0].message.content
+        if plan.spans is not None:
+            return self._merge_fragments(raw_text, plan, fragments, content)
+        if content is None:
+            plan.error = "empty response"
+            return plan.snapped.text
+        return accept_correction(plan.snapped.text, content.strip())
+    
+    def correct_with_plan(self, raw_text: str, plan: CorrectionPlan) -> str:
+        """Run the LLM part of a correction plan; falls back to the snapped text on failure."""
+        request, fragments = self._plan_request(raw_text, plan)
+        try:
+            response = self.client.chat.completions.create(**request)
+            return self._apply_plan_response(raw_text, plan, fragments, response)
+        except Exception as e:
+            plan.error = str(e)
+            return plan.snapped.text
+    
+    def correct_with_llm(self, raw_text: str) -> str:
+        """Correct transcript with the LLM using domain-specific terms."""
         try:
             response = self.client.chat.completions.create(
                 model=self.model,
-                messages=[
-                    {"role": "system", "content": self.get_correction_prompt()},
-                    {"role": "user", "content": f"Correct this transcript (be conservative): {raw_text}"},
-                ],
+                messages=self.build_correction_messages(raw_text),
             )
             if response.choices and response.choices[0].message:
-                result = response.choices[0].message.content.strip()
-                # Safety check
-                if len(result) > len(raw_text) * 3 or len(result) < len(raw_text) * 0.3:
-                    return raw_text
-                return result
+                return accept_correction(raw_text, response.choices[0].message.content.strip())
             return raw_text
         except:
             return raw_text
     
-    def answer(self, question: str) -> str:
-        """Answer a question using the domain knowledge base."""
-        system_prompt = f"""You are a helpful {self.config.name} expert assistant.
+    def retrieve(self, question: str) -> RetrievalResult:
+        """Select the knowledge base chunks most relevant to the question."""
+        return self.config.knowledge_index.search(
+            question,
+            top_k=self.config.retrieval_top_k,
+            token_budget=self.config.retrieval_token_budget,
+        )
+    
+    def get_answer_prompt(self, retrieval: RetrievalResult) -> str:
+        """Generate the answering system prompt from retrieved knowledge."""
+        context = retrieval.context or "(no matching knowledge base entries)"
+        return f"""You are a helpful {self.config.name} expert assistant.
 
-Answer questions based on this knowledge base:
+Answer questions based on these knowledge base excerpts:
 
 ---
-{self._knowledge}
+{context}
 ---
 
 Instructions:
-1. Answer based on the knowledge base above
+1. Answer based on the knowledge base excerpts above
 2. If not covered, provide your best knowledge but mention it may not be in the official docs
 3. Be conversational and helpful
 4. Mention related concepts when relevant"""
+    
+    def build_answer_request(self, question: str) -> tuple[list[dict], AnswerStats]:
+        """Build the answer messages and a fresh stats record for one call."""
+        retrieval = self.retrieve(question)
+        system_prompt = self.get_answer_prompt(retrieval)
+        stats = AnswerStats(
+            chunk_count=len(retrieval.chunks),
+            total_chunks=retrieval.total_chunks,
+            prompt_chars=len(system_prompt) + len(question),
+            prompt_tokens=estimate_tokens(system_prompt) + estimate_tokens(question),
+        )
+        messages = [
+            {"role": "system", "content": system_prompt},
+            {"role": "user", "content": question},
+        ]
+        return messages, stats
+    
+    def cached_answer(self, question: str) -> str | None:
+        """
+        Answer previously given to this question under the current knowledge, if any.
+        
+        Exact (normalized) matches are tried first, then near-duplicate
+        questions above the agent's semantic_cache_threshold.
+        """
+        agent_id = self.config.agent_id
+        answer = self.cache.get_answer(agent_id, self.content_hash, question)
+        if answer is None and self.config.semantic_cache_threshold:
+            match = self.semantic_cache.lookup(agent_id, self.content_hash, question,
+                                               self.config.semantic_cache_threshold)
+            if match:
+                answer = match.answer
+        return answer
+    
+    def store_answer(self, question: str, answer: str):
+        """
+        Remember an answer for later identical or similar questions.
+        
+        Only call this for answers the model produced; failed calls set
+        AnswerStats.error instead and are never stored.
+        """
+        if answer:
+            self.cache.put_answer(self.config.agent_id, self.content_hash, question, answer)
+            self.semantic_cache.add(self.config.agent_id, self.content_hash, question, answer)
+    
+    def answer(self, question: str) -> str:
+        """Answer a question using the most relevant parts of the knowledge base."""
+        cached = self.cached_answer(question)
+        if cached is not None:
+            self.last_stats = AnswerStats(cache_hit=True)
+            return cached
+        
+        messages, self.last_stats = self.build_answer_request(question)
+        start = time.perf_counter()
+        try:
+            response = self.client.chat.completions.create(
+                model=self.model,
+                messages=messages,
+            )
+            if response.choices and response.choices[0].message:
+                if response.usage:
+                    self.last_stats.completion_tokens = response.usage.completion_tokens or 0
+                answer = response.choices[0].message.content.strip()
+                self.store_answer(question, answer)
+                return answer
+            self.last_stats.error = "empty response"
+            return "I couldn't generate a response. Please try again."
+        except Exception as e:
+            self.last_stats.error = str(e)
+            return f"Error: {str(e)}"
+        finally:
+            self.last_stats.total_s = time.perf_counter() - start
+    
+    def get_combined_prompt(self, retrieval: RetrievalResult) -> str:
+        """System prompt for correcting and answering in a single request."""
+        context = retrieval.context or "(no matching knowledge base entries)"
+        return f"""You are a helpful {self.config.name} expert assistant. You receive a raw
+speech-to-text transcript of a user's question. In one step, fix misheard domain
+terms and then answer the corrected question.
+
+CORRECTION RULES:
+1. BE CONSERVATIVE - Only correct when you are highly confident
+2. DO NOT change the meaning or intent of the question
+3. DO NOT invent or assume what the user meant to ask
+4. If uncertain, keep the input AS-IS with only minor spelling fixes
+5. Preserve the original question structure
 
+KNOWN DOMAIN TERMS (from semantic model):
+{self._terms}
+
+KNOWLEDGE BASE EXCERPTS:
+---
+{context}
+---
+
+ANSWER INSTRUCTIONS:
+1. Answer based on the knowledge base excerpts above
+2. If not covered, provide your best knowledge but mention it may not be in the official docs
+3. Be conversational and helpful
+4. Mention related concepts when relevant
+
+Respond with ONLY a JSON object of the form:
+{{"corrected_question": "<the corrected transcript>", "answer": "<your answer in Markdown>"}}"""
+    
+    def correct_and_answer(self, raw_text: str, transcript: Transcript | None = None) -> tuple[str, str]:
+        """
+        Correct a transcript and answer it with a single LLM request.
+        
+        The transcript is snapped and planned as in correct_transcript: if no
+        LLM correction is needed, or the snapped question was answered before,
+        only the (cached) answer path runs. Falls back to separate correction
+        and answer calls when the response isn't valid JSON with both fields,
+        recording why in AnswerStats.fallback next to the time and prompt size
+        the combined attempt cost.
+        
+        Returns:
+            (corrected question, answer)
+        """
+        plan = self.plan_correction(raw_text, transcript, record=False)
+        question = plan.snapped.text
+        if not plan.needs_llm:
+            self._record_plan(plan, llm_call=False)
+            return question, self.answer(question)
+        cached = self.cached_answer(question)
+        if cached is not None:
+            self._record_plan(plan, llm_call=False)
+            self.last_stats = AnswerStats(cache_hit=True)
+            return question, cached
+        self._record_plan(plan, llm_call=True)
+        
+        retrieval = self.retrieve(question)
+        system_prompt = self.get_combined_prompt(retrieval)
+        user_prompt = f"Transcript: {question}"
+        stats = AnswerStats(
+            chunk_count=len(retrieval.chunks),
+            total_chunks=retrieval.total_chunks,
+            prompt_chars=len(system_prompt) + len(user_prompt),
+            prompt_tokens=estimate_tokens(system_prompt) + estimate_tokens(user_prompt),
+        )
+        self.last_stats = stats
+        
+        start = time.perf_counter()
+        data = None
+        fallback = None
         try:
             response = self.client.chat.completions.create(
                 model=self.model,
                 messages=[
                     {"role": "system", "content": system_prompt},
-                    {"role": "user", "content": question},
+                    {"role": "user", "content": user_prompt},
                 ],
+                response_format={"type": "json_object"},
             )
             if response.choices and response.choices[0].message:
-                return response.choices[0].message.content.strip()
-            return "I couldn't generate a response. Please try again."
+                data = parse_json_response(response.choices[0].message.content)
+                if response.usage:
+                    stats.completion_tokens = response.usage.completion_tokens or 0
         except Exception as e:
-            return f"Error: {str(e)}"
+            fallback = str(e)
+        finally:
+            stats.total_s = time.perf_counter() - start
+        
+        corrected = data.get("corrected_question") if data else None
+        answer = data.get("answer") if data else None
+        if not (isinstance(corrected, str) and isinstance(answer, str) and answer.strip()):
+            # The separate correction is a second LLM call for this transcript
+            self._record_plan(plan, llm_call=True)
+            corrected = self.correct_with_plan(raw_text, plan)
+            answer = self.answer(corrected)
+            self.last_stats.fallback = fallback or "invalid combined response"
+            self.last_stats.combined_s = stats.total_s
+            self.last_stats.combined_prompt_chars = stats.prompt_chars
+            return corrected, answer
+        
+        corrected = accept_correction(question, corrected.strip() or question)
+        self.store_answer(corrected, answer.strip())
+        return corrected, answer.strip()
+    
+    def answer_stream(self, question: str) -> Iterator[str]:
+        """Answer a question, yielding text deltas as they are generated."""
+        cached = self.cached_answer(question)
+        if cached is not None:
+            self.last_stats = AnswerStats(cache_hit=True)
+            yield cached
+            return
+        
+        messages, self.last_stats = self.build_answer_request(question)
+        parts = []
+        try:
+            for delta in stream_chat_completion(self.client, self.model, messages, self.last_stats):
+                parts.append(delta)
+                yield delta
+        except Exception as e:
+            self.last_stats.error = str(e)
+            yield f"Error: {str(e)}"
+            return
+        self.store_answer(question, "".join(parts).strip())
+    
+    async def acorrect_transcript(self, raw_text: str, transcript: Transcript | None = None) -> str:
+        """Async correct_transcript using the async Cerebras client."""
+        if self.config._snapper is None:
+            # Building the snapper reads the terms file; keep that off the event loop
+            await asyncio.to_thread(self.config.build_snapper)
+        plan = self.plan_correction(raw_text, transcript)
+        if not plan.needs_llm:
+            return plan.snapped.text
+        request, fragments = self._plan_request(raw_text, plan)
+        try:
+            response = await self.async_client.chat.completions.create(**request)
+            return self._apply_plan_response(raw_text, plan, fragments, response)
+        except Exception as e:
+            plan.error = str(e)
+            return plan.snapped.text
+    
+    async def aanswer(self, question: str) -> tuple[str, AnswerStats]:
+        """
+        Async answer using the async Cerebras client.
+        
+        Returns the stats alongside the answer: coroutines for different
+        requests share a thread, so last_stats can't tell them apart. Cache
+        reads and writes (SQLite) run in a worker thread.
+        """
+        cached = await asyncio.to_thread(self.cached_answer, question)
+        if cached is not None:
+            return cached, AnswerStats(cache_hit=True)
+        
+        messages, stats = self.build_answer_request(question)
+        start = time.perf_counter()
+        try:
+            response = await self.async_client.chat.completions.create(
+                model=self.model,
+                messages=messages,
+            )
+            if response.choices and response.choices[0].message:
+                if response.usage:
+                    stats.completion_tokens = response.usage.completion_tokens or 0
+                answer = response.choices[0].message.content.strip()
+                await asyncio.to_thread(self.store_answer, question, answer)
+                return answer, stats
+            stats.error = "empty response"
+            return "I couldn't generate a response. Please try again.", stats
+        except Exception as e:
+            stats.error = str(e)
+            return f"Error: {str(e)}", stats
+        finally:
+            stats.total_s = time.perf_counter() - start
+    
+    async def aanswer_stream(self, question: str, stats: AnswerStats) -> AsyncIterator[str]:
+        """Async answer_stream; per-call stats are written into `stats`."""
+        cached = await asyncio.to_thread(self.cached_answer, question)
+        if cached is not None:
+            stats.cache_hit = True
+            yield cached
+            return
+        
+        messages, request_stats = self.build_answer_request(question)
+        stats.chunk_count = request_stats.chunk_count
+        stats.total_chunks = request_stats.total_chunks
+        stats.prompt_chars = request_stats.prompt_chars
+        stats.prompt_tokens = request_stats.prompt_tokens
+        start = time.perf_counter()
+        parts = []
+        stream = None
+        try:
+            stream = await self.async_client.chat.completions.create(
+                model=self.model, messages=messages, stream=True,
+            )
+            async for chunk in stream:
+                if not chunk.choices:
+                    continue
+                delta = chunk.choices[0].delta
+                text = delta.content if delta else None
+                if text:
+                    if stats.ttft_s is None:
+                        stats.ttft_s = time.perf_counter() - start
+                    parts.append(text)
+                    yield text
+        except Exception as e:
+            stats.error = str(e)
+            yield f"Error: {str(e)}"
+            return
+        finally:
+            # Release the pooled connection even if the stream failed or was abandoned
+            if stream is not None:
+                await stream.close()
+            stats.total_s = time.perf_counter() - start
+            stats.completion_tokens = stats.completion_tokens or len(parts)
+        await asyncio.to_thread(self.store_answer, question, "".join(parts).strip())
 
 
-# Singleton instance
+# Singleton instances
 _manager: AgentManager | None = None
+_clients: dict[tuple[str, str | None], Cerebras] = {}
+_async_clients: dict[tuple[str, str | None], AsyncCerebras] = {}
+_clients_lock = threading.Lock()
+
+
+def get_cerebras_client(api_key: str | None = None, base_url: str | None = None) -> Cerebras:
+    """
+    Get the shared Cerebras client for an API key and endpoint.
+    
+    The client keeps its HTTP connection pool alive, so agents and sessions
+    reuse warm connections instead of a new TLS handshake per instance.
+    `base_url` (or CEREBRAS_BASE_URL) points it at another compatible
+    server, such as mock_cerebras.py.
+    """
+    api_key = api_key or os.environ.get("CEREBRAS_API_KEY")
+    if not api_key:
+        raise ValueError("Cerebras API key is required")
+    base_url = base_url or os.environ.get("CEREBRAS_BASE_URL")
+    with _clients_lock:
+        if (api_key, base_url) not in _clients:
+            _clients[api_key, base_url] = Cerebras(api_key=api_key, base_url=base_url)
+        return _clients[api_key, base_url]
+
+
+def get_async_cerebras_client(api_key: str | None = None, base_url: str | None = None) -> AsyncCerebras:
+    """Get the shared async Cerebras client for an API key (for asyncio services)."""
+    api_key = api_key or os.environ.get("CEREBRAS_API_KEY")
+    if not api_key:
+        raise ValueError("Cerebras API key is required")
+    base_url = base_url or os.environ.get("CEREBRAS_BASE_URL")
+    with _clients_lock:
+        if (api_key, base_url) not in _async_clients:
+            _async_clients[api_key, base_url] = AsyncCerebras(api_key=api_key, base_url=base_url)
+        return _async_clients[api_key, base_url]
+
 
 def get_agent_manager() -> AgentManager:
     """Get the singleton agent manager instance."""
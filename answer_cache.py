@@ -0,0 +1,193 @@
+"""
+Answer Cache Module
+
+Two-tier cache for LLM answers:
+- An in-memory LRU with TTL eviction for the current process
+- A SQLite tier on disk that survives Streamlit restarts, capped at
+  max_disk_entries rows; expired and oldest rows are pruned on write
+
+Entries are keyed by agent id + the agent's content hash + the normalized
+question, so editing an agent's knowledge or terms never serves a stale
+answer; `invalidate` also purges the old entries from disk.
+"""
+
+import hashlib
+import os
+import re
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from pathlib import Path
+
+
+DEFAULT_CACHE_PATH = Path(__file__).parent / ".cache" / "answers.sqlite3"
+
+
+def normalize_question(text: str) -> str:
+    """Lowercase, strip punctuation and collapse whitespace."""
+    return " ".join(re.sub(r"[^\w\s]", " ", text.lower()).split())
+
+
+@dataclass
+class CacheStats:
+    """Hit/miss counters for one cache."""
+    memory_hits: int = 0
+    disk_hits: int = 0
+    misses: int = 0
+
+    @property
+    def hits(self) -> int:
+        return self.memory_hits + self.disk_hits
+
+    @property
+    def hit_rate(self) -> float:
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+
+class TieredCache:
+    """
+    In-memory LRU + TTL cache backed by an optional SQLite table.
+
+    Every entry belongs to a namespace (e.g. an agent id) and a version
+    (e.g. that agent's content hash); `invalidate` drops all entries of a
+    namespace whose version differs from the current one.
+    """
+
+    def __init__(self, db_path: Path | str | None = None, table: str = "cache",
+                 max_entries: int = 1024, ttl_s: float = 3600.0,
+                 disk_ttl_s: float = 7 * 24 * 3600.0, max_disk_entries: int = 100_000):
+        self.max_entries = max_entries
+        self.ttl_s = ttl_s
+        self.disk_ttl_s = disk_ttl_s
+        self.max_disk_entries = max_disk_entries
+        self.table = table
+        self.stats = CacheStats()
+        # key -> (value, expires_at, namespace, version)
+        self._memory: OrderedDict[str, tuple[str, float, str, str]] = OrderedDict()
+        self._lock = threading.Lock()
+        self._db: sqlite3.Connection | None = None
+
+        if db_path is not None:
+            Path(db_path).parent.mkdir(parents=True, exist_ok=True)
+            self._db = sqlite3.connect(str(db_path), check_same_thread=False)
+            self._db.execute(
+                f"CREATE TABLE IF NOT EXISTS {table} ("
+                "key TEXT PRIMARY KEY, namespace TEXT, version TEXT, value TEXT, created REAL)"
+            )
+            self._db.execute(
+                f"CREATE INDEX IF NOT EXISTS {table}_namespace ON {table} (namespace, version)"
+            )
+            self._db.execute(f"CREATE INDEX IF NOT EXISTS {table}_created ON {table} (created)")
+            self._db.commit()
+
+    def get(self, key: str) -> str | None:
+        """Look up a value, promoting disk hits into memory."""
+        now = time.time()
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None:
+                value, expires = entry[:2]
+                if expires > now:
+                    self._memory.move_to_end(key)
+                    self.stats.memory_hits += 1
+                    return value
+                del self._memory[key]
+
+            if self._db is not None:
+                row = self._db.execute(
+                    f"SELECT value, created, namespace, version FROM {self.table} WHERE key = ?",
+                    (key,),
+                ).fetchone()
+                if row is not None and row[1] + self.disk_ttl_s > now:
+                    self._remember(key, row[0], now, row[2], row[3])
+                    self.stats.disk_hits += 1
+                    return row[0]
+                if row is not None:
+                    # Expired: drop it rather than letting the file grow
+                    self._db.execute(f"DELETE FROM {self.table} WHERE key = ?", (key,))
+                    self._db.commit()
+
+            self.stats.misses += 1
+            return None
+
+    def put(self, key: str, value: str, namespace: str = "", version: str = ""):
+        """Store a value in memory and on disk."""
+        now = time.time()
+        with self._lock:
+            self._remember(key, value, now, namespace, version)
+            if self._db is not None:
+                self._db.execute(
+                    f"INSERT OR REPLACE INTO {self.table} (key, namespace, version, value, created) "
+                    "VALUES (?, ?, ?, ?, ?)",
+                    (key, namespace, version, value, now),
+                )
+                self._prune(now)
+                self._db.commit()
+
+    def _prune(self, now: float):
+        """Delete expired rows, then the oldest beyond max_disk_entries."""
+        self._db.execute(f"DELETE FROM {self.table} WHERE created <= ?", (now - self.disk_ttl_s,))
+        self._db.execute(
+            f"DELETE FROM {self.table} WHERE key IN (SELECT key FROM {self.table} "
+            "ORDER BY created DESC, rowid DESC LIMIT -1 OFFSET ?)",
+            (self.max_disk_entries,),
+        )
+
+    def invalidate(self, namespace: str, current_version: str):
+        """Drop all entries of a namespace written under another version."""
+        with self._lock:
+            stale = [k for k, (_, _, ns, ver) in self._memory.items()
+                     if ns == namespace and ver != current_version]
+            for k in stale:
+                del self._memory[k]
+            if self._db is not None:
+                self._db.execute(
+                    f"DELETE FROM {self.table} WHERE namespace = ? AND version != ?",
+                    (namespace, current_version),
+                )
+                self._db.commit()
+
+    def _remember(self, key: str, value: str, now: float, namespace: str, version: str):
+        self._memory[key] = (value, now + self.ttl_s, namespace, version)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_entries:
+            self._memory.popitem(last=False)
+
+    def __len__(self) -> int:
+        return len(self._memory)
+
+
+class AnswerCache(TieredCache):
+    """
+    Answers keyed by agent id, agent content hash and normalized question.
+    """
+
+    def __init__(self, db_path: Path | str | None = DEFAULT_CACHE_PATH, **kwargs):
+        super().__init__(db_path, table="answers", **kwargs)
+
+    @staticmethod
+    def make_key(agent_id: str, content_hash: str, question: str) -> str:
+        raw = f"{agent_id}\0{content_hash}\0{normalize_question(question)}"
+        return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+    def get_answer(self, agent_id: str, content_hash: str, question: str) -> str | None:
+        return self.get(self.make_key(agent_id, content_hash, question))
+
+    def put_answer(self, agent_id: str, content_hash: str, question: str, answer: str):
+        self.put(self.make_key(agent_id, content_hash, question), answer,
+                 namespace=agent_id, version=content_hash)
+
+
+# Singleton instance
+_answer_cache: AnswerCache | None = None
+
+
+def get_answer_cache() -> AnswerCache:
+    """Get the process-wide answer cache (path overridable via ANSWER_CACHE_PATH)."""
+    global _answer_cache
+    if _answer_cache is None:
+        _answer_cache = AnswerCache(os.environ.get("ANSWER_CACHE_PATH") or DEFAULT_CACHE_PATH)
+    return _answer_cache
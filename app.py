@@ -1,44 +1,34 @@
-import io
 import streamlit as st
 from audiorecorder import audiorecorder
-from faster_whisper import WhisperModel
 from pydub import AudioSegment
 
+from agent_manager import get_agent_manager
+from asr_daemon import transcribe
+from audio_preprocessing import prepare_audio
+
 # Streamlit setup
 st.set_page_config(page_title="Local Whisper Transcriber", page_icon="🎙️")
 st.title("🎙️ Local Whisper Transcriber (No API Key Needed)")
 
 st.write("Record audio below and transcribe it locally using Whisper (faster-whisper).")
 
-# Load Whisper model (lazy loading)
-@st.cache_resource
-def load_whisper_model():
-    return WhisperModel("small", device="cpu")  # choose: tiny, base, small, medium, large
-model = load_whisper_model()
+# Whisper model and vocabulary come from the agent's ASR profile; the shared
+# ASR daemon serves them when ASR_DAEMON_SOCKET is set, else this process does
+agents = get_agent_manager().list_agents()
+asr_agent = st.selectbox("Vocabulary", agents, format_func=lambda a: f"{a.icon} {a.name}")
 
 # Audio recorder
 audio = audiorecorder("🔴 Click to start / stop recording", "⏺️ Recording...")
 
 if len(audio) > 0:
-    st.audio(audio.export().read(), format="audio/wav")
+    prepared = prepare_audio(audio)
+    st.audio(prepared.wav_bytes(), format="audio/wav")
     st.success("Recording captured! Click the button below to transcribe.")
 
     if st.button("📝 Transcribe locally with Whisper"):
         with st.spinner("Transcribing... this may take a few seconds"):
-            # Export audio to WAV bytes
-            wav_bytes_io = io.BytesIO()
-            audio.export(wav_bytes_io, format="wav")
-            wav_bytes_io.seek(0)
-
-            # Save to a temp file (Whisper needs a path)
-            with open("temp.wav", "wb") as f:
-                f.write(wav_bytes_io.read())
-
-            # Run Whisper locally
-            segments, info = model.transcribe("temp.wav")
-
-            # Collect transcript text
-            transcript_text = " ".join([seg.text for seg in segments])
+            # Run Whisper locally on the in-memory samples
+            transcript_text = transcribe(prepared, asr_agent.asr, asr_agent.decoding_bias).text
 
         st.subheader("Transcript")
         st.write(transcript_text)
@@ -0,0 +1,315 @@
+"""
+ASR Daemon Module
+
+A local Whisper worker that holds the model(s) once for every UI, service
+and batch process on the machine, instead of each Streamlit process loading
+its own copy.
+
+- Clients connect over a Unix socket and hand over 16 kHz float32 PCM
+  through `multiprocessing.shared_memory`: the daemon decodes straight from
+  the client's buffer, nothing is pickled or JSON-encoded. Where shared
+  memory isn't available the samples follow the header on the socket.
+- Requests carry the agent's AsrProfile and vocabulary bias, so per-agent
+  models and cascades are served from the daemon's model cache
+- At most --workers decodes run at once and --queue more may wait; beyond
+  that requests are refused as busy and the client backs off and retries
+- With --batch-window-ms, requests arriving together are decoded as one
+  batch by the ASR scheduler (up to --max-batch at once)
+
+Wire format (both directions): 4-byte big-endian header length, JSON header,
+then (requests only) `samples * 4` bytes of PCM when not using shared memory.
+
+Usage:
+    python asr_daemon.py --socket /tmp/speech-asr.sock --workers 2 --preload small
+    ASR_DAEMON_SOCKET=/tmp/speech-asr.sock streamlit run new-app.py
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import socket
+import struct
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import asdict
+from multiprocessing import resource_tracker, shared_memory
+
+import numpy as np
+
+from asr_scheduler import admission_slots, get_scheduler
+from bounded_stage import BoundedStage, StageFullError
+from transcription import (AsrProfile, AsrStats, CascadeSettings, Transcript, audio_to_float32,
+                           get_whisper_model, transcribe_with_profile)
+from vocab_bias import DecodingBias
+
+
+DEFAULT_SOCKET = "/tmp/speech-asr.sock"
+_HEADER = struct.Struct(">I")
+
+
+class AsrBusyError(RuntimeError):
+    """The daemon's queue is full."""
+
+
+# ---------------------------
+# Wire helpers
+# ---------------------------
+def _profile_to_json(profile: AsrProfile) -> dict:
+    return asdict(profile)
+
+
+def _profile_from_json(data: dict) -> AsrProfile:
+    cascade = data.pop("cascade", None)
+    return AsrProfile(**{**data, "temperatures": tuple(data.get("temperatures", ())),
+                         "cascade": CascadeSettings(**cascade) if cascade else None})
+
+
+def _encode(header: dict) -> bytes:
+    body = json.dumps(header).encode("utf-8")
+    return _HEADER.pack(len(body)) + body
+
+
+def _recv_exactly(sock: socket.socket, n: int) -> bytes:
+    buf = bytearray(n)
+    view = memoryview(buf)
+    got = 0
+    while got < n:
+        k = sock.recv_into(view[got:])
+        if not k:
+            raise ConnectionError("ASR daemon closed the connection")
+        got += k
+    return bytes(buf)
+
+
+# ---------------------------
+# Daemon
+# ---------------------------
+class AsrDaemon:
+    """
+    Serves transcription requests from a shared model cache.
+    """
+
+    def __init__(self, workers: int = 1, max_queue: int = 16, batch_window_ms: float = 0.0,
+                 max_batch: int = 8):
+        self.workers = workers
+        self.max_queue = max_queue
+        self.batch_window_ms = batch_window_ms
+        self.max_batch = max_batch
+        self.stats = AsrStats()
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="asr")
+        self._stage: BoundedStage | None = None
+
+    def status(self) -> dict:
+        stage = self._stage.status() if self._stage else {"active": 0, "waiting": 0, "rejected": 0}
+        return {**stage, "requests": self.stats.requests, "escalation_rate": self.stats.escalation_rate,
+                "avg_latency_s": self.stats.avg_latency_s}
+
+    @staticmethod
+    def _request_profile(header: dict) -> tuple[AsrProfile, DecodingBias | None]:
+        bias = header.get("bias")
+        return (_profile_from_json(header["profile"]),
+                DecodingBias(tuple(bias["terms"]), bias["tokens"]) if bias else None)
+
+    def _transcribe(self, header: dict, samples: np.ndarray) -> Transcript:
+        return transcribe_with_profile(samples, *self._request_profile(header), self.stats)
+
+    def _decode_shared(self, header: dict) -> Transcript:
+        shm = shared_memory.SharedMemory(name=header["shm"])
+        # The client owns the block; don't let this process's tracker unlink it
+        resource_tracker.unregister(shm._name, "shared_memory")
+        try:
+            samples = np.ndarray((header["samples"],), dtype=np.float32, buffer=shm.buf)
+            try:
+                return self._transcribe(header, samples)
+            finally:
+                del samples
+        finally:
+            shm.close()
+
+    async def _transcribe_batched(self, header: dict, payload: bytes | None) -> Transcript:
+        if payload is not None:
+            samples = np.frombuffer(payload, dtype=np.float32)
+        else:
+            shm = shared_memory.SharedMemory(name=header["shm"])
+            resource_tracker.unregister(shm._name, "shared_memory")
+            try:
+                # Copied out: the batch concatenates the clips anyway, and the
+                # scheduler may hold on to the array after the reply is sent
+                samples = np.array(np.ndarray((header["samples"],), dtype=np.float32, buffer=shm.buf))
+            finally:
+                shm.close()
+        scheduler = get_scheduler(*self._request_profile(header), self.batch_window_ms, self.max_batch)
+        transcript = await asyncio.wrap_future(scheduler.submit(samples))
+        self.stats.record(transcript)
+        return transcript
+
+    async def handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        try:
+            (length,) = _HEADER.unpack(await reader.readexactly(_HEADER.size))
+            header = json.loads(await reader.readexactly(length))
+            if header.get("op") == "status":
+                writer.write(_encode(self.status()))
+                return
+
+            payload = None
+            if not header.get("shm"):
+                payload = await reader.readexactly(header["samples"] * 4)
+            try:
+                await self._stage.acquire()
+            except StageFullError as e:
+                writer.write(_encode({"error": str(e), "busy": True, "retry_after": e.retry_after}))
+                return
+            try:
+                loop = asyncio.get_running_loop()
+                if self.batch_window_ms:
+                    transcript = await self._transcribe_batched(header, payload)
+                elif payload is None:
+                    transcript = await loop.run_in_executor(self._executor, self._decode_shared, header)
+                else:
+                    samples = np.frombuffer(payload, dtype=np.float32)
+                    transcript = await loop.run_in_executor(self._executor, self._transcribe, header, samples)
+                writer.write(_encode({"transcript": transcript.to_dict()}))
+            except Exception as e:
+                writer.write(_encode({"error": f"{type(e).__name__}: {e}"}))
+            finally:
+                self._stage.release()
+        except (ConnectionError, asyncio.IncompleteReadError, ValueError):
+            pass
+        finally:
+            try:
+                await writer.drain()
+            except ConnectionError:
+                pass
+            writer.close()
+
+    async def serve(self, path: str) -> asyncio.AbstractServer:
+        self._stage = BoundedStage("ASR", admission_slots(self.workers, self.batch_window_ms, self.max_batch),
+                                   self.max_queue, retry_after=0.5)
+        if os.path.exists(path):
+            os.unlink(path)
+        return await asyncio.start_unix_server(self.handle, path)
+
+
+# ---------------------------
+# Client
+# ---------------------------
+class AsrClient:
+    """
+    Blocking client for the ASR daemon; safe to share between threads.
+    """
+
+    def __init__(self, path: str = DEFAULT_SOCKET, use_shared_memory: bool = True,
+                 retries: int = 5, timeout: float = 300.0):
+        self.path = path
+        self.use_shared_memory = use_shared_memory
+        self.retries = retries
+        self.timeout = timeout
+
+    def _request(self, header: dict, payload: memoryview | None = None) -> dict:
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+            sock.settimeout(self.timeout)
+            sock.connect(self.path)
+            sock.sendall(_encode(header))
+            if payload is not None:
+                sock.sendall(payload)
+            (length,) = _HEADER.unpack(_recv_exactly(sock, _HEADER.size))
+            return json.loads(_recv_exactly(sock, length))
+
+    def status(self) -> dict:
+        return self._request({"op": "status"})
+
+    def transcribe(self, audio, profile: AsrProfile | None = None, bias: DecodingBias | None = None,
+                   stats: AsrStats | None = None) -> Transcript:
+        """Transcribe a recording (anything `audio_to_float32` accepts) in the daemon."""
+        samples = np.ascontiguousarray(audio_to_float32(audio), dtype=np.float32)
+        header = {"samples": len(samples), "profile": _profile_to_json(profile or AsrProfile()),
+                  "bias": {"terms": list(bias.terms), "tokens": bias.tokens} if bias else None}
+
+        shm = None
+        if self.use_shared_memory and len(samples):
+            shm = shared_memory.SharedMemory(create=True, size=samples.nbytes)
+            np.ndarray(samples.shape, dtype=np.float32, buffer=shm.buf)[:] = samples
+            header["shm"] = shm.name
+        try:
+            for attempt in range(self.retries + 1):
+                reply = self._request(header, None if shm else memoryview(samples).cast("B"))
+                if not reply.get("busy"):
+                    break
+                if attempt == self.retries:
+                    raise AsrBusyError(reply["error"])
+                time.sleep(reply.get("retry_after", 0.5) * (attempt + 1))
+        finally:
+            if shm is not None:
+                shm.close()
+                shm.unlink()
+
+        if "error" in reply:
+            raise RuntimeError(f"ASR daemon: {reply['error']}")
+        transcript = Transcript.from_dict(reply["transcript"])
+        if stats is not None:
+            stats.record(transcript)
+        return transcript
+
+
+_client: AsrClient | None = None
+
+
+def get_asr_client() -> AsrClient | None:
+    """Client for the daemon at ASR_DAEMON_SOCKET, or None if none is configured."""
+    global _client
+    path = os.environ.get("ASR_DAEMON_SOCKET")
+    if not path:
+        return None
+    if _client is None or _client.path != path:
+        _client = AsrClient(path)
+    return _client
+
+
+def transcribe(audio, profile: AsrProfile | None = None, bias: DecodingBias | None = None,
+               stats: AsrStats | None = None) -> Transcript:
+    """
+    Transcribe through the shared daemon if one is configured, else in-process.
+
+    A configured but unreachable daemon falls back to a local model, so the
+    app keeps working while the daemon restarts.
+    """
+    client = get_asr_client()
+    if client is not None:
+        try:
+            return client.transcribe(audio, profile, bias, stats)
+        except (ConnectionError, FileNotFoundError, socket.timeout) as e:
+            print(f"ASR daemon unavailable ({e}); transcribing in-process")
+    return transcribe_with_profile(audio, profile, bias, stats)
+
+
+async def _run(args):
+    daemon = AsrDaemon(workers=args.workers, max_queue=args.queue, batch_window_ms=args.batch_window_ms,
+                       max_batch=args.max_batch)
+    for model_size in args.preload:
+        get_whisper_model(AsrProfile(model_size=model_size, compute_type=args.compute_type))
+    server = await daemon.serve(args.socket)
+    print(f"ASR daemon listening on {args.socket}")
+    async with server:
+        await server.serve_forever()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Shared local Whisper daemon")
+    parser.add_argument("--socket", default=os.environ.get("ASR_DAEMON_SOCKET", DEFAULT_SOCKET))
+    parser.add_argument("--workers", type=int, default=1, help="Concurrent decodes")
+    parser.add_argument("--queue", type=int, default=16, help="Max requests waiting before refusing")
+    parser.add_argument("--batch-window-ms", type=float, default=0.0,
+                        help="Batch requests arriving within this window (0 = off)")
+    parser.add_argument("--max-batch", type=int, default=8, help="Max recordings per batch")
+    parser.add_argument("--preload", nargs="*", default=[], help="Model sizes to load before serving")
+    parser.add_argument("--compute-type", default="int8", help="Compute type for --preload")
+    args = parser.parse_args()
+    try:
+        asyncio.run(_run(args))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
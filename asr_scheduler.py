@@ -0,0 +1,277 @@
+"""
+ASR Scheduler Module
+
+Dynamic micro-batching for concurrent transcription requests. When several
+users stop recording at about the same time, their clips are decoded
+together by faster-whisper's `BatchedInferencePipeline` instead of one
+`model.transcribe` call after another.
+
+- A request waits at most --window-ms for others to join its batch, or
+  until --max-batch requests are queued
+- Clips are concatenated and passed as `clip_timestamps`, one clip per
+  batch row; segments are mapped back to their clip by offset
+- Requests only batch with others using the same ASR profile and bias;
+  a cascade decodes the batch with the draft model, then re-decodes the
+  escalated clips as a second batch
+- Clips longer than Whisper's 30 s window go through the regular
+  sequential path
+
+Usage (tune the window: throughput and latency at each setting):
+    python asr_scheduler.py fixtures/ --agent snowflake --windows 0 20 50 \\
+        --concurrency 8 --requests 64
+"""
+
+import argparse
+import bisect
+import json
+import queue
+import sys
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from dataclasses import dataclass, field
+from pathlib import Path
+
+import numpy as np
+from faster_whisper import BatchedInferencePipeline
+
+from transcription import (AsrProfile, AsrStats, Transcript, audio_to_float32, collect_transcript,
+                           get_whisper_model, transcribe_with_profile)
+from vocab_bias import DecodingBias
+
+
+SAMPLE_RATE = 16000
+# Whisper decodes at most 30 s per batch row
+MAX_CLIP_S = 30.0
+
+
+@dataclass
+class BatchStats:
+    """Batch sizes and per-request latency (submit to result) of a scheduler."""
+    batches: int = 0
+    requests: int = 0
+    latencies: list[float] = field(default_factory=list)
+    _lock: threading.Lock = field(default_factory=threading.Lock, init=False, repr=False, compare=False)
+
+    def record(self, size: int, latencies: list[float]):
+        with self._lock:
+            self.batches += 1
+            self.requests += size
+            self.latencies.extend(latencies)
+
+    @property
+    def avg_batch_size(self) -> float:
+        return self.requests / self.batches if self.batches else 0.0
+
+    def summary(self) -> dict:
+        lat = np.asarray(self.latencies) if self.latencies else np.zeros(1)
+        return {"batches": self.batches, "requests": self.requests, "avg_batch_size": self.avg_batch_size,
+                "latency_p50_s": float(np.percentile(lat, 50)), "latency_p95_s": float(np.percentile(lat, 95)),
+                "latency_mean_s": float(lat.mean())}
+
+
+@dataclass
+class _Request:
+    samples: np.ndarray
+    future: Future
+    submitted: float
+
+
+def transcribe_batch(pipeline: BatchedInferencePipeline, clips: list[np.ndarray], profile: AsrProfile,
+                     bias: DecodingBias | None = None) -> list[Transcript]:
+    """
+    Decode several clips (each at most 30 s) in one batched call; one Transcript per clip.
+
+    The pipeline keeps per-call state, so it must not be shared between threads.
+    """
+    if not clips:
+        return []
+    offsets = [float(o) / SAMPLE_RATE for o in np.cumsum([0] + [len(c) for c in clips[:-1]])]
+    # clip_timestamps are in seconds
+    clip_timestamps = [{"start": o, "end": o + len(c) / SAMPLE_RATE} for o, c in zip(offsets, clips)]
+    kwargs = profile.transcribe_kwargs(bias)
+    kwargs.pop("vad_filter", None)
+    segments, _ = pipeline.transcribe(np.concatenate(clips), clip_timestamps=clip_timestamps,
+                                      batch_size=len(clips), **kwargs)
+
+    per_clip: list[list] = [[] for _ in clips]
+    for seg in segments:
+        i = max(bisect.bisect_right(offsets, seg.start + 1e-3) - 1, 0)
+        per_clip[i].append(seg)
+    transcripts = []
+    for i, segs in enumerate(per_clip):
+        transcript = collect_transcript(segs)
+        # Word timestamps come back relative to the concatenated audio
+        for w in transcript.words:
+            w.start -= offsets[i]
+            w.end -= offsets[i]
+        transcript.model = profile.model_size
+        transcripts.append(transcript)
+    return transcripts
+
+
+class AsrScheduler:
+    """
+    Collects transcription requests for one profile and decodes them in batches.
+    """
+
+    def __init__(self, profile: AsrProfile | None = None, bias: DecodingBias | None = None,
+                 window_ms: float = 30.0, max_batch: int = 8, stats: AsrStats | None = None):
+        self.profile = profile or AsrProfile()
+        self.bias = bias
+        self.window_s = window_ms / 1000
+        self.max_batch = max_batch
+        self.asr_stats = stats or AsrStats()
+        self.batch_stats = BatchStats()
+        self._queue: queue.Queue[_Request] = queue.Queue()
+        self._pipelines: dict[tuple, BatchedInferencePipeline] = {}
+        self._thread = threading.Thread(target=self._loop, name="asr-scheduler", daemon=True)
+        self._thread.start()
+
+    def submit(self, audio) -> Future:
+        """Queue a recording; the future resolves to its Transcript."""
+        request = _Request(audio_to_float32(audio), Future(), time.perf_counter())
+        self._queue.put(request)
+        return request.future
+
+    def transcribe(self, audio) -> Transcript:
+        return self.submit(audio).result()
+
+    def _pipeline(self, profile: AsrProfile) -> BatchedInferencePipeline:
+        model = get_whisper_model(profile)
+        # Keyed by model identity so a model evicted from the cache isn't kept alive
+        key = (profile.model_key, id(model))
+        if key not in self._pipelines:
+            self._pipelines = {k: v for k, v in self._pipelines.items() if k[0] != profile.model_key}
+            self._pipelines[key] = BatchedInferencePipeline(model)
+        return self._pipelines[key]
+
+    def _collect(self) -> list[_Request]:
+        batch = [self._queue.get()]
+        deadline = time.perf_counter() + self.window_s
+        while len(batch) < self.max_batch:
+            remaining = deadline - time.perf_counter()
+            try:
+                batch.append(self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def _loop(self):
+        while True:
+            batch = self._collect()
+            try:
+                self._run(batch)
+            except Exception as e:
+                for request in batch:
+                    if not request.future.done():
+                        request.future.set_exception(e)
+
+    def _run(self, batch: list[_Request]):
+        start = time.perf_counter()
+        short = [r for r in batch if len(r.samples) <= MAX_CLIP_S * SAMPLE_RATE]
+        results: dict[int, Transcript] = {}
+        for r in batch:
+            if len(r.samples) > MAX_CLIP_S * SAMPLE_RATE:
+                results[id(r)] = transcribe_with_profile(r.samples, self.profile, self.bias)
+
+        draft = self.profile.draft_profile
+        first_profile = draft or self.profile
+        first = transcribe_batch(self._pipeline(first_profile), [r.samples for r in short],
+                                 first_profile, self.bias)
+        escalate = []
+        for r, transcript in zip(short, first):
+            results[id(r)] = transcript
+            if draft is not None and self.profile.cascade.should_escalate(transcript):
+                escalate.append(r)
+        for r, transcript in zip(escalate, transcribe_batch(self._pipeline(self.profile),
+                                                            [r.samples for r in escalate],
+                                                            self.profile, self.bias)):
+            transcript.escalated = True
+            results[id(r)] = transcript
+
+        done = time.perf_counter()
+        latencies = []
+        for r in batch:
+            transcript = results[id(r)]
+            transcript.decode_s = done - start
+            self.asr_stats.record(transcript)
+            latencies.append(done - r.submitted)
+            r.future.set_result(transcript)
+        self.batch_stats.record(len(batch), latencies)
+
+
+_schedulers: dict[tuple, AsrScheduler] = {}
+_schedulers_lock = threading.Lock()
+
+
+def get_scheduler(profile: AsrProfile, bias: DecodingBias | None = None, window_ms: float = 30.0,
+                  max_batch: int = 8) -> AsrScheduler:
+    """The shared scheduler for a profile and bias; requests only batch within one."""
+    key = (profile, bias, window_ms, max_batch)
+    with _schedulers_lock:
+        if key not in _schedulers:
+            _schedulers[key] = AsrScheduler(profile, bias, window_ms, max_batch)
+        return _schedulers[key]
+
+
+def admission_slots(workers: int, window_ms: float, max_batch: int) -> int:
+    """How many requests a front end should let through to ASR at once."""
+    # A batch can only fill up if that many requests are let through to the scheduler
+    return max(workers, max_batch) if window_ms else workers
+
+
+def run_window(clips: list[np.ndarray], profile: AsrProfile, bias: DecodingBias | None,
+               window_ms: float, max_batch: int, concurrency: int, total: int) -> dict:
+    """Fire `total` requests from `concurrency` callers through a fresh scheduler."""
+    scheduler = AsrScheduler(profile, bias, window_ms, max_batch)
+    # Warm up: model load and first-call initialization stay out of the numbers
+    scheduler.transcribe(clips[0])
+    scheduler.batch_stats = BatchStats()
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        list(pool.map(lambda i: scheduler.transcribe(clips[i % len(clips)]), range(total)))
+    wall = time.perf_counter() - start
+    audio_s = sum(len(clips[i % len(clips)]) for i in range(total)) / SAMPLE_RATE
+    return {"window_ms": window_ms, "max_batch": max_batch, "concurrency": concurrency,
+            "throughput_rps": total / wall, "audio_s_per_s": audio_s / wall,
+            **scheduler.batch_stats.summary()}
+
+
+def main():
+    from agent_manager import get_agent_manager
+    from audio_preprocessing import decode_wav
+
+    parser = argparse.ArgumentParser(description="Measure micro-batched transcription at several batch windows")
+    parser.add_argument("corpus", type=Path, help="Directory of .wav clips")
+    parser.add_argument("--agent", default="snowflake", help="Agent whose ASR profile to use")
+    parser.add_argument("--windows", nargs="+", type=float, default=[0, 20, 50], help="Batch windows (ms)")
+    parser.add_argument("--max-batch", type=int, default=8)
+    parser.add_argument("--concurrency", type=int, default=8, help="Simultaneous callers")
+    parser.add_argument("--requests", type=int, default=64)
+    parser.add_argument("--json", type=Path, help="Write results as JSON to this path")
+    args = parser.parse_args()
+
+    config = get_agent_manager().get_agent(args.agent)
+    if config is None:
+        parser.error(f"Unknown agent: {args.agent}")
+    clips = [decode_wav(p.read_bytes()).to_float32() for p in sorted(args.corpus.glob("*.wav"))]
+    if not clips:
+        parser.error(f"No .wav files in {args.corpus}")
+
+    results = []
+    for window in args.windows:
+        print(f"Window {window:g} ms...", file=sys.stderr)
+        r = run_window(clips, config.asr, config.decoding_bias, window, args.max_batch,
+                       args.concurrency, args.requests)
+        results.append(r)
+        print(f"window={r['window_ms']:>4g}ms  batch={r['avg_batch_size']:.1f}  "
+              f"throughput={r['throughput_rps']:.2f} req/s ({r['audio_s_per_s']:.1f} audio s/s)  "
+              f"p50={r['latency_p50_s']:.2f}s  p95={r['latency_p95_s']:.2f}s")
+    if args.json:
+        args.json.write_text(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,215 @@
+"""
+Async HTTP Module
+
+A minimal HTTP/1.1 server on top of `asyncio.start_server`, used by the
+pipeline service and local test servers. It supports keep-alive, JSON
+request/response bodies and chunked streaming responses (e.g. SSE), which
+is all those services need, without adding a web framework dependency.
+"""
+
+import asyncio
+import json
+from dataclasses import dataclass, field
+from http import HTTPStatus
+from typing import AsyncIterator, Awaitable, Callable
+from urllib.parse import parse_qs, urlsplit
+
+
+MAX_BODY_BYTES = 64 * 1024 * 1024
+MAX_HEADER_LINES = 100
+
+
+class HTTPError(Exception):
+    """Raised by handlers to return an error status with a JSON body."""
+
+    def __init__(self, status: int, message: str, headers: dict[str, str] | None = None):
+        super().__init__(message)
+        self.status = status
+        self.message = message
+        self.headers = headers or {}
+
+
+@dataclass
+class Request:
+    """A parsed HTTP request."""
+    method: str
+    path: str
+    query: dict[str, str]
+    headers: dict[str, str]
+    body: bytes = b""
+
+    @property
+    def keep_alive(self) -> bool:
+        return self.headers.get("connection", "").lower() != "close"
+
+    def json(self) -> dict:
+        """Decode the body as a JSON object."""
+        try:
+            data = json.loads(self.body or b"{}")
+        except ValueError:
+            raise HTTPError(400, "Request body must be valid JSON")
+        if not isinstance(data, dict):
+            raise HTTPError(400, "Request body must be a JSON object")
+        return data
+
+
+@dataclass
+class Response:
+    """A complete HTTP response."""
+    body: bytes = b""
+    status: int = 200
+    content_type: str = "application/json"
+    headers: dict[str, str] = field(default_factory=dict)
+
+    async def write(self, writer: asyncio.StreamWriter, keep_alive: bool):
+        head = _status_line(self.status)
+        headers = {"Content-Type": self.content_type, "Content-Length": str(len(self.body)),
+                   "Connection": "keep-alive" if keep_alive else "close", **self.headers}
+        writer.write(_encode_head(head, headers) + self.body)
+        await writer.drain()
+
+
+@dataclass
+class StreamResponse:
+    """A response whose body is sent with chunked transfer encoding as it is produced."""
+    chunks: AsyncIterator[bytes]
+    status: int = 200
+    content_type: str = "text/event-stream"
+    headers: dict[str, str] = field(default_factory=dict)
+    # Called once the body is done or abandoned, e.g. to free a slot taken for the stream
+    on_close: Callable[[], None] | None = None
+
+    async def write(self, writer: asyncio.StreamWriter, keep_alive: bool):
+        head = _status_line(self.status)
+        headers = {"Content-Type": self.content_type, "Transfer-Encoding": "chunked",
+                   "Cache-Control": "no-cache",
+                   "Connection": "keep-alive" if keep_alive else "close", **self.headers}
+        try:
+            writer.write(_encode_head(head, headers))
+            await writer.drain()
+            async for chunk in self.chunks:
+                if chunk:
+                    writer.write(b"%x\r\n%s\r\n" % (len(chunk), chunk))
+                    await writer.drain()
+            writer.write(b"0\r\n\r\n")
+            await writer.drain()
+        finally:
+            if self.on_close is not None:
+                self.on_close()
+
+
+def json_response(data, status: int = 200, headers: dict[str, str] | None = None) -> Response:
+    return Response(json.dumps(data).encode("utf-8"), status=status, headers=headers or {})
+
+
+def sse_event(data) -> bytes:
+    """Encode one server-sent event carrying a JSON payload (or a raw string)."""
+    payload = data if isinstance(data, str) else json.dumps(data)
+    return f"data: {payload}\n\n".encode("utf-8")
+
+
+Handler = Callable[[Request], Awaitable[Response | StreamResponse]]
+
+
+class Router:
+    """Maps (method, path) to async handlers."""
+
+    def __init__(self):
+        self._routes: dict[tuple[str, str], Handler] = {}
+
+    def add(self, method: str, path: str, handler: Handler):
+        self._routes[(method.upper(), path)] = handler
+
+    def route(self, method: str, path: str):
+        def decorator(handler: Handler) -> Handler:
+            self.add(method, path, handler)
+            return handler
+        return decorator
+
+    async def dispatch(self, request: Request) -> Response | StreamResponse:
+        handler = self._routes.get((request.method, request.path))
+        if handler is None:
+            if any(path == request.path for _, path in self._routes):
+                return json_response({"error": "Method not allowed"}, status=405)
+            return json_response({"error": "Not found"}, status=404)
+        try:
+            return await handler(request)
+        except HTTPError as e:
+            return json_response({"error": e.message}, status=e.status, headers=e.headers)
+        except Exception as e:
+            return json_response({"error": f"{type(e).__name__}: {e}"}, status=500)
+
+
+def _status_line(status: int) -> bytes:
+    try:
+        reason = HTTPStatus(status).phrase
+    except ValueError:
+        reason = ""
+    return f"HTTP/1.1 {status} {reason}\r\n".encode("latin-1")
+
+
+def _encode_head(status_line: bytes, headers: dict[str, str]) -> bytes:
+    lines = "".join(f"{k}: {v}\r\n" for k, v in headers.items())
+    return status_line + lines.encode("latin-1") + b"\r\n"
+
+
+async def _read_request(reader: asyncio.StreamReader) -> Request | None:
+    line = await reader.readline()
+    if not line or not line.strip():
+        return None
+    try:
+        method, target, _version = line.decode("latin-1").split()
+    except ValueError:
+        raise HTTPError(400, "Malformed request line")
+
+    headers: dict[str, str] = {}
+    for _ in range(MAX_HEADER_LINES):
+        raw = await reader.readline()
+        if raw in (b"\r\n", b"\n", b""):
+            break
+        name, _, value = raw.decode("latin-1").partition(":")
+        headers[name.strip().lower()] = value.strip()
+    else:
+        raise HTTPError(431, "Too many headers")
+
+    try:
+        length = int(headers.get("content-length", "0") or 0)
+    except ValueError:
+        raise HTTPError(400, "Invalid Content-Length")
+    if length < 0:
+        raise HTTPError(400, "Invalid Content-Length")
+    if length > MAX_BODY_BYTES:
+        raise HTTPError(413, "Request body too large")
+    body = await reader.readexactly(length) if length else b""
+
+    parts = urlsplit(target)
+    query = {k: v[-1] for k, v in parse_qs(parts.query).items()}
+    return Request(method.upper(), parts.path, query, headers, body)
+
+
+async def _handle_connection(router: Router, reader: asyncio.StreamReader,
+                             writer: asyncio.StreamWriter):
+    try:
+        while True:
+            try:
+                request = await _read_request(reader)
+            except HTTPError as e:
+                await json_response({"error": e.message}, status=e.status).write(writer, False)
+                break
+            if request is None:
+                break
+            response = await router.dispatch(request)
+            await response.write(writer, request.keep_alive)
+            if not request.keep_alive:
+                break
+    except (ConnectionError, asyncio.IncompleteReadError):
+        pass
+    finally:
+        writer.close()
+
+
+async def serve(router: Router, host: str = "127.0.0.1", port: int = 8000) -> asyncio.AbstractServer:
+    """Start serving `router`; returns the running asyncio server."""
+    return await asyncio.start_server(
+        lambda r, w: _handle_connection(router, r, w), host, port
+    )
@@ -0,0 +1,240 @@
+"""
+Audio Preprocessing Module
+
+Normalizes a recording once into the format Whisper wants: mono, 16 kHz,
+int16 PCM. The browser recorder delivers 48 kHz 32-bit audio; downmixing,
+polyphase resampling and dtype conversion happen here with NumPy, and both
+the playback WAV and the ASR input are derived from the same buffer.
+
+Compressed uploads (opus/ogg/mp3/m4a/webm/flac) are stream-decoded with
+PyAV, frame by frame through libswresample, straight into a 16 kHz float32
+buffer: no intermediate WAV and no ffmpeg subprocess.
+"""
+
+import io
+import wave
+from dataclasses import dataclass
+from functools import lru_cache
+from math import gcd
+from typing import BinaryIO, Iterator
+
+import av
+import numpy as np
+
+
+TARGET_SAMPLE_RATE = 16000
+
+# Output samples processed per block in the polyphase filter (bounds memory)
+_BLOCK = 16384
+
+
+@dataclass
+class PreparedAudio:
+    """A recording normalized to mono 16 kHz int16 PCM."""
+    samples: np.ndarray
+    sample_rate: int = TARGET_SAMPLE_RATE
+
+    @property
+    def duration(self) -> float:
+        """Length in seconds."""
+        return len(self.samples) / self.sample_rate
+
+    def __len__(self) -> int:
+        """Length in milliseconds, like pydub's AudioSegment."""
+        return int(self.duration * 1000)
+
+    def to_float32(self) -> np.ndarray:
+        """Samples scaled to [-1, 1], as faster-whisper expects."""
+        return self.samples.astype(np.float32) / 32768.0
+
+    def wav_bytes(self) -> bytes:
+        """Encode the buffer as an in-memory WAV file for playback."""
+        buf = io.BytesIO()
+        with wave.open(buf, "wb") as wf:
+            wf.setnchannels(1)
+            wf.setsampwidth(2)
+            wf.setframerate(self.sample_rate)
+            wf.writeframes(self.samples.tobytes())
+        return buf.getvalue()
+
+
+def pcm_to_float32(raw: bytes, sample_width: int, channels: int = 1) -> np.ndarray:
+    """
+    Decode interleaved little-endian PCM bytes to float32 in [-1, 1].
+
+    Returns an array of shape (frames, channels).
+    """
+    if sample_width == 1:
+        x = (np.frombuffer(raw, dtype=np.uint8).astype(np.float32) - 128.0) / 128.0
+    elif sample_width == 2:
+        x = np.frombuffer(raw, dtype="<i2").astype(np.float32) / 32768.0
+    elif sample_width == 3:
+        b = np.frombuffer(raw, dtype=np.uint8).reshape(-1, 3).astype(np.int32)
+        ints = b[:, 0] | (b[:, 1] << 8) | (b[:, 2] << 16)
+        ints = np.where(ints >= 1 << 23, ints - (1 << 24), ints)
+        x = ints.astype(np.float32) / float(1 << 23)
+    elif sample_width == 4:
+        x = np.frombuffer(raw, dtype="<i4").astype(np.float32) / float(1 << 31)
+    else:
+        raise ValueError(f"Unsupported sample width: {sample_width}")
+    return x.reshape(-1, channels)
+
+
+def downmix(x: np.ndarray) -> np.ndarray:
+    """Average (frames, channels) down to mono."""
+    if x.ndim == 1:
+        return x
+    if x.shape[1] == 1:
+        return x[:, 0]
+    return x.mean(axis=1, dtype=np.float32)
+
+
+@lru_cache(maxsize=16)
+def _polyphase_filter(up: int, down: int) -> np.ndarray:
+    """
+    Kaiser-windowed sinc low-pass split into `up` phases.
+
+    Returns an array of shape (up, taps) where row p holds h[p::up].
+    """
+    max_rate = max(up, down)
+    half_len = 10 * max_rate
+    n = np.arange(-half_len, half_len + 1, dtype=np.float64)
+    cutoff = 0.5 / max_rate
+    h = 2 * cutoff * np.sinc(2 * cutoff * n) * np.kaiser(len(n), 5.0)
+    h *= up / h.sum()
+
+    taps = -(-len(h) // up)
+    h = np.pad(h, (0, taps * up - len(h)))
+    return np.ascontiguousarray(h.reshape(taps, up).T).astype(np.float32)
+
+
+def resample_poly(x: np.ndarray, orig_rate: int, new_rate: int) -> np.ndarray:
+    """
+    Resample a mono float32 signal by the rational factor new_rate/orig_rate.
+
+    Equivalent to upsampling by `up`, low-pass filtering and keeping every
+    `down`-th sample, but only the filter taps that hit non-zero input are
+    ever evaluated.
+    """
+    g = gcd(orig_rate, new_rate)
+    up, down = new_rate // g, orig_rate // g
+    if up == down:
+        return x.astype(np.float32, copy=False)
+
+    phases = _polyphase_filter(up, down)
+    taps = phases.shape[1]
+    # The filter is centred on tap `half_len`; offset so output isn't delayed
+    delay = 10 * max(up, down)
+
+    xp = np.concatenate([np.zeros(taps, np.float32), x.astype(np.float32, copy=False),
+                         np.zeros(taps + 1, np.float32)])
+    n_out = -(-len(x) * up // down)
+    k = np.arange(taps)
+    out = np.empty(n_out, dtype=np.float32)
+
+    for start in range(0, n_out, _BLOCK):
+        n = np.arange(start, min(start + _BLOCK, n_out), dtype=np.int64)
+        t = n * down + delay
+        m, p = t // up, t % up
+        idx = np.minimum(m[:, None] - k[None, :] + taps, len(xp) - 1)
+        out[start:start + len(n)] = np.einsum("nk,nk->n", xp[idx], phases[p])
+
+    return out
+
+
+def to_int16(x: np.ndarray) -> np.ndarray:
+    """Convert float samples in [-1, 1] to int16 with clipping."""
+    return np.clip(np.rint(x * 32767.0), -32768, 32767).astype(np.int16)
+
+
+def prepare_pcm(raw: bytes, sample_rate: int, sample_width: int, channels: int = 1,
+                target_rate: int = TARGET_SAMPLE_RATE) -> PreparedAudio:
+    """Normalize raw interleaved PCM bytes to mono 16 kHz int16."""
+    mono = downmix(pcm_to_float32(raw, sample_width, channels))
+    return PreparedAudio(to_int16(resample_poly(mono, sample_rate, target_rate)), target_rate)
+
+
+def decode_wav(data: bytes, target_rate: int = TARGET_SAMPLE_RATE) -> PreparedAudio:
+    """Normalize an in-memory WAV file (e.g. an uploaded request body)."""
+    try:
+        with wave.open(io.BytesIO(data), "rb") as wf:
+            raw = wf.readframes(wf.getnframes())
+            return prepare_pcm(raw, wf.getframerate(), wf.getsampwidth(), wf.getnchannels(), target_rate)
+    except (wave.Error, EOFError) as e:
+        raise ValueError(f"Not a PCM WAV file: {e}")
+
+
+def _to_mono(frame: av.AudioFrame) -> np.ndarray:
+    """Packed float32 frame -> mono samples."""
+    return downmix(frame.to_ndarray().reshape(-1, len(frame.layout.channels)))
+
+
+def iter_decoded(source: str | BinaryIO | bytes, target_rate: int = TARGET_SAMPLE_RATE) -> Iterator[np.ndarray]:
+    """
+    Stream-decode any audio file PyAV can open into mono float32 blocks at `target_rate`.
+
+    Only one decoded frame is held at a time, so arbitrarily long files
+    can be consumed in bounded memory.
+    """
+    if isinstance(source, (bytes, bytearray, memoryview)):
+        source = io.BytesIO(source)
+    try:
+        with av.open(source, mode="r", metadata_errors="ignore") as container:
+            if not container.streams.audio:
+                raise ValueError("No audio stream")
+            # Resample in the source layout and downmix here: swresample's mono
+            # rematrix for float output sums the channels at -3 dB each (+3 dB
+            # louder than the mean that decode_wav uses, and can exceed 1.0)
+            resampler = av.AudioResampler(format="flt", rate=target_rate)
+            # Decode packet by packet: a decode() generator that raises is finished, so
+            # errors are caught per packet and a corrupt one only loses its own frames
+            for packet in container.demux(audio=0):
+                try:
+                    frames = packet.decode()
+                except av.error.InvalidDataError:
+                    continue
+                for frame in frames:
+                    # Container timestamps may jump; the resampler only needs the samples
+                    frame.pts = None
+                    for out in resampler.resample(frame):
+                        yield _to_mono(out)
+            for out in resampler.resample(None):
+                yield _to_mono(out)
+    except av.error.FFmpegError as e:
+        raise ValueError(f"Could not decode audio: {e}")
+
+
+def decode_audio_file(source: str | BinaryIO | bytes, target_rate: int = TARGET_SAMPLE_RATE) -> np.ndarray:
+    """Decode a whole file (path, file object or bytes) into one 16 kHz mono float32 array."""
+    buf = np.empty(target_rate * 60, dtype=np.float32)
+    n = 0
+    for block in iter_decoded(source, target_rate):
+        if n + len(block) > len(buf):
+            buf = np.resize(buf, max(2 * len(buf), n + len(block)))
+        buf[n:n + len(block)] = block
+        n += len(block)
+    return buf[:n].copy() if n < len(buf) // 2 else buf[:n]
+
+
+def decode_upload(data: bytes, target_rate: int = TARGET_SAMPLE_RATE) -> PreparedAudio:
+    """Normalize an uploaded recording: PCM WAV directly, anything else through PyAV."""
+    if data[:4] == b"RIFF" and data[8:12] == b"WAVE":
+        try:
+            return decode_wav(data, target_rate)
+        except ValueError:
+            # Not PCM (e.g. a compressed WAVE_FORMAT_MPEG); let PyAV handle it
+            pass
+    return PreparedAudio(to_int16(decode_audio_file(data, target_rate)), target_rate)
+
+
+def prepare_audio(audio, target_rate: int = TARGET_SAMPLE_RATE) -> PreparedAudio:
+    """
+    Normalize a pydub AudioSegment (as returned by audiorecorder) once.
+
+    Use the result for both `st.audio(prepared.wav_bytes())` and
+    transcription instead of exporting the segment twice.
+    """
+    if isinstance(audio, PreparedAudio):
+        return audio
+    return prepare_pcm(audio.raw_data, audio.frame_rate, audio.sample_width,
+                       audio.channels, target_rate)
@@ -0,0 +1,184 @@
+"""
+Batch Module
+
+Offline entry point that runs a directory of recordings through the full
+pipeline (transcribe -> correct -> answer) and writes one JSON record per
+file to a JSONL output.
+
+- Whisper runs across a process pool, one model per worker process
+- Correction and answer calls run concurrently up to --max-in-flight
+- Records are appended and flushed as each file finishes, so progress
+  survives interruption; re-running skips files already in the output
+
+Usage:
+    python batch.py --agent snowflake in_dir/ out.jsonl
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+from concurrent.futures import FIRST_COMPLETED, Future, ProcessPoolExecutor, ThreadPoolExecutor, wait
+from dataclasses import asdict, replace
+from pathlib import Path
+
+from agent_manager import DomainAgent, get_agent_manager
+from transcription import AsrProfile, AsrStats, Transcript, init_asr_worker, transcribe_in_worker
+
+
+AUDIO_EXTENSIONS = {".wav", ".mp3", ".m4a", ".ogg", ".opus", ".flac", ".webm"}
+
+
+def _transcribe_file(path: str) -> tuple[dict, Transcript]:
+    """Transcribe one file in a worker process; returns the record fields and the Transcript."""
+    transcript = transcribe_in_worker(path)
+    # TranscriptionInfo holds the whole language probability table; only the duration is kept
+    duration = transcript.info.duration
+    transcript.info = None
+    return {"raw_transcript": transcript.text, "duration_s": duration, "asr_s": transcript.decode_s,
+            "asr_model": transcript.model, "escalated": transcript.escalated}, transcript
+
+
+def _correct_and_answer(agent: DomainAgent, transcript: Transcript, correct: bool) -> dict:
+    """Run the LLM stages for one transcript in a worker thread."""
+    start = time.perf_counter()
+    raw_text = transcript.text
+    corrected = agent.correct_transcript(raw_text, transcript) if correct else raw_text
+    skipped = not agent.last_plan.needs_llm if correct else None
+    answer = agent.answer(corrected)
+    record = {"corrected": corrected, "correction_skipped": skipped, "answer": answer,
+              "llm_s": time.perf_counter() - start, "stats": asdict(agent.last_stats)}
+    # Neither call raises on an LLM failure; flag the record so a resumed run retries the file
+    errors = []
+    if correct and agent.last_plan.error:
+        errors.append(f"correct: {agent.last_plan.error}")
+    if agent.last_stats.error:
+        errors.append(f"answer: {agent.last_stats.error}")
+    if errors:
+        record["error"] = "; ".join(errors)
+    return record
+
+
+def find_audio_files(in_dir: Path) -> list[Path]:
+    """All audio files under a directory, in a stable order."""
+    return sorted(p for p in in_dir.rglob("*")
+                  if p.is_file() and p.suffix.lower() in AUDIO_EXTENSIONS)
+
+
+def completed_files(out_path: Path) -> set[str]:
+    """Files that already have a successful record in the output."""
+    done = set()
+    if not out_path.exists():
+        return done
+    with open(out_path, "r", encoding="utf-8") as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except ValueError:
+                # A partial last line from an interrupted run
+                continue
+            if "file" in record and not record.get("error"):
+                done.add(record["file"])
+    return done
+
+
+def run_batch(agent_id: str, in_dir: Path, out_path: Path, asr_workers: int,
+              max_in_flight: int, profile: AsrProfile | None = None, correct: bool = True) -> int:
+    """
+    Process every pending file; returns the number of records written.
+
+    Whisper settings come from the agent's ASR profile unless `profile` is given.
+    """
+    agent = get_agent_manager().get_domain_agent(agent_id)
+    profile = profile or agent.config.asr
+    files = find_audio_files(in_dir)
+    done = completed_files(out_path)
+    pending = [p for p in files if p.relative_to(in_dir).as_posix() not in done]
+    print(f"{len(files)} files, {len(files) - len(pending)} already done, {len(pending)} to process",
+          file=sys.stderr)
+    if not pending:
+        return 0
+
+    written = 0
+    out_path.parent.mkdir(parents=True, exist_ok=True)
+    with open(out_path, "a", encoding="utf-8") as out, \
+            ProcessPoolExecutor(max_workers=asr_workers, initializer=init_asr_worker,
+                                initargs=(profile, agent.config.decoding_bias)) as asr_pool, \
+            ThreadPoolExecutor(max_workers=max_in_flight) as llm_pool:
+
+        asr_futures: dict[Future, Path] = {asr_pool.submit(_transcribe_file, str(p)): p for p in pending}
+        llm_futures: dict[Future, dict] = {}
+        asr_stats = AsrStats()
+
+        while asr_futures or llm_futures:
+            finished, _ = wait(list(asr_futures) + list(llm_futures), return_when=FIRST_COMPLETED)
+            for future in finished:
+                if future in asr_futures:
+                    path = asr_futures.pop(future)
+                    record = {"file": path.relative_to(in_dir).as_posix(), "agent": agent_id}
+                    try:
+                        fields, transcript = future.result()
+                        record.update(fields)
+                        asr_stats.record(transcript)
+                    except Exception as e:
+                        record["error"] = f"transcribe: {e}"
+                        _write(out, record)
+                        written += 1
+                        continue
+                    llm_futures[llm_pool.submit(_correct_and_answer, agent,
+                                                transcript, correct)] = record
+                else:
+                    record = llm_futures.pop(future)
+                    try:
+                        record.update(future.result())
+                    except Exception as e:
+                        record["error"] = f"llm: {e}"
+                    _write(out, record)
+                    written += 1
+                    print(f"[{written}/{len(pending)}] {record['file']}", file=sys.stderr)
+
+    if profile.cascade and asr_stats.requests:
+        print(f"Cascade: {asr_stats.escalation_rate:.0%} escalated to {profile.model_size}, "
+              f"avg ASR {asr_stats.avg_latency_s:.2f}s "
+              f"(draft only {asr_stats.avg_draft_latency_s:.2f}s)", file=sys.stderr)
+    return written
+
+
+def _write(out, record: dict):
+    out.write(json.dumps(record, ensure_ascii=False) + "\n")
+    out.flush()
+
+
+def main():
+    cores = os.cpu_count() or 1
+    parser = argparse.ArgumentParser(description="Run a directory of recordings through the pipeline")
+    parser.add_argument("in_dir", type=Path, help="Directory of audio files")
+    parser.add_argument("out", type=Path, help="JSONL output (appended to; existing files are skipped)")
+    parser.add_argument("--agent", required=True, help="Agent id (folder name under agents/)")
+    parser.add_argument("--model", help="Whisper model size (default: the agent's ASR profile)")
+    parser.add_argument("--compute-type", help="CTranslate2 compute type, e.g. int8")
+    parser.add_argument("--asr-workers", type=int, default=cores, help="Whisper worker processes")
+    parser.add_argument("--cpu-threads", type=int, default=1, help="Threads per Whisper worker")
+    parser.add_argument("--max-in-flight", type=int, default=8, help="Concurrent LLM pipelines")
+    parser.add_argument("--no-correct", action="store_true", help="Skip transcript correction")
+    parser.add_argument("--no-cascade", action="store_true", help="Ignore the profile's draft-model cascade")
+    args = parser.parse_args()
+
+    if not args.in_dir.is_dir():
+        parser.error(f"Not a directory: {args.in_dir}")
+    config = get_agent_manager().get_agent(args.agent)
+    if config is None:
+        parser.error(f"Unknown agent: {args.agent}")
+
+    # Several worker processes share the cores, so each gets few threads
+    profile = replace(config.asr, cpu_threads=args.cpu_threads,
+                      model_size=args.model or config.asr.model_size,
+                      compute_type=args.compute_type or config.asr.compute_type,
+                      cascade=None if args.no_cascade else config.asr.cascade)
+    run_batch(args.agent, args.in_dir, args.out, args.asr_workers, args.max_in_flight,
+              profile, correct=not args.no_correct)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,299 @@
+"""
+ASR Benchmark Module
+
+Runs a fixture corpus through faster-whisper for every combination of
+model size, compute type, beam size, CPU thread count and vocabulary bias
+mode, starting from the agent's ASR profile, and reports:
+
+- cold load time (WhisperModel construction)
+- real-time factor (decode time / audio time) and per-file latency p50/p95
+- peak RSS of the process that loaded and ran the model
+- word error rate against reference transcripts
+- term accuracy for the agent's terms.yaml vocabulary, raw and after
+  local term snapping
+- correction skip rate: transcripts the term snapper settles on its own,
+  so no LLM correction call would be made
+- for cascaded configurations (--draft-models), how often the draft
+  decode was escalated to the full model
+
+Each configuration runs in a fresh process so peak RSS and load time are
+not polluted by earlier models.
+
+Corpus layout: a directory of WAV files, each with a reference transcript
+in a sibling .txt file (call_01.wav + call_01.txt).
+
+Usage:
+    python bench_asr.py fixtures/ --agent snowflake --models tiny base small \\
+        --compute-types int8 float32 --beam-sizes 1 5 --vocab-bias none initial_prompt \\
+        --json results.json
+
+    # Tune cascade thresholds: small decodes only what a tiny draft gets wrong
+    python bench_asr.py fixtures/ --models small --compute-types int8 --beam-sizes 5 \\
+        --draft-models none tiny base --min-avg-logprob -0.5 --max-compression-ratio 2.4
+"""
+
+import argparse
+import itertools
+import json
+import multiprocessing
+import re
+import resource
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import asdict, dataclass, replace
+from pathlib import Path
+
+import numpy as np
+
+from agent_manager import get_agent_manager
+from audio_preprocessing import decode_wav
+from term_snapper import TermSnapper
+from transcription import AsrProfile, CascadeSettings
+from vocab_bias import DecodingBias
+
+
+@dataclass
+class BenchConfig:
+    """One point in the benchmark grid."""
+    model: str
+    compute_type: str
+    beam_size: int
+    cpu_threads: int
+    vocab_bias: str = "none"
+    draft_model: str = "none"
+
+
+@dataclass
+class BenchResult:
+    """Measurements for one configuration over the whole corpus."""
+    config: BenchConfig
+    files: int = 0
+    audio_s: float = 0.0
+    load_s: float = 0.0
+    decode_s: float = 0.0
+    latency_p50_s: float = 0.0
+    latency_p95_s: float = 0.0
+    peak_rss_mb: float = 0.0
+    wer: float = 0.0
+    term_accuracy: float | None = None
+    term_accuracy_snapped: float | None = None
+    skip_rate: float = 0.0
+    escalation_rate: float | None = None
+    error: str | None = None
+
+    @property
+    def rtf(self) -> float:
+        return self.decode_s / self.audio_s if self.audio_s else 0.0
+
+    def to_dict(self) -> dict:
+        return {**asdict(self), "rtf": self.rtf}
+
+
+# ---------------------------
+# Scoring
+# ---------------------------
+def normalize_words(text: str) -> list[str]:
+    """Lowercase alphanumeric words, the form WER and term matching compare."""
+    return re.findall(r"[a-z0-9]+", text.lower())
+
+
+def edit_distance(ref: list[str], hyp: list[str]) -> int:
+    """Word-level Levenshtein distance."""
+    prev = list(range(len(hyp) + 1))
+    for i, r in enumerate(ref, 1):
+        cur = [i] + [0] * len(hyp)
+        for j, h in enumerate(hyp, 1):
+            cur[j] = min(prev[j] + 1, cur[j - 1] + 1, prev[j - 1] + (r != h))
+        prev = cur
+    return prev[-1]
+
+
+def _contains(words: list[str], phrase: list[str]) -> bool:
+    n = len(phrase)
+    return any(words[i:i + n] == phrase for i in range(len(words) - n + 1))
+
+
+def term_hits(terms: list[list[str]], ref: str, hyp: str) -> tuple[int, int]:
+    """(terms in the reference also present in the hypothesis, terms in the reference)."""
+    ref_words, hyp_words = normalize_words(ref), normalize_words(hyp)
+    hits = total = 0
+    for phrase in terms:
+        if phrase and _contains(ref_words, phrase):
+            total += 1
+            hits += _contains(hyp_words, phrase)
+    return hits, total
+
+
+# ---------------------------
+# Corpus
+# ---------------------------
+def load_corpus(corpus_dir: Path) -> list[tuple[str, str]]:
+    """(wav path, reference text) pairs for every WAV with a sibling .txt."""
+    pairs = []
+    for wav in sorted(corpus_dir.glob("*.wav")):
+        ref = wav.with_suffix(".txt")
+        if ref.exists():
+            pairs.append((str(wav), ref.read_text(encoding="utf-8").strip()))
+    return pairs
+
+
+def _peak_rss_mb() -> float:
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Kilobytes on Linux, bytes on macOS
+    return rss / (1024 * 1024) if sys.platform == "darwin" else rss / 1024
+
+
+def run_config(config: BenchConfig, base: AsrProfile, bias: DecodingBias,
+               corpus: list[tuple[str, str]], vocab: list[str], cascade: CascadeSettings) -> BenchResult:
+    """Benchmark one configuration; meant to run in its own process."""
+    from transcription import AsrStats, get_whisper_model, transcribe_with_profile
+
+    result = BenchResult(config)
+    try:
+        audio = [decode_wav(Path(path).read_bytes()) for path, _ in corpus]
+        profile = replace(base, model_size=config.model, compute_type=config.compute_type,
+                          beam_size=config.beam_size, cpu_threads=config.cpu_threads,
+                          vocab_bias=config.vocab_bias,
+                          cascade=None if config.draft_model == "none"
+                          else replace(cascade, draft_model=config.draft_model))
+
+        # Fresh process: these calls construct the model(s)
+        start = time.perf_counter()
+        if profile.draft_profile is not None:
+            get_whisper_model(profile.draft_profile)
+        get_whisper_model(profile)
+        result.load_s = time.perf_counter() - start
+
+        # One untimed decode so lazy initialization doesn't land on the first file
+        transcribe_with_profile(audio[0], profile, bias)
+
+        snapper = TermSnapper(vocab)
+        terms = [normalize_words(t) for t in snapper.terms]
+        latencies, errors, ref_words = [], 0, 0
+        hits = snapped_hits = term_total = skipped = 0
+        stats = AsrStats()
+        for prepared, (_, ref) in zip(audio, corpus):
+            transcript = transcribe_with_profile(prepared, profile, bias, stats)
+            hyp = transcript.text
+            latencies.append(transcript.decode_s)
+
+            ref_norm = normalize_words(ref)
+            errors += edit_distance(ref_norm, normalize_words(hyp))
+            ref_words += len(ref_norm)
+
+            h, total = term_hits(terms, ref, hyp)
+            hits += h
+            term_total += total
+            snapped = snapper.snap(hyp)
+            snapped_hits += term_hits(terms, ref, snapped.text)[0]
+            skipped += snapped.confident
+
+        result.files = len(corpus)
+        result.audio_s = sum(p.duration for p in audio)
+        result.decode_s = sum(latencies)
+        result.latency_p50_s = float(np.percentile(latencies, 50))
+        result.latency_p95_s = float(np.percentile(latencies, 95))
+        result.wer = errors / ref_words if ref_words else 0.0
+        result.skip_rate = skipped / len(corpus)
+        if profile.cascade:
+            result.escalation_rate = stats.escalation_rate
+        if term_total:
+            result.term_accuracy = hits / term_total
+            result.term_accuracy_snapped = snapped_hits / term_total
+    except Exception as e:
+        result.error = f"{type(e).__name__}: {e}"
+    result.peak_rss_mb = _peak_rss_mb()
+    return result
+
+
+def run_benchmark(configs: list[BenchConfig], base: AsrProfile, bias: DecodingBias,
+                  corpus: list[tuple[str, str]], vocab: list[str],
+                  cascade: CascadeSettings | None = None) -> list[BenchResult]:
+    results = []
+    cascade = cascade or base.cascade or CascadeSettings()
+    ctx = multiprocessing.get_context("spawn")
+    for config in configs:
+        print(f"Running {config.model} {config.compute_type} beam={config.beam_size} "
+              f"threads={config.cpu_threads} bias={config.vocab_bias} draft={config.draft_model}...",
+              file=sys.stderr)
+        with ProcessPoolExecutor(max_workers=1, mp_context=ctx) as pool:
+            results.append(pool.submit(run_config, config, base, bias, corpus, vocab, cascade).result())
+    return results
+
+
+def format_table(results: list[BenchResult]) -> str:
+    def pct(value):
+        return "-" if value is None else f"{value:.1%}"
+
+    header = ["model", "compute", "beam", "threads", "bias", "draft", "load s", "RTF", "p50 s", "p95 s",
+              "RSS MB", "WER", "terms", "snapped", "skip", "escalated"]
+    rows = [header]
+    for r in results:
+        c = r.config
+        if r.error:
+            rows.append([c.model, c.compute_type, str(c.beam_size), str(c.cpu_threads), c.vocab_bias,
+                         c.draft_model, r.error.splitlines()[0]])
+            continue
+        rows.append([c.model, c.compute_type, str(c.beam_size), str(c.cpu_threads), c.vocab_bias,
+                     c.draft_model, f"{r.load_s:.2f}", f"{r.rtf:.3f}", f"{r.latency_p50_s:.2f}",
+                     f"{r.latency_p95_s:.2f}", f"{r.peak_rss_mb:.0f}", pct(r.wer),
+                     pct(r.term_accuracy), pct(r.term_accuracy_snapped), pct(r.skip_rate),
+                     pct(r.escalation_rate)])
+    widths = [max(len(row[i]) for row in rows if i < len(row) and len(row) == len(header))
+              for i in range(len(header))]
+    lines = []
+    for row in rows:
+        if len(row) != len(header):
+            lines.append("  ".join(row[:6]) + "  " + row[6])
+        else:
+            lines.append("  ".join(cell.ljust(w) for cell, w in zip(row, widths)))
+    return "\n".join(lines)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark faster-whisper configurations")
+    parser.add_argument("corpus", type=Path, help="Directory of .wav files with sibling .txt references")
+    parser.add_argument("--agent", default="snowflake", help="Agent whose terms.yaml is scored")
+    parser.add_argument("--models", nargs="+", default=["tiny", "base", "small"])
+    parser.add_argument("--compute-types", nargs="+", default=["int8", "int8_float32", "float32"])
+    parser.add_argument("--beam-sizes", nargs="+", type=int, default=[1, 5])
+    parser.add_argument("--cpu-threads", nargs="+", type=int, default=[4])
+    parser.add_argument("--vocab-bias", nargs="+", default=["none", "initial_prompt"],
+                        choices=["none", "initial_prompt", "hotwords"])
+    parser.add_argument("--draft-models", nargs="+", default=["none"],
+                        help="Cascade draft models to try in front of each model ('none' = no cascade)")
+    parser.add_argument("--min-avg-logprob", type=float, help="Cascade: escalate below this segment avg_logprob")
+    parser.add_argument("--max-compression-ratio", type=float, help="Cascade: escalate above this ratio")
+    parser.add_argument("--json", type=Path, help="Write results as JSON to this path")
+    args = parser.parse_args()
+
+    corpus = load_corpus(args.corpus)
+    if not corpus:
+        parser.error(f"No .wav files with .txt references in {args.corpus}")
+    agent = get_agent_manager().get_agent(args.agent)
+    if agent is None:
+        parser.error(f"Unknown agent: {args.agent}")
+
+    configs = [BenchConfig(*combo) for combo in itertools.product(
+        args.models, args.compute_types, args.beam_sizes, args.cpu_threads, args.vocab_bias,
+        args.draft_models)]
+    # Thresholds start from the agent's cascade settings; flags override them
+    cascade = agent.asr.cascade or CascadeSettings()
+    if args.min_avg_logprob is not None:
+        cascade = replace(cascade, min_avg_logprob=args.min_avg_logprob)
+    if args.max_compression_ratio is not None:
+        cascade = replace(cascade, max_compression_ratio=args.max_compression_ratio)
+    results = run_benchmark(configs, agent.asr, agent.decoding_bias, corpus, agent.term_snapper.terms,
+                            cascade)
+
+    print(format_table(results))
+    if args.json:
+        args.json.write_text(json.dumps({
+            "corpus": str(args.corpus), "files": len(corpus), "agent": args.agent,
+            "results": [r.to_dict() for r in results],
+        }, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,66 @@
+"""
+Bounded Stage Module
+
+Concurrency limit with a bounded wait queue, shared by the HTTP service
+(one stage per pipeline step) and the ASR daemon. Once every slot is busy
+and the queue is full, new requests are refused with `StageFullError`
+instead of piling up; each caller turns that into its own "retry later"
+reply (503 with Retry-After, or the daemon's busy header).
+"""
+
+import asyncio
+from contextlib import asynccontextmanager
+
+
+class StageFullError(RuntimeError):
+    """Every slot of a stage is busy and its wait queue is full."""
+
+    def __init__(self, message: str, retry_after: float):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class BoundedStage:
+    """
+    Concurrency limit with a bounded wait queue for one pipeline stage.
+    """
+
+    def __init__(self, name: str, concurrency: int, max_queue: int, retry_after: float = 1.0):
+        self.name = name
+        self.max_queue = max_queue
+        self.retry_after = retry_after
+        self.active = 0
+        self.waiting = 0
+        self.rejected = 0
+        self._sem = asyncio.Semaphore(concurrency)
+
+    def check_capacity(self):
+        """Raise StageFullError if every slot is busy and the wait queue is full."""
+        if self._sem.locked() and self.waiting >= self.max_queue:
+            self.rejected += 1
+            raise StageFullError(f"{self.name} queue is full", self.retry_after)
+
+    async def acquire(self):
+        """Take a slot, waiting in the queue if needed; pair with release()."""
+        self.check_capacity()
+        self.waiting += 1
+        try:
+            await self._sem.acquire()
+        finally:
+            self.waiting -= 1
+        self.active += 1
+
+    def release(self):
+        self.active -= 1
+        self._sem.release()
+
+    @asynccontextmanager
+    async def slot(self):
+        await self.acquire()
+        try:
+            yield
+        finally:
+            self.release()
+
+    def status(self) -> dict:
+        return {"active": self.active, "waiting": self.waiting, "rejected": self.rejected}
@@ -0,0 +1,199 @@
+"""
+Knowledge Index Module
+
+Splits an agent's knowledge base Markdown into retrievable chunks and
+scores them against a question with BM25, so only the most relevant
+sections are sent to the LLM instead of the whole file.
+
+Chunking follows the knowledge.md layout:
+- Each `## ` heading starts a new section
+- Each `Q:`/`A:` pair inside a section becomes its own chunk
+- Section text outside any Q/A pair becomes a chunk of its own
+"""
+
+import math
+import re
+from collections import Counter
+from dataclasses import dataclass, field
+
+
+# Rough characters-per-token ratio used to budget prompt size without a tokenizer
+CHARS_PER_TOKEN = 4
+
+# Chunks larger than this are split on blank lines
+MAX_CHUNK_CHARS = 2000
+
+STOPWORDS = frozenset("""
+a an and are as at be by can do does for from how i in is it its me my of on or
+our that the their this to was what when where which who why will with you your
+""".split())
+
+_TOKEN_RE = re.compile(r"[a-z0-9]+")
+_QUESTION_RE = re.compile(r"^\s*Q:", re.MULTILINE)
+
+
+def tokenize(text: str) -> list[str]:
+    """Lowercase word tokens with stopwords removed."""
+    return [t for t in _TOKEN_RE.findall(text.lower()) if t not in STOPWORDS]
+
+
+def estimate_tokens(text: str) -> int:
+    """Approximate LLM token count for a piece of text."""
+    return (len(text) + CHARS_PER_TOKEN - 1) // CHARS_PER_TOKEN
+
+
+@dataclass
+class Chunk:
+    """A retrievable piece of the knowledge base."""
+    section: str
+    text: str
+
+    @property
+    def tokens(self) -> int:
+        return estimate_tokens(self.render())
+
+    def render(self) -> str:
+        """Chunk text as it appears in the prompt, prefixed by its section."""
+        if self.section:
+            return f"## {self.section}\n{self.text}"
+        return self.text
+
+
+@dataclass
+class RetrievalResult:
+    """Chunks selected for one question, with prompt size accounting."""
+    chunks: list[Chunk] = field(default_factory=list)
+    scores: list[float] = field(default_factory=list)
+    total_chunks: int = 0
+
+    @property
+    def context(self) -> str:
+        return "\n\n".join(c.render() for c in self.chunks)
+
+    @property
+    def context_chars(self) -> int:
+        return len(self.context)
+
+    @property
+    def context_tokens(self) -> int:
+        return estimate_tokens(self.context)
+
+
+def _split_long(text: str, limit: int = MAX_CHUNK_CHARS) -> list[str]:
+    """Split text on blank lines into pieces no longer than `limit` (where possible)."""
+    if len(text) <= limit:
+        return [text]
+    pieces, current = [], ""
+    for para in re.split(r"\n\s*\n", text):
+        if current and len(current) + len(para) + 2 > limit:
+            pieces.append(current)
+            current = para
+        else:
+            current = f"{current}\n\n{para}" if current else para
+    if current:
+        pieces.append(current)
+    return pieces
+
+
+def chunk_markdown(markdown: str) -> list[Chunk]:
+    """Split knowledge base Markdown into section and Q/A chunks."""
+    chunks: list[Chunk] = []
+    sections = re.split(r"^## +", markdown, flags=re.MULTILINE)
+
+    for i, block in enumerate(sections):
+        if i == 0:
+            # Preamble before the first "## " heading (title, intro)
+            title, body = "", block
+        else:
+            title, _, body = block.partition("\n")
+            title = title.strip()
+
+        starts = [m.start() for m in _QUESTION_RE.finditer(body)]
+        parts = [body[:starts[0]]] if starts else [body]
+        parts += [body[s:e] for s, e in zip(starts, starts[1:] + [len(body)])]
+
+        for part in parts:
+            # Drop horizontal rules between sections
+            part = re.sub(r"^\s*---\s*$", "", part, flags=re.MULTILINE).strip()
+            if not part:
+                continue
+            for piece in _split_long(part):
+                chunks.append(Chunk(section=title, text=piece))
+
+    return chunks
+
+
+class KnowledgeIndex:
+    """
+    BM25 index over knowledge base chunks.
+    """
+
+    def __init__(self, chunks: list[Chunk], k1: float = 1.5, b: float = 0.75):
+        self.chunks = chunks
+        self.k1 = k1
+        self.b = b
+
+        # Section titles are indexed with the chunk so topic words match
+        self._doc_lens: list[int] = []
+        self._postings: dict[str, list[tuple[int, int]]] = {}
+        for idx, chunk in enumerate(chunks):
+            counts = Counter(tokenize(f"{chunk.section}\n{chunk.text}"))
+            self._doc_lens.append(sum(counts.values()))
+            for term, tf in counts.items():
+                self._postings.setdefault(term, []).append((idx, tf))
+
+        n = len(chunks)
+        self._avg_len = (sum(self._doc_lens) / n) if n else 0.0
+        self._idf = {
+            term: math.log(1 + (n - len(p) + 0.5) / (len(p) + 0.5))
+            for term, p in self._postings.items()
+        }
+
+    @classmethod
+    def from_markdown(cls, markdown: str) -> "KnowledgeIndex":
+        return cls(chunk_markdown(markdown))
+
+    def __len__(self) -> int:
+        return len(self.chunks)
+
+    def score(self, query: str) -> dict[int, float]:
+        """BM25 score for every chunk sharing at least one term with the query."""
+        scores: dict[int, float] = {}
+        for term in set(tokenize(query)):
+            idf = self._idf.get(term)
+            if idf is None:
+                continue
+            for idx, tf in self._postings[term]:
+                norm = self.k1 * (1 - self.b + self.b * self._doc_lens[idx] / self._avg_len)
+                scores[idx] = scores.get(idx, 0.0) + idf * tf * (self.k1 + 1) / (tf + norm)
+        return scores
+
+    def search(self, query: str, top_k: int = 6, token_budget: int = 1500) -> RetrievalResult:
+        """
+        Return the best-scoring chunks for a query.
+
+        Chunks are taken in score order until `top_k` chunks are selected. A
+        chunk that would push the total past `token_budget` is skipped and
+        lower-scoring, smaller chunks can still fill the remaining budget.
+        Selected chunks are returned in document order so neighbouring Q/A
+        pairs read naturally.
+        """
+        ranked = sorted(self.score(query).items(), key=lambda kv: (-kv[1], kv[0]))
+
+        picked: list[tuple[int, float]] = []
+        used = 0
+        for idx, score in ranked:
+            if len(picked) >= top_k:
+                break
+            cost = self.chunks[idx].tokens
+            if used + cost > token_budget:
+                continue
+            picked.append((idx, score))
+            used += cost
+
+        picked.sort()
+        return RetrievalResult(
+            chunks=[self.chunks[idx] for idx, _ in picked],
+            scores=[score for _, score in picked],
+            total_chunks=len(self.chunks),
+        )
@@ -0,0 +1,210 @@
+"""
+Load Test Module
+
+Drives DomainAgent at a target concurrency (closed loop) or arrival rate
+(open loop) and reports throughput, latency percentiles and error counts.
+Point it at mock_cerebras.py to stress the pipeline without API quota:
+
+    python mock_cerebras.py --port 8900 &
+    python loadtest.py --agent snowflake --base-url http://127.0.0.1:8900 \\
+        --mode stream --concurrency 64 --requests 2000
+
+Answer caching is disabled unless --cache is given, so every request
+reaches the backend. Failed calls the Cerebras client retries on its own
+show up as latency rather than errors; the mock's /health counts them.
+"""
+
+import argparse
+import asyncio
+import dataclasses
+import json
+import os
+import sys
+import time
+from dataclasses import dataclass, field
+from pathlib import Path
+
+import numpy as np
+
+from agent_manager import AnswerStats, DomainAgent, get_agent_manager
+from answer_cache import AnswerCache
+
+
+MODES = ["answer", "stream", "correct", "pipeline", "single"]
+
+DEFAULT_QUESTIONS = [
+    "how does snow pipe work",
+    "what is time travel in snowflake",
+    "how do I size a virtual warehouse",
+    "what's the difference between a stream and a task",
+    "how does clustering work on large tables",
+    "can I share data with another account",
+    "what is the search optimization service",
+    "how do I load data from S3",
+]
+
+
+@dataclass
+class LoadResult:
+    """Aggregated outcome of a load test run."""
+    mode: str
+    requests: int = 0
+    errors: int = 0
+    wall_s: float = 0.0
+    latencies: list[float] = field(default_factory=list)
+    ttfts: list[float] = field(default_factory=list)
+    error_samples: list[str] = field(default_factory=list)
+
+    @property
+    def throughput(self) -> float:
+        return self.requests / self.wall_s if self.wall_s else 0.0
+
+    def summary(self) -> dict:
+        def pcts(values: list[float]) -> dict | None:
+            if not values:
+                return None
+            arr = np.asarray(values)
+            return {f"p{p}": float(np.percentile(arr, p)) for p in (50, 90, 95, 99)} | \
+                   {"mean": float(arr.mean()), "max": float(arr.max())}
+
+        return {"mode": self.mode, "requests": self.requests, "errors": self.errors,
+                "error_rate": self.errors / self.requests if self.requests else 0.0,
+                "wall_s": self.wall_s, "throughput_rps": self.throughput,
+                "latency_s": pcts(self.latencies), "ttft_s": pcts(self.ttfts),
+                "error_samples": self.error_samples}
+
+
+def build_agent(agent_id: str, base_url: str | None, cache: bool) -> DomainAgent:
+    """A DomainAgent for the load test, with caching off unless requested."""
+    config = get_agent_manager().get_agent(agent_id)
+    if config is None:
+        raise KeyError(f"Unknown agent: {agent_id}")
+    api_key = os.environ.get("CEREBRAS_API_KEY") or ("mock" if base_url else None)
+    if cache:
+        return DomainAgent(config, api_key=api_key, base_url=base_url)
+    # A zero-entry memory cache and a zero semantic threshold never hit
+    return DomainAgent(dataclasses.replace(config, semantic_cache_threshold=0),
+                       api_key=api_key, base_url=base_url,
+                       cache=AnswerCache(db_path=None, max_entries=0))
+
+
+async def one_request(agent: DomainAgent, mode: str, question: str) -> tuple[float | None, str | None]:
+    """Run one request; returns (time to first token or None, error or None)."""
+    start = time.perf_counter()
+    ttft = None
+    if mode == "correct":
+        await agent.acorrect_transcript(question)
+        return None, None
+
+    if mode == "single":
+        # correct_and_answer is sync and last_stats is per thread, so read it in the worker.
+        # asyncio.to_thread's default executor caps how many of these run at once.
+        def single() -> AnswerStats:
+            agent.correct_and_answer(question)
+            return agent.last_stats
+
+        stats = await asyncio.to_thread(single)
+        return None, stats.error
+
+    if mode == "pipeline":
+        question = await agent.acorrect_transcript(question)
+
+    if mode == "answer":
+        _, stats = await agent.aanswer(question)
+    else:
+        stats = AnswerStats()
+        async for _ in agent.aanswer_stream(question, stats):
+            if ttft is None:
+                ttft = time.perf_counter() - start
+
+    return ttft, stats.error
+
+
+async def run_load(agent: DomainAgent, mode: str, questions: list[str], total: int,
+                   concurrency: int, rps: float | None = None) -> LoadResult:
+    """
+    Issue `total` requests with at most `concurrency` in flight.
+
+    Without `rps` a slot starts its next request as soon as the previous
+    one finishes (closed loop). With `rps` requests arrive on a fixed
+    schedule regardless of completions (open loop), and time spent queued
+    for a slot counts towards latency, as it would for a user.
+    """
+    result = LoadResult(mode)
+    sem = asyncio.Semaphore(concurrency)
+
+    async def record(i: int, arrived: float):
+        async with sem:
+            started = time.perf_counter()
+            try:
+                ttft, error = await one_request(agent, mode, questions[i % len(questions)])
+            except Exception as e:
+                ttft, error = None, f"{type(e).__name__}: {e}"
+            latency = time.perf_counter() - (arrived if rps else started)
+        result.requests += 1
+        result.latencies.append(latency)
+        if ttft is not None:
+            result.ttfts.append(ttft)
+        if error:
+            result.errors += 1
+            if len(result.error_samples) < 5:
+                result.error_samples.append(error[:200])
+
+    start = time.perf_counter()
+    tasks = []
+    for i in range(total):
+        if rps:
+            delay = start + i / rps - time.perf_counter()
+            if delay > 0:
+                await asyncio.sleep(delay)
+        tasks.append(asyncio.create_task(record(i, time.perf_counter())))
+    await asyncio.gather(*tasks)
+    result.wall_s = time.perf_counter() - start
+    return result
+
+
+def format_summary(summary: dict) -> str:
+    lines = [f"mode={summary['mode']}  requests={summary['requests']}  errors={summary['errors']} "
+             f"({summary['error_rate']:.1%})  wall={summary['wall_s']:.2f}s  "
+             f"throughput={summary['throughput_rps']:.1f} req/s"]
+    for name in ("latency_s", "ttft_s"):
+        p = summary[name]
+        if p:
+            lines.append(f"{name:<10} p50={p['p50'] * 1000:.0f}ms  p90={p['p90'] * 1000:.0f}ms  "
+                         f"p95={p['p95'] * 1000:.0f}ms  p99={p['p99'] * 1000:.0f}ms  "
+                         f"max={p['max'] * 1000:.0f}ms")
+    for sample in summary["error_samples"]:
+        lines.append(f"error: {sample}")
+    return "\n".join(lines)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load test DomainAgent against a Cerebras-compatible server")
+    parser.add_argument("--agent", default="snowflake")
+    parser.add_argument("--base-url", default=os.environ.get("CEREBRAS_BASE_URL"),
+                        help="Chat-completions server, e.g. http://127.0.0.1:8900 for the mock")
+    parser.add_argument("--mode", choices=MODES, default="stream")
+    parser.add_argument("--concurrency", type=int, default=16, help="Max requests in flight")
+    parser.add_argument("--rps", type=float, default=None, help="Open-loop arrival rate (default: closed loop)")
+    parser.add_argument("--requests", type=int, default=500, help="Total requests")
+    parser.add_argument("--questions", type=Path, help="File with one question per line")
+    parser.add_argument("--cache", action="store_true", help="Leave answer caching on")
+    parser.add_argument("--json", type=Path, help="Write the summary as JSON to this path")
+    args = parser.parse_args()
+
+    questions = DEFAULT_QUESTIONS
+    if args.questions:
+        questions = [q.strip() for q in args.questions.read_text(encoding="utf-8").splitlines() if q.strip()]
+    if not args.base_url:
+        print("Warning: no --base-url; requests go to the real Cerebras API", file=sys.stderr)
+
+    agent = build_agent(args.agent, args.base_url, args.cache)
+    result = asyncio.run(run_load(agent, args.mode, questions, args.requests, args.concurrency, args.rps))
+    summary = result.summary()
+    print(format_summary(summary))
+    if args.json:
+        args.json.write_text(json.dumps(summary, indent=2))
+
+
+if __name__ == "__main__":
+    main()
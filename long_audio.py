@@ -0,0 +1,277 @@
+"""
+Long Audio Module
+
+Transcription of recordings that run minutes to hours (meetings, support
+calls) with the same agent ASR profiles as short voice questions.
+
+- The source (WAV, or opus/mp3/m4a/... stream-decoded with PyAV) is read
+  in --window-s windows, so memory stays bounded no matter how long the
+  recording is
+- Each window is split into chunks of at most --chunk-s at VAD silence
+  boundaries; where there is no pause to cut at, the chunk is hard-cut and
+  the next one starts --overlap-s earlier
+- Chunks are transcribed in parallel across a process pool (one model per
+  worker), with at most two chunks per worker in flight
+- Results are yielded in order as soon as each chunk and all chunks before
+  it are done; words repeated across a hard-cut overlap are dropped when
+  the text is stitched
+
+Usage:
+    python long_audio.py meeting.m4a --agent snowflake --workers 4 --out meeting.txt
+"""
+
+import argparse
+import os
+import sys
+import time
+import wave
+from collections import deque
+from concurrent.futures import Future, ProcessPoolExecutor
+from dataclasses import dataclass, replace
+from typing import Iterator
+
+import numpy as np
+from faster_whisper.vad import VadOptions, get_speech_timestamps
+
+from audio_preprocessing import TARGET_SAMPLE_RATE, downmix, iter_decoded, pcm_to_float32, resample_poly
+from transcription import AsrProfile, AsrStats, Transcript, init_asr_worker, normalize_word, transcribe_in_worker
+from vocab_bias import DecodingBias
+
+
+@dataclass(frozen=True)
+class ChunkingConfig:
+    """How a long recording is read and cut."""
+    chunk_s: float = 30.0
+    # Cuts are only made at pauses after this much of the chunk
+    min_chunk_s: float = 10.0
+    overlap_s: float = 1.0
+    window_s: float = 300.0
+    min_silence_ms: int = 300
+
+
+@dataclass
+class AudioChunk:
+    """A piece of the recording; `overlap_s` of its start repeats the previous chunk."""
+    index: int
+    start_s: float
+    samples: np.ndarray
+    overlap_s: float = 0.0
+
+    @property
+    def end_s(self) -> float:
+        return self.start_s + len(self.samples) / TARGET_SAMPLE_RATE
+
+
+@dataclass
+class ChunkResult:
+    """One transcribed chunk, with times relative to the whole recording."""
+    index: int
+    start_s: float
+    end_s: float
+    text: str
+    transcript: Transcript
+
+
+# ---------------------------
+# Reading and chunking
+# ---------------------------
+def read_windows(path: str, window_s: float = 300.0) -> Iterator[np.ndarray]:
+    """Yield an audio file as consecutive 16 kHz mono float32 windows."""
+    if not path.lower().endswith(".wav"):
+        yield from _decoded_windows(path, window_s)
+        return
+    try:
+        with wave.open(path, "rb") as wf:
+            rate, width, channels = wf.getframerate(), wf.getsampwidth(), wf.getnchannels()
+            frames = int(window_s * rate)
+            while raw := wf.readframes(frames):
+                yield resample_poly(downmix(pcm_to_float32(raw, width, channels)), rate, TARGET_SAMPLE_RATE)
+    except (wave.Error, EOFError) as e:
+        raise ValueError(f"Not a PCM WAV file: {e}")
+
+
+def _decoded_windows(path: str, window_s: float) -> Iterator[np.ndarray]:
+    """Group PyAV's decoded frames into windows of `window_s`."""
+    window = np.empty(int(window_s * TARGET_SAMPLE_RATE), dtype=np.float32)
+    n = 0
+    for block in iter_decoded(path):
+        while len(block):
+            take = min(len(window) - n, len(block))
+            window[n:n + take] = block[:take]
+            n += take
+            block = block[take:]
+            if n == len(window):
+                yield window.copy()
+                n = 0
+    if n:
+        yield window[:n].copy()
+
+
+def _cut_point(audio: np.ndarray, config: ChunkingConfig, vad: VadOptions) -> int | None:
+    """
+    Sample index of the latest pause in `audio` past min_chunk_s, or None.
+
+    Returns -1 if `audio` contains no speech at all.
+    """
+    speech = get_speech_timestamps(audio, vad)
+    if not speech:
+        return -1
+    min_cut = int(config.min_chunk_s * TARGET_SAMPLE_RATE)
+    gaps = [(a["end"], b["start"]) for a, b in zip(speech, speech[1:])]
+    # Trailing silence counts as a pause too
+    if len(audio) - speech[-1]["end"] >= config.min_silence_ms * TARGET_SAMPLE_RATE // 1000:
+        gaps.append((speech[-1]["end"], len(audio)))
+    for end, start in reversed(gaps):
+        cut = (end + start) // 2
+        if cut >= min_cut:
+            return cut
+    return None
+
+
+def split_chunks(windows: Iterator[np.ndarray], config: ChunkingConfig | None = None) -> Iterator[AudioChunk]:
+    """Cut a stream of 16 kHz windows into chunks at pauses; silent chunks are skipped."""
+    config = config or ChunkingConfig()
+    vad = VadOptions(min_silence_duration_ms=config.min_silence_ms, speech_pad_ms=100)
+    max_len = int(config.chunk_s * TARGET_SAMPLE_RATE)
+    overlap = int(config.overlap_s * TARGET_SAMPLE_RATE)
+    buf = np.zeros(0, dtype=np.float32)
+    buf_start = 0
+    pending_overlap = 0
+    index = 0
+
+    def cuts(final: bool) -> Iterator[AudioChunk]:
+        nonlocal buf, buf_start, pending_overlap, index
+        while len(buf) > max_len or (final and len(buf)):
+            candidate = buf[:max_len]
+            cut = _cut_point(candidate, config, vad)
+            next_overlap = 0
+            if cut is None:
+                # No pause: hard cut, and let the next chunk re-hear the boundary
+                cut = len(candidate)
+                next_overlap = overlap if len(buf) > cut else 0
+            if cut != -1:
+                yield AudioChunk(index, buf_start / TARGET_SAMPLE_RATE, candidate[:cut].copy(),
+                                 pending_overlap / TARGET_SAMPLE_RATE)
+                index += 1
+            else:
+                cut = len(candidate)
+            advance = cut - next_overlap
+            buf, buf_start, pending_overlap = buf[advance:], buf_start + advance, next_overlap
+
+    for window in windows:
+        buf = np.concatenate([buf, window])
+        yield from cuts(final=False)
+    yield from cuts(final=True)
+
+
+# ---------------------------
+# Stitching
+# ---------------------------
+def dedupe_overlap(previous: str, text: str, max_words: int = 8) -> str:
+    """Drop the leading words of `text` that repeat the end of `previous`."""
+    prev = [normalize_word(w) for w in previous.split()[-max_words:]]
+    words = text.split()
+    head = [normalize_word(w) for w in words[:max_words]]
+    for k in range(min(len(prev), len(head)), 0, -1):
+        if prev[-k:] == head[:k]:
+            return " ".join(words[k:])
+    return text
+
+
+def stitch(results: list[ChunkResult]) -> str:
+    return " ".join(r.text for r in results if r.text)
+
+
+# ---------------------------
+# Parallel transcription
+# ---------------------------
+def _transcribe_chunk(samples: np.ndarray) -> Transcript:
+    transcript = transcribe_in_worker(samples)
+    transcript.info = None
+    return transcript
+
+
+def transcribe_long(path: str, profile: AsrProfile | None = None, bias: DecodingBias | None = None,
+                    workers: int = 2, config: ChunkingConfig | None = None,
+                    stats: AsrStats | None = None) -> Iterator[ChunkResult]:
+    """
+    Transcribe a long recording, yielding chunk results in order as they complete.
+
+    Overlap between hard-cut chunks is already removed from each result's text.
+    """
+    config = config or ChunkingConfig()
+    profile = profile or AsrProfile()
+    in_flight: deque[tuple[AudioChunk, Future]] = deque()
+    previous = ""
+
+    def finish_oldest() -> ChunkResult:
+        nonlocal previous
+        chunk, future = in_flight.popleft()
+        transcript = future.result()
+        if stats is not None:
+            stats.record(transcript)
+        text = dedupe_overlap(previous, transcript.text) if chunk.overlap_s else transcript.text
+        previous = text or previous
+        return ChunkResult(chunk.index, chunk.start_s, chunk.end_s, text, transcript)
+
+    with ProcessPoolExecutor(max_workers=workers, initializer=init_asr_worker,
+                             initargs=(profile, bias)) as pool:
+        for chunk in split_chunks(read_windows(path, config.window_s), config):
+            in_flight.append((chunk, pool.submit(_transcribe_chunk, chunk.samples)))
+            while in_flight and (len(in_flight) >= 2 * workers or in_flight[0][1].done()):
+                yield finish_oldest()
+        while in_flight:
+            yield finish_oldest()
+
+
+def _timestamp(seconds: float) -> str:
+    minutes, s = divmod(int(seconds), 60)
+    return f"{minutes // 60:02d}:{minutes % 60:02d}:{s:02d}"
+
+
+def main():
+    from agent_manager import get_agent_manager
+
+    parser = argparse.ArgumentParser(description="Transcribe a long recording in parallel chunks")
+    parser.add_argument("audio", help="Recording (WAV, opus, ogg, mp3, m4a, ...)")
+    parser.add_argument("--agent", default="snowflake", help="Agent whose ASR profile and vocabulary to use")
+    parser.add_argument("--workers", type=int, default=max((os.cpu_count() or 1) // 2, 1),
+                        help="Whisper worker processes")
+    parser.add_argument("--cpu-threads", type=int, default=2, help="Threads per Whisper worker")
+    parser.add_argument("--chunk-s", type=float, default=30.0, help="Max chunk length")
+    parser.add_argument("--overlap-s", type=float, default=1.0, help="Overlap when a chunk has to be hard-cut")
+    parser.add_argument("--window-s", type=float, default=300.0, help="Audio read from the source at a time")
+    parser.add_argument("--correct", action="store_true", help="Run each chunk through the agent's correction")
+    parser.add_argument("--out", help="Write the stitched transcript to this file")
+    args = parser.parse_args()
+
+    manager = get_agent_manager()
+    config = manager.get_agent(args.agent)
+    if config is None:
+        parser.error(f"Unknown agent: {args.agent}")
+    agent = manager.get_domain_agent(args.agent) if args.correct else None
+    profile = replace(config.asr, cpu_threads=args.cpu_threads)
+    chunking = ChunkingConfig(chunk_s=args.chunk_s, overlap_s=args.overlap_s, window_s=args.window_s)
+
+    start = time.perf_counter()
+    stats = AsrStats()
+    results = []
+    for result in transcribe_long(args.audio, profile, config.decoding_bias, args.workers, chunking, stats):
+        if agent is not None and result.text:
+            # Word confidences only line up with the text if no overlap was removed
+            transcript = result.transcript if result.text == result.transcript.text else None
+            result.text = agent.correct_transcript(result.text, transcript)
+        results.append(result)
+        print(f"[{_timestamp(result.start_s)}] {result.text}", flush=True)
+
+    elapsed = time.perf_counter() - start
+    audio_s = results[-1].end_s if results else 0.0
+    print(f"{len(results)} chunks, {audio_s:.0f}s of audio in {elapsed:.1f}s "
+          f"({audio_s / elapsed if elapsed else 0:.1f}x real time)", file=sys.stderr)
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            f.write(stitch(results) + "\n")
+
+
+if __name__ == "__main__":
+    main()
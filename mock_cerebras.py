@@ -0,0 +1,199 @@
+"""
+Mock Cerebras Module
+
+A local OpenAI/Cerebras-compatible chat-completions server for load tests
+and network-less CI. It serves `POST /v1/chat/completions` (plain, JSON
+mode and streaming) with simulated latency, token rate and error rate, so
+`DomainAgent` can be pointed at it through CEREBRAS_BASE_URL or
+`base_url=` without touching the real API.
+
+- Time to first token is drawn from a lognormal around --ttft-ms
+  (--ttft-sigma 0 makes it fixed)
+- Tokens are then produced at --tokens-per-s
+- --error-rate of requests fail with --error-status
+
+Usage:
+    python mock_cerebras.py --port 8900 --ttft-ms 150 --tokens-per-s 1500
+    CEREBRAS_BASE_URL=http://127.0.0.1:8900 CEREBRAS_API_KEY=mock streamlit run new-app.py
+"""
+
+import argparse
+import asyncio
+import json
+import random
+import re
+import time
+import uuid
+from dataclasses import dataclass
+
+from async_http import HTTPError, Request, Response, Router, StreamResponse, json_response, serve, sse_event
+
+
+FILLER = ("Snowflake separates storage and compute so each virtual warehouse scales "
+          "independently while sharing the same data in cloud object storage").split()
+
+# Prompt prefixes DomainAgent puts before the transcript
+_CORRECTION_PREFIX = re.compile(r"^Correct this transcript \(be conservative\):\s*")
+_TRANSCRIPT_PREFIX = re.compile(r"^Transcript:\s*")
+_FRAGMENTS_PREFIX = re.compile(r"^Correct these transcript fragments \(be conservative\):\n")
+_FRAGMENT = re.compile(r"^(\d+)\. (.*)$", re.MULTILINE)
+
+
+@dataclass
+class MockSettings:
+    """Simulated backend behaviour."""
+    ttft_ms: float = 150.0
+    ttft_sigma: float = 0.3
+    tokens_per_s: float = 1500.0
+    completion_tokens: int = 120
+    error_rate: float = 0.0
+    error_status: int = 500
+    seed: int | None = None
+
+
+class MockCerebras:
+    """
+    Handlers for the mock chat-completions API.
+    """
+
+    def __init__(self, settings: MockSettings | None = None):
+        self.settings = settings or MockSettings()
+        self.rng = random.Random(self.settings.seed)
+        self.requests = 0
+        self.errors = 0
+        self.active = 0
+
+    def router(self) -> Router:
+        router = Router()
+        router.add("POST", "/v1/chat/completions", self.chat_completions)
+        # Cerebras clients warm their connection with this on construction
+        router.add("GET", "/v1/tcp_warming", self.tcp_warming)
+        router.add("GET", "/health", self.health)
+        return router
+
+    def sample_ttft(self) -> float:
+        s = self.settings
+        if s.ttft_sigma <= 0:
+            return s.ttft_ms / 1000
+        return self.rng.lognormvariate(0.0, s.ttft_sigma) * s.ttft_ms / 1000
+
+    def completion_text(self, messages: list[dict], json_mode: bool) -> str:
+        """Deterministic-length reply; corrections echo the transcript (or fragments) back."""
+        user = next((m.get("content") or "" for m in reversed(messages) if m.get("role") == "user"), "")
+        answer = " ".join(FILLER[i % len(FILLER)] for i in range(self.settings.completion_tokens)) + "."
+        fragments = _FRAGMENTS_PREFIX.match(user)
+        if json_mode and fragments:
+            return json.dumps(dict(_FRAGMENT.findall(user[fragments.end():])))
+        if json_mode:
+            return json.dumps({"corrected_question": _TRANSCRIPT_PREFIX.sub("", user), "answer": answer})
+        correction = _CORRECTION_PREFIX.match(user)
+        if correction:
+            return user[correction.end():]
+        return answer
+
+    # ---------------------------
+    # Handlers
+    # ---------------------------
+    async def health(self, request: Request):
+        return json_response({"status": "ok", "requests": self.requests,
+                              "errors": self.errors, "active": self.active})
+
+    async def tcp_warming(self, request: Request):
+        return Response(b'""')
+
+    async def chat_completions(self, request: Request):
+        data = request.json()
+        self.requests += 1
+        if self.rng.random() < self.settings.error_rate:
+            self.errors += 1
+            await asyncio.sleep(self.sample_ttft())
+            return json_response({"error": {"message": "Simulated upstream failure",
+                                            "type": "server_error"}},
+                                 status=self.settings.error_status)
+
+        messages = data.get("messages") or []
+        if not isinstance(messages, list):
+            raise HTTPError(400, "'messages' must be a list")
+        json_mode = (data.get("response_format") or {}).get("type") == "json_object"
+        text = self.completion_text(messages, json_mode)
+        # A JSON-mode reply is sent as one chunk; prose is streamed word by word
+        tokens = re.findall(r"\S+\s*", text) if not json_mode else [text]
+        model = data.get("model", "mock")
+        prompt_tokens = sum(len(str(m.get("content") or "")) for m in messages) // 4
+        usage = {"prompt_tokens": prompt_tokens, "completion_tokens": len(tokens),
+                 "total_tokens": prompt_tokens + len(tokens)}
+        completion_id = f"chatcmpl-{uuid.uuid4().hex[:24]}"
+
+        if data.get("stream"):
+            return StreamResponse(self._stream(completion_id, model, tokens, usage))
+
+        self.active += 1
+        try:
+            await asyncio.sleep(self.sample_ttft() + len(tokens) / self.settings.tokens_per_s)
+        finally:
+            self.active -= 1
+        return json_response({
+            "id": completion_id, "object": "chat.completion", "created": int(time.time()),
+            "model": model, "system_fingerprint": "fp_mock",
+            "choices": [{"index": 0, "finish_reason": "stop",
+                         "message": {"role": "assistant", "content": text}}],
+            "usage": usage,
+        })
+
+    async def _stream(self, completion_id: str, model: str, tokens: list[str], usage: dict):
+        def chunk(delta: dict, finish_reason: str | None = None, **extra) -> bytes:
+            return sse_event({"id": completion_id, "object": "chat.completion.chunk",
+                              "created": int(time.time()), "model": model,
+                              "system_fingerprint": "fp_mock",
+                              "choices": [{"index": 0, "delta": delta, "finish_reason": finish_reason}],
+                              **extra})
+
+        self.active += 1
+        try:
+            await asyncio.sleep(self.sample_ttft())
+            yield chunk({"role": "assistant", "content": ""})
+            start = time.perf_counter()
+            for i, token in enumerate(tokens):
+                # Sleep to the token's scheduled time so pacing doesn't drift
+                delay = start + i / self.settings.tokens_per_s - time.perf_counter()
+                if delay > 0:
+                    await asyncio.sleep(delay)
+                yield chunk({"content": token})
+            yield chunk({}, "stop", usage=usage)
+            yield sse_event("[DONE]")
+        finally:
+            self.active -= 1
+
+
+async def _run(args):
+    mock = MockCerebras(MockSettings(
+        ttft_ms=args.ttft_ms, ttft_sigma=args.ttft_sigma, tokens_per_s=args.tokens_per_s,
+        completion_tokens=args.completion_tokens, error_rate=args.error_rate,
+        error_status=args.error_status, seed=args.seed,
+    ))
+    server = await serve(mock.router(), args.host, args.port)
+    print(f"Mock Cerebras listening on http://{args.host}:{args.port}")
+    async with server:
+        await server.serve_forever()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Mock Cerebras chat-completions server")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8900)
+    parser.add_argument("--ttft-ms", type=float, default=150.0, help="Median time to first token")
+    parser.add_argument("--ttft-sigma", type=float, default=0.3, help="Lognormal spread (0 = fixed)")
+    parser.add_argument("--tokens-per-s", type=float, default=1500.0, help="Generation rate")
+    parser.add_argument("--completion-tokens", type=int, default=120, help="Tokens per answer")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Fraction of requests that fail")
+    parser.add_argument("--error-status", type=int, default=500, help="HTTP status for failures")
+    parser.add_argument("--seed", type=int, default=None, help="Random seed for reproducible runs")
+    args = parser.parse_args()
+    try:
+        asyncio.run(_run(args))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -1,13 +1,16 @@
-import io
 import os
 from typing import Optional
 
 import yaml
 import streamlit as st
 from audiorecorder import audiorecorder
-from faster_whisper import WhisperModel
 from cerebras.cloud.sdk import Cerebras
 
+from term_snapper import extract_vocab_from_yaml
+from audio_preprocessing import prepare_audio
+from agent_manager import get_agent_manager
+from asr_daemon import transcribe
+
 # ---------------------------
 # Streamlit page setup
 # ---------------------------
@@ -21,39 +24,9 @@ st.write(
     "snap noisy terms to canonical Snowflake terminology."
 )
 
-# ---------------------------
-# Helpers for YAML / vocab
-# ---------------------------
-def extract_vocab_from_yaml(yaml_data):
-    """
-    Recursively walk the YAML structure and collect all string leaves
-    as a flat list of vocabulary terms.
-    """
-    vocab = []
-
-    def walk(node):
-        if isinstance(node, dict):
-            for v in node.values():
-                walk(v)
-        elif isinstance(node, list):
-            for item in node:
-                walk(item)
-        elif isinstance(node, str):
-            vocab.append(node)
-
-    walk(yaml_data)
-    return vocab
-
-
 # ---------------------------
 # Cached resources
 # ---------------------------
-@st.cache_resource
-def load_whisper_model():
-    # choose: tiny, base, small, medium, large
-    return WhisperModel("small", device="cpu")
-
-
 @st.cache_resource
 def get_cerebras_client():
     api_key = os.environ.get("CEREBRAS_API_KEY")
@@ -97,7 +70,9 @@ def load_yaml_context():
         return None
 
 
-model = load_whisper_model()
+# Whisper model and vocabulary come from the Snowflake agent's ASR profile; the
+# shared ASR daemon serves them when ASR_DAEMON_SOCKET is set, else this process does
+asr_agent = get_agent_manager().get_agent("snowflake")
 yaml_context = load_yaml_context()
 
 # Lazy init of Cerebras client only if we actually need it
@@ -225,25 +200,14 @@ else:
 audio = audiorecorder("🔴 Click to start / stop recording", "⏺️ Recording...")
 
 if len(audio) > 0:
-    st.audio(audio.export().read(), format="audio/wav")
+    prepared = prepare_audio(audio)
+    st.audio(prepared.wav_bytes(), format="audio/wav")
     st.success("Recording captured! Click the button below to transcribe.")
 
     if st.button("📝 Transcribe locally with Whisper"):
         with st.spinner("Transcribing... this may take a few seconds"):
-            # Export audio to WAV bytes
-            wav_bytes_io = io.BytesIO()
-            audio.export(wav_bytes_io, format="wav")
-            wav_bytes_io.seek(0)
-
-            # Save to a temp file (Whisper needs a path)
-            with open("temp.wav", "wb") as f:
-                f.write(wav_bytes_io.read())
-
-            # Run Whisper locally
-            segments, info = model.transcribe("temp.wav")
-
-            # Collect transcript text
-            transcript_text = " ".join([seg.text for seg in segments])
+            # Run Whisper locally on the in-memory samples
+            transcript_text = transcribe(prepared, asr_agent.asr, asr_agent.decoding_bias).text
 
         st.session_state.raw_transcript = transcript_text
 
@@ -1,11 +1,16 @@
-import io
 import os
 import re
 import time
 import streamlit as st
 from audiorecorder import audiorecorder
-from faster_whisper import WhisperModel
-from agent_manager import get_agent_manager, DomainAgent
+from agent_manager import get_agent_manager
+from answer_cache import get_answer_cache
+from semantic_cache import get_semantic_cache
+from audio_preprocessing import decode_upload, prepare_audio
+from pipeline import correct_speculatively
+from tracing import Trace, get_tracer
+from asr_daemon import transcribe
+from transcript_cache import audio_hash, get_transcript_cache
 
 # ---------------------------
 # Page Config
@@ -262,13 +267,31 @@ st.markdown("""
 # ---------------------------
 # Cached Resources
 # ---------------------------
-@st.cache_resource
-def load_whisper_model():
-    return WhisperModel("small", device="cpu")
-
-model = load_whisper_model()
 agent_manager = get_agent_manager()
 
+@st.cache_data(max_entries=4, show_spinner=False)
+def decode_uploaded(data: bytes):
+    """Decode an uploaded file once, not on every rerun."""
+    return decode_upload(data)
+
+def trace_answer(span, answer, stats):
+    """Attach answer sizes and cache/latency details to a trace span."""
+    span.attrs.update(response_chars=len(answer or ""))
+    if stats:
+        span.attrs.update(prompt_chars=stats.prompt_chars, prompt_tokens=stats.prompt_tokens,
+                          cache_hit=stats.cache_hit, ttft_s=stats.ttft_s)
+        if stats.error or stats.fallback:
+            span.attrs.update(error=stats.error, fallback=stats.fallback)
+        if stats.fallback:
+            span.attrs.update(combined_s=round(stats.combined_s, 3),
+                              combined_prompt_chars=stats.combined_prompt_chars)
+
+def trace_correction(span, corrected, plan):
+    """Attach the correction outcome and how much of the transcript the LLM saw."""
+    span.attrs.update(output_chars=len(corrected), llm=plan.needs_llm, asr_confident=plan.asr_confident)
+    if plan.needs_llm and plan.spans is not None:
+        span.attrs["span_chars"] = sum(end - start for start, end in plan.spans)
+
 # ---------------------------
 # Session State
 # ---------------------------
@@ -277,14 +300,47 @@ defaults = {
     "raw_transcript": "",
     "enhanced_transcript": "",
     "answer": "",
-    "last_audio_len": 0,
+    "answer_stats": None,
+    "speculative": None,
+    "trace": None,
+    "last_audio_hash": None,
+    "last_upload_hash": None,
     "show_files": False,
-    "advanced_mode": True
+    "advanced_mode": True,
+    "pipeline_mode": "Speculative"
 }
 for key, val in defaults.items():
     if key not in st.session_state:
         st.session_state[key] = val
 
+# ---------------------------
+# Sidebar: Cache Stats
+# ---------------------------
+with st.sidebar:
+    cache_stats = get_answer_cache().stats
+    semantic = get_semantic_cache()
+    st.markdown("**Answer cache**")
+    c1, c2, c3 = st.columns(3)
+    c1.metric("Hits", cache_stats.hits)
+    c2.metric("Similar", semantic.hits)
+    c3.metric("Misses", cache_stats.misses - semantic.hits)
+    st.caption(f"{cache_stats.memory_hits} memory · {cache_stats.disk_hits} disk · "
+               f"{semantic.hits} near-duplicate")
+    transcript_stats = get_transcript_cache().stats
+    st.caption(f"Transcripts: {transcript_stats.hits} cached · {transcript_stats.misses} decoded")
+    
+    latency = get_tracer().summary()
+    if latency:
+        st.markdown("**Stage latency**")
+        stages = ["export", "transcribe", "correct", "answer", "total"]
+        stages += [name for name in latency if name not in stages]
+        st.table({
+            "stage": [name for name in stages if name in latency],
+            "p50 (s)": [f"{latency[name]['p50']:.2f}" for name in stages if name in latency],
+            "p95 (s)": [f"{latency[name]['p95']:.2f}" for name in stages if name in latency],
+            "n": [latency[name]["count"] for name in stages if name in latency],
+        })
+
 # ---------------------------
 # Get Agents
 # ---------------------------
@@ -326,6 +382,31 @@ with col2:
 
 selected_agent = agent_options[selected_name]
 
+# Sidebar: how often Whisper + local snapping made the LLM correction unnecessary
+with st.sidebar:
+    try:
+        sidebar_agent = agent_manager.get_domain_agent(selected_agent.agent_id)
+        correction, asr_stats = sidebar_agent.correction_stats, sidebar_agent.asr_stats
+    except Exception:
+        correction = asr_stats = None
+    if selected_agent.asr.cascade and asr_stats and asr_stats.requests:
+        st.markdown("**ASR cascade**")
+        c1, c2 = st.columns(2)
+        c1.metric("Escalated", f"{asr_stats.escalation_rate:.0%}")
+        c2.metric("Avg ASR", f"{asr_stats.avg_latency_s:.2f}s")
+        st.caption(f"{selected_agent.asr.cascade.draft_model} → {selected_agent.asr.model_size} · "
+                   f"draft-only avg {asr_stats.avg_draft_latency_s:.2f}s")
+    if correction and correction.total:
+        st.markdown("**Correction**")
+        c1, c2 = st.columns(2)
+        c1.metric("Skipped", f"{correction.skip_rate:.0%}")
+        c2.metric("LLM calls", correction.llm_calls)
+        if correction.asr_confident or correction.span_calls:
+            st.caption(f"{correction.asr_confident} skipped on ASR confidence · "
+                       f"{correction.span_calls} sent as spans only")
+        st.caption(f"Vocabulary bias: {selected_agent.asr.vocab_bias} "
+                   f"({len(selected_agent.decoding_bias)} terms)")
+
 # Show agent files if toggled
 if st.session_state.show_files:
     with st.expander(f"📁 {selected_agent.name} Agent Files", expanded=True):
@@ -357,7 +438,15 @@ st.markdown(f"""
 # ---------------------------
 # Settings Row
 # ---------------------------
+PIPELINE_MODES = ["Sequential", "Speculative", "Single call"]
+
 col1, col2 = st.columns([1, 2])
+with col1:
+    st.session_state.pipeline_mode = st.selectbox(
+        "Pipeline", PIPELINE_MODES, index=PIPELINE_MODES.index(st.session_state.pipeline_mode),
+        label_visibility="collapsed",
+        help="Speculative starts answering while the correction is still running; "
+             "Single call corrects and answers in one request")
 with col2:
     st.session_state.advanced_mode = st.toggle("✨ Enhance with Snowflake Data", value=st.session_state.advanced_mode, 
                                                 help="AI corrects domain terminology using your semantic model")
@@ -418,19 +507,51 @@ audio = audiorecorder("", "", show_visualizer=False, key="main_recorder")
 
 st.markdown('</div>', unsafe_allow_html=True)
 
+# Compressed uploads are decoded with PyAV straight to 16 kHz, no WAV export
+uploaded = st.file_uploader("Or upload a recording", type=["opus", "ogg", "mp3", "m4a", "webm", "flac", "wav"])
+
 # ---------------------------
 # Process Audio
 # ---------------------------
-if len(audio) > 0 and len(audio) != st.session_state.last_audio_len:
-    st.session_state.last_audio_len = len(audio)
+# Normalize once; playback, change detection and transcription share the 16 kHz buffer.
+# Recorder and upload are tracked separately so either can bring a new question.
+prepared, source = None, None
+if len(audio) > 0:
+    export_start = time.time()
+    candidate = prepare_audio(audio)
+    audio_key = audio_hash(candidate)
+    if audio_key != st.session_state.last_audio_hash:
+        prepared, source = candidate, "last_audio_hash"
+if prepared is None and uploaded is not None:
+    export_start = time.time()
+    try:
+        candidate = decode_uploaded(uploaded.getvalue())
+        audio_key = audio_hash(candidate)
+        if audio_key != st.session_state.last_upload_hash:
+            prepared, source = candidate, "last_upload_hash"
+    except ValueError as e:
+        st.error(f"Couldn't read {uploaded.name}: {e}")
+
+if prepared is not None:
+    st.session_state[source] = audio_key
     st.session_state.pipeline_stage = "processing"
     st.session_state.answer = ""
     
+    mode = st.session_state.pipeline_mode if st.session_state.advanced_mode else "Direct"
+    trace = Trace(agent=selected_agent.agent_id, pipeline=mode, asr_model=selected_agent.asr.model_size)
+    st.session_state.trace = trace
+    
+    with trace.span("export") as span:
+        # Normalizing and hashing happened before the trace existed
+        span.start = export_start
+        wav_bytes = prepared.wav_bytes()
+        span.attrs["audio_s"] = round(prepared.duration, 3)
+    
     # Compact audio player
-    st.audio(audio.export().read(), format="audio/wav")
+    st.audio(wav_bytes, format="audio/wav")
     
     try:
-        domain_agent = DomainAgent(selected_agent)
+        domain_agent = agent_manager.get_domain_agent(selected_agent.agent_id)
     except Exception as e:
         st.error(f"Agent error: {e}")
         st.stop()
@@ -438,34 +559,61 @@ if len(audio) > 0 and len(audio) != st.session_state.last_audio_len:
     # Processing
     with st.spinner(""):
         # Transcribe
-        wav_bytes_io = io.BytesIO()
-        audio.export(wav_bytes_io, format="wav")
-        wav_bytes_io.seek(0)
-        with open("temp.wav", "wb") as f:
-            f.write(wav_bytes_io.read())
-        
-        segments, _ = model.transcribe("temp.wav")
-        raw_text = " ".join([seg.text for seg in segments]).strip()
+        with trace.span("transcribe", audio_s=round(prepared.duration, 3)) as span:
+            transcript_cache = get_transcript_cache()
+            transcript = transcript_cache.get_transcript(audio_key, selected_agent.asr, selected_agent.decoding_bias)
+            span.attrs["cache_hit"] = transcript is not None
+            if transcript is None:
+                # Shared ASR daemon when ASR_DAEMON_SOCKET is set, else this process's model
+                transcript = transcribe(prepared, selected_agent.asr, selected_agent.decoding_bias,
+                                        domain_agent.asr_stats)
+                transcript_cache.put_transcript(audio_key, selected_agent.asr, selected_agent.decoding_bias,
+                                                transcript)
+            raw_text = transcript.text
+            span.attrs.update(model=transcript.model, escalated=transcript.escalated)
+        span.attrs["rtf"] = round(span.duration_s / prepared.duration, 3) if prepared.duration else None
+        if transcript.words and selected_agent.word_confidence_threshold:
+            span.attrs["low_conf_words"] = transcript.low_confidence_words(selected_agent.word_confidence_threshold)
         st.session_state.raw_transcript = raw_text
         
         # Enhance if enabled
-        if st.session_state.advanced_mode:
-            enhanced = domain_agent.correct_transcript(raw_text)
+        speculative = None
+        if st.session_state.advanced_mode and st.session_state.pipeline_mode == "Single call":
+            with trace.span("correct_and_answer", input_chars=len(raw_text)) as span:
+                enhanced, answer = domain_agent.correct_and_answer(raw_text, transcript)
+                span.attrs["output_chars"] = len(enhanced)
+                trace_answer(span, answer, domain_agent.last_stats)
+            st.session_state.enhanced_transcript = enhanced
+            st.session_state.answer = answer
+            st.session_state.answer_stats = domain_agent.last_stats
+        elif st.session_state.advanced_mode and st.session_state.pipeline_mode == "Speculative":
+            with trace.span("correct", input_chars=len(raw_text)) as span:
+                enhanced, speculative = correct_speculatively(domain_agent, raw_text, transcript)
+                trace_correction(span, enhanced, domain_agent.last_plan)
+            st.session_state.enhanced_transcript = enhanced
+        elif st.session_state.advanced_mode:
+            with trace.span("correct", input_chars=len(raw_text)) as span:
+                enhanced = domain_agent.correct_transcript(raw_text, transcript)
+                trace_correction(span, enhanced, domain_agent.last_plan)
             st.session_state.enhanced_transcript = enhanced
-            final_question = enhanced
         else:
             st.session_state.enhanced_transcript = raw_text
-            final_question = raw_text
         
-        # Get answer
-        answer = domain_agent.answer(final_question)
-        st.session_state.answer = answer
-        st.session_state.pipeline_stage = "complete"
+        st.session_state.speculative = speculative
+        if st.session_state.answer:
+            # Single call already answered
+            st.session_state.pipeline_stage = "complete"
+            trace.finish()
+        else:
+            # Answer is streamed into the result card below; a speculative
+            # answer that still stands continues from where it has got to
+            st.session_state.pipeline_stage = "answering"
 
 # ---------------------------
 # Display Results
 # ---------------------------
-if st.session_state.pipeline_stage == "complete" and st.session_state.answer:
+if (st.session_state.pipeline_stage == "answering" or
+        (st.session_state.pipeline_stage == "complete" and st.session_state.answer)):
     
     # Show correction if made
     was_corrected = (st.session_state.advanced_mode and 
@@ -483,7 +631,35 @@ if st.session_state.pipeline_stage == "complete" and st.session_state.answer:
                 unsafe_allow_html=True)
     
     st.markdown('<p class="result-label">Answer</p>', unsafe_allow_html=True)
-    st.markdown(st.session_state.answer)
+    if st.session_state.pipeline_stage == "answering":
+        # Stream tokens as they arrive; first token is the perceived latency
+        domain_agent = agent_manager.get_domain_agent(selected_agent.agent_id)
+        trace = st.session_state.trace or Trace(agent=selected_agent.agent_id)
+        speculative = st.session_state.speculative
+        with trace.span("answer", speculative=speculative is not None) as span:
+            if speculative is not None:
+                st.write_stream(speculative.stream())
+                st.session_state.answer, st.session_state.answer_stats = speculative.result()
+            else:
+                st.session_state.answer = st.write_stream(
+                    domain_agent.answer_stream(st.session_state.enhanced_transcript))
+                st.session_state.answer_stats = domain_agent.last_stats
+            trace_answer(span, st.session_state.answer, st.session_state.answer_stats)
+        st.session_state.speculative = None
+        st.session_state.pipeline_stage = "complete"
+        trace.finish()
+    else:
+        st.markdown(st.session_state.answer)
+    
+    stats = st.session_state.answer_stats
+    if stats:
+        timing = ""
+        if stats.cache_hit:
+            timing = " · cached"
+        elif stats.ttft_s is not None:
+            timing = f" · first token {stats.ttft_s:.2f}s · {stats.tokens_per_s:,.0f} tok/s"
+        st.caption(f"Context: {stats.chunk_count}/{stats.total_chunks} chunks · "
+                   f"~{stats.prompt_tokens:,} prompt tokens ({stats.prompt_chars:,} chars){timing}")
     
     st.markdown('</div>', unsafe_allow_html=True)
     
@@ -497,17 +673,22 @@ if st.session_state.pipeline_stage == "complete" and st.session_state.answer:
         if st.button("→", use_container_width=True):
             if followup:
                 with st.spinner(""):
-                    domain_agent = DomainAgent(selected_agent)
+                    domain_agent = agent_manager.get_domain_agent(selected_agent.agent_id)
+                    trace = Trace(agent=selected_agent.agent_id, pipeline="Follow-up")
+                    st.session_state.trace = trace
                     if st.session_state.advanced_mode:
-                        followup = domain_agent.correct_transcript(followup)
-                    answer = domain_agent.answer(followup)
+                        with trace.span("correct", input_chars=len(followup)) as span:
+                            followup = domain_agent.correct_transcript(followup)
+                            span.attrs["output_chars"] = len(followup)
                     st.session_state.raw_transcript = followup
                     st.session_state.enhanced_transcript = followup
-                    st.session_state.answer = answer
+                    st.session_state.answer = ""
+                    st.session_state.answer_stats = None
+                    st.session_state.pipeline_stage = "answering"
                     st.rerun()
     
     # Reset
     if st.button("New Question", use_container_width=True):
-        for key in ["pipeline_stage", "raw_transcript", "enhanced_transcript", "answer", "last_audio_len"]:
+        for key in ["pipeline_stage", "raw_transcript", "enhanced_transcript", "answer", "answer_stats", "speculative", "trace", "last_audio_hash", "last_upload_hash"]:
             st.session_state[key] = defaults[key]
         st.rerun()
@@ -0,0 +1,157 @@
+"""
+Pipeline Module
+
+Orchestration of the correct -> answer pipeline beyond one call at a time.
+
+Speculative mode starts answering the (locally snapped) transcript while the
+LLM correction is still running. If the correction only changes case or
+punctuation the speculative answer is used (and streamed from where it has
+got to); otherwise it is cancelled and the caller answers the corrected
+question instead.
+"""
+
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Iterator
+
+from agent_manager import AnswerStats, DomainAgent, stream_chat_completion
+from answer_cache import normalize_question
+from transcription import Transcript
+
+
+# Shared across Streamlit sessions; each speculative answer holds one worker
+_executor = ThreadPoolExecutor(max_workers=8, thread_name_prefix="speculative")
+
+
+def is_trivial_change(original: str, corrected: str) -> bool:
+    """True if two texts differ only in case, punctuation or spacing."""
+    return normalize_question(original) == normalize_question(corrected)
+
+
+class SpeculativeAnswer:
+    """
+    An answer request started before the question is final.
+
+    Deltas are buffered as they arrive, so once the question is confirmed
+    `stream()` can replay what was generated so far and follow the rest live.
+    """
+
+    def __init__(self, agent: DomainAgent, question: str):
+        self.agent = agent
+        self.question = question
+        self._cancelled = threading.Event()
+        self._deltas = []
+        self._done = False
+        self._changed = threading.Condition()
+        self._future = _executor.submit(self._run)
+        # A cancel before the worker picked the request up must still end stream()
+        self._future.add_done_callback(lambda _: self._finish())
+
+    def _push(self, delta: str):
+        with self._changed:
+            self._deltas.append(delta)
+            self._changed.notify_all()
+
+    def _finish(self):
+        with self._changed:
+            self._done = True
+            self._changed.notify_all()
+
+    def _run(self) -> tuple[str, AnswerStats] | None:
+        try:
+            return self._generate()
+        finally:
+            self._finish()
+
+    def _generate(self) -> tuple[str, AnswerStats] | None:
+        cached = self.agent.cached_answer(self.question)
+        if cached is not None:
+            self._push(cached)
+            return cached, AnswerStats(cache_hit=True)
+        
+        messages, stats = self.agent.build_answer_request(self.question)
+        parts = []
+        stream = stream_chat_completion(self.agent.client, self.agent.model, messages, stats)
+        try:
+            for delta in stream:
+                if self._cancelled.is_set():
+                    return None
+                parts.append(delta)
+                self._push(delta)
+        except Exception as e:
+            stats.error = str(e)
+            self._push(f"Error: {str(e)}")
+            return f"Error: {str(e)}", stats
+        finally:
+            stream.close()
+        answer = "".join(parts).strip()
+        self.agent.store_answer(self.question, answer)
+        return answer, stats
+
+    def matches(self, question: str) -> bool:
+        """Whether this speculative answer is valid for the final question."""
+        return is_trivial_change(self.question, question)
+
+    def cancel(self):
+        """Stop the request; a stream already in flight is closed at the next delta."""
+        self._cancelled.set()
+        self._future.cancel()
+
+    def stream(self) -> Iterator[str]:
+        """Yield the deltas generated so far, then the rest as they arrive."""
+        sent = 0
+        while True:
+            with self._changed:
+                self._changed.wait_for(lambda: self._done or len(self._deltas) > sent)
+                pending = self._deltas[sent:]
+                done = self._done
+            sent += len(pending)
+            yield from pending
+            if done:
+                break
+        if self._future.cancelled() or self._future.result() is None:
+            raise RuntimeError("Speculative answer was cancelled")
+
+    def result(self, timeout: float | None = None) -> tuple[str, AnswerStats]:
+        """Block until the speculative answer is complete."""
+        outcome = self._future.result(timeout=timeout)
+        if outcome is None:
+            raise RuntimeError("Speculative answer was cancelled")
+        return outcome
+
+
+def correct_speculatively(agent: DomainAgent, raw_text: str,
+                          transcript: Transcript | None = None) -> tuple[str, SpeculativeAnswer | None]:
+    """
+    Correct a transcript while speculatively answering it.
+
+    Returns:
+        (corrected text, speculative answer to use or None). When None is
+        returned the caller should answer the corrected text itself.
+    """
+    plan = agent.plan_correction(raw_text, transcript)
+    if not plan.needs_llm:
+        # Snapping or ASR confidence was enough: no LLM correction to overlap with
+        return plan.snapped.text, None
+
+    speculative = SpeculativeAnswer(agent, plan.snapped.text)
+    corrected = agent.correct_with_plan(raw_text, plan)
+    if speculative.matches(corrected):
+        return corrected, speculative
+
+    speculative.cancel()
+    return corrected, None
+
+
+def run_speculative(agent: DomainAgent, raw_text: str) -> tuple[str, str, bool]:
+    """
+    Blocking correct + answer using speculation.
+
+    Returns:
+        (corrected question, answer, whether the speculative answer was used)
+    """
+    corrected, speculative = correct_speculatively(agent, raw_text)
+    if speculative is not None:
+        answer, agent.last_stats = speculative.result()
+        return corrected, answer, True
+    return corrected, agent.answer(corrected), False
@@ -0,0 +1,221 @@
+"""
+Semantic Cache Module
+
+Near-duplicate question lookup for answers, so paraphrases and noisy ASR
+variants ("how does snowpipe work" / "how do snow pipes work") reuse a
+cached answer. Similarity is computed locally: questions are reduced to
+character shingles, summarized with MinHash signatures kept in a NumPy
+matrix, and candidates are found through LSH band buckets, so a lookup
+touches only a handful of rows even with 100k cached questions.
+
+Shingle overlap can't tell "enable" from "disable", so a match must also
+agree exactly on negations and opposite-pair words (POLARITY_WORDS).
+"""
+
+import threading
+import zlib
+from dataclasses import dataclass
+
+import numpy as np
+
+from answer_cache import normalize_question
+
+
+NUM_PERM = 128
+BANDS = 32
+ROWS = NUM_PERM // BANDS
+SHINGLE = 3
+
+DEFAULT_THRESHOLD = 0.8
+DEFAULT_CAPACITY = 100_000
+
+STOPWORDS = frozenset("""
+a an and are as at be can could do does for from how i in is it me my of on or
+please tell the to what whats when where which who why with would you your
+""".split())
+
+# Negations and opposite-pair words. Swapping one changes only a few
+# shingles ("enable" / "disable", "max" / "min") but reverses the question,
+# so a match must contain exactly the same ones.
+POLARITY_WORDS = frozenset("""
+not no never without cannot nor
+enable disable enabled disabled enabling disabling
+allow deny allowed denied block unblock
+max min maximum minimum most least more less fewer
+increase decrease raise lower larger smaller bigger biggest smallest largest
+add remove insert delete create drop grant revoke
+start stop suspend resume pause lock unlock
+before after above below first last
+include exclude inclusive exclusive
+""".split())
+
+# Multiply-shift hash family: h(x) = ((a * x + b) mod 2^64) >> 32, a odd
+_rng = np.random.default_rng(0x5EED)
+_A = (_rng.integers(1, 2**63, NUM_PERM, dtype=np.uint64) << np.uint64(1)) | np.uint64(1)
+_B = _rng.integers(0, 2**63, NUM_PERM, dtype=np.uint64)
+
+
+def shingles(question: str) -> set[str]:
+    """
+    Character shingles of the question's content words.
+
+    Stopwords and plural endings are dropped and spaces removed, so word
+    splits from ASR ("snow pipes" vs "snowpipe") barely change the set.
+    """
+    words = []
+    for w in normalize_question(question).split():
+        if w in STOPWORDS:
+            continue
+        if len(w) > 3 and w.endswith("s") and not w.endswith("ss"):
+            w = w[:-1]
+        words.append(w)
+    text = "".join(words)
+    if len(text) <= SHINGLE:
+        return {text} if text else set()
+    return {text[i:i + SHINGLE] for i in range(len(text) - SHINGLE + 1)}
+
+
+def polarity(question: str) -> frozenset[str]:
+    """The question's negation and opposite-pair words ("doesn't" counts as "not")."""
+    words = normalize_question(question.lower().replace("n't", " not")).split()
+    return frozenset(w for w in words if w in POLARITY_WORDS)
+
+
+def minhash(question: str) -> np.ndarray | None:
+    """MinHash signature (uint32, NUM_PERM long), or None for an empty question."""
+    grams = shingles(question)
+    if not grams:
+        return None
+    x = np.fromiter((zlib.crc32(g.encode("utf-8")) for g in grams), dtype=np.uint64, count=len(grams))
+    hashed = (_A[:, None] * x[None, :] + _B[:, None]) >> np.uint64(32)
+    return hashed.min(axis=1).astype(np.uint32)
+
+
+@dataclass
+class SemanticMatch:
+    """A cached question similar enough to reuse its answer."""
+    question: str
+    answer: str
+    similarity: float
+
+
+class SemanticIndex:
+    """
+    MinHash/LSH index over one agent's cached questions.
+
+    Once `capacity` is reached the oldest entry is overwritten.
+    """
+
+    def __init__(self, capacity: int = DEFAULT_CAPACITY):
+        self.capacity = capacity
+        self._sigs = np.zeros((min(capacity, 1024), NUM_PERM), dtype=np.uint32)
+        self._questions: list[str | None] = []
+        self._answers: list[str | None] = []
+        self._buckets: list[dict[bytes, set[int]]] = [{} for _ in range(BANDS)]
+        self._next = 0
+
+    def __len__(self) -> int:
+        return sum(q is not None for q in self._questions)
+
+    def _band_keys(self, sig: np.ndarray) -> list[bytes]:
+        return [sig[b * ROWS:(b + 1) * ROWS].tobytes() for b in range(BANDS)]
+
+    def add(self, question: str, answer: str):
+        sig = minhash(question)
+        if sig is None:
+            return
+
+        row = self._next
+        if row < len(self._questions):
+            # Ring buffer is full: unlink the entry being overwritten
+            for band, key in enumerate(self._band_keys(self._sigs[row])):
+                rows = self._buckets[band].get(key)
+                if rows:
+                    rows.discard(row)
+                    if not rows:
+                        del self._buckets[band][key]
+            self._questions[row] = question
+            self._answers[row] = answer
+        else:
+            if row >= len(self._sigs):
+                grown = np.zeros((min(self.capacity, len(self._sigs) * 2), NUM_PERM), dtype=np.uint32)
+                grown[:len(self._sigs)] = self._sigs
+                self._sigs = grown
+            self._questions.append(question)
+            self._answers.append(answer)
+
+        self._sigs[row] = sig
+        for band, key in enumerate(self._band_keys(sig)):
+            self._buckets[band].setdefault(key, set()).add(row)
+        self._next = (row + 1) % self.capacity
+
+    def lookup(self, question: str, threshold: float) -> SemanticMatch | None:
+        sig = minhash(question)
+        if sig is None:
+            return None
+
+        candidates = set()
+        for band, key in enumerate(self._band_keys(sig)):
+            rows = self._buckets[band].get(key)
+            if rows:
+                candidates.update(rows)
+        if not candidates:
+            return None
+
+        rows = np.fromiter(candidates, dtype=np.int64, count=len(candidates))
+        similarity = (self._sigs[rows] == sig).mean(axis=1)
+        words = polarity(question)
+        for best in np.argsort(-similarity, kind="stable"):
+            if similarity[best] < threshold:
+                break
+            row = int(rows[best])
+            if polarity(self._questions[row]) == words:
+                return SemanticMatch(self._questions[row], self._answers[row], float(similarity[best]))
+        return None
+
+
+class SemanticCache:
+    """
+    Per-agent semantic indexes, each tied to the agent's content hash.
+    """
+
+    def __init__(self, capacity: int = DEFAULT_CAPACITY):
+        self.capacity = capacity
+        self.hits = 0
+        self.misses = 0
+        self._indexes: dict[str, tuple[str, SemanticIndex]] = {}
+        self._lock = threading.Lock()
+
+    def _index(self, agent_id: str, content_hash: str) -> SemanticIndex:
+        entry = self._indexes.get(agent_id)
+        if entry is None or entry[0] != content_hash:
+            # Knowledge changed: answers cached for the old version are dropped
+            entry = (content_hash, SemanticIndex(self.capacity))
+            self._indexes[agent_id] = entry
+        return entry[1]
+
+    def lookup(self, agent_id: str, content_hash: str, question: str,
+               threshold: float = DEFAULT_THRESHOLD) -> SemanticMatch | None:
+        with self._lock:
+            match = self._index(agent_id, content_hash).lookup(question, threshold)
+            if match is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+            return match
+
+    def add(self, agent_id: str, content_hash: str, question: str, answer: str):
+        with self._lock:
+            self._index(agent_id, content_hash).add(question, answer)
+
+
+# Singleton instance
+_semantic_cache: SemanticCache | None = None
+
+
+def get_semantic_cache() -> SemanticCache:
+    """Get the process-wide semantic answer cache."""
+    global _semantic_cache
+    if _semantic_cache is None:
+        _semantic_cache = SemanticCache()
+    return _semantic_cache
@@ -0,0 +1,322 @@
+"""
+Pipeline Service Module
+
+Headless asyncio HTTP service for the voice pipeline, so clients other
+than the Streamlit scripts can drive it and one process can serve many
+concurrent sessions.
+
+- Whisper runs in a thread pool executor (CTranslate2 releases the GIL), or
+  in the shared ASR daemon when ASR_DAEMON_SOCKET is set
+- With --batch-window-ms, /transcribe requests arriving together are
+  decoded as one batch by the ASR scheduler
+- Correction and answering use the async Cerebras client
+- Each stage has a concurrency limit and a bounded wait queue; requests
+  beyond the queue get 503 with Retry-After instead of piling up
+
+Endpoints:
+    GET  /health
+    GET  /agents
+    POST /transcribe   body: WAV or opus/ogg/mp3/m4a bytes, ?agent=<id> optional
+                       -> {"text", "duration_s", "asr_s", "model", "escalated", "cached"}
+    POST /correct      {"agent", "text"}                     -> {"corrected"}
+    POST /answer       {"agent", "question", "stream": bool} -> {"answer", "stats"} or SSE
+
+Streaming transcription (partials while the user is still speaking):
+    POST /stream/start   ?agent=<id> optional                      -> {"session"}
+    POST /stream/audio   ?session=<id>[&rate=48000&channels=1]
+                         body: little-endian int16 PCM or a WAV chunk -> {"committed", "tentative", "text"}
+    POST /stream/finish  ?session=<id>                              -> {"text", "asr_s"}
+
+Usage:
+    python service.py --port 8765
+"""
+
+import argparse
+import asyncio
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import asdict
+from functools import wraps
+
+from agent_manager import AgentConfig, AgentManager, AnswerStats, DomainAgent, get_agent_manager
+from async_http import HTTPError, Request, Router, StreamResponse, json_response, serve, sse_event
+from audio_preprocessing import TARGET_SAMPLE_RATE, decode_upload, decode_wav, prepare_pcm
+from asr_daemon import get_asr_client, transcribe
+from asr_scheduler import admission_slots, get_scheduler
+from bounded_stage import BoundedStage, StageFullError
+from streaming_asr import StreamingTranscriber
+from transcript_cache import audio_hash, get_transcript_cache
+from transcription import AsrProfile, AsrStats, get_whisper_model
+from vocab_bias import DecodingBias
+
+
+# Streaming sessions with no audio for this long are dropped
+STREAM_IDLE_S = 300
+
+
+def _reject_when_full(handler):
+    """Turn a full stage queue into 503 with Retry-After."""
+    @wraps(handler)
+    async def wrapped(request: Request):
+        try:
+            return await handler(request)
+        except StageFullError as e:
+            raise HTTPError(503, str(e), {"Retry-After": f"{e.retry_after:g}"})
+    return wrapped
+
+
+def _required_text(data: dict, name: str) -> str:
+    value = data.get(name)
+    if not isinstance(value, str) or not value.strip():
+        raise HTTPError(400, f"'{name}' must be a non-empty string")
+    return value
+
+
+class PipelineService:
+    """
+    Wraps AgentManager/DomainAgent and a Whisper model behind HTTP handlers.
+    """
+
+    def __init__(self, manager: AgentManager | None = None, model_size: str = "small",
+                 asr_workers: int = 1, asr_queue: int = 16,
+                 llm_concurrency: int = 32, llm_queue: int = 256,
+                 batch_window_ms: float = 0.0, max_batch: int = 8):
+        self.manager = manager or get_agent_manager()
+        # Used when /transcribe isn't given an agent; agents bring their own profile
+        self.default_asr = AsrProfile(model_size=model_size)
+        self._asr_executor = ThreadPoolExecutor(max_workers=asr_workers, thread_name_prefix="asr")
+        self.batch_window_ms = batch_window_ms
+        self.max_batch = max_batch
+        self._limits = (admission_slots(asr_workers, batch_window_ms, max_batch), asr_queue,
+                        llm_concurrency, llm_queue)
+        self.asr: BoundedStage | None = None
+        self.llm: BoundedStage | None = None
+        # session id -> (transcriber, last activity)
+        self._streams: dict[str, tuple[StreamingTranscriber, float]] = {}
+        # Per-agent ASR stats; kept here so ASR-only requests never build a DomainAgent
+        self._asr_stats: dict[str, AsrStats] = {}
+
+    def _ensure_stages(self):
+        # Semaphores must be created on the running event loop
+        if self.asr is None:
+            asr_workers, asr_queue, llm_concurrency, llm_queue = self._limits
+            self.asr = BoundedStage("asr", asr_workers, asr_queue)
+            self.llm = BoundedStage("llm", llm_concurrency, llm_queue)
+
+    def router(self) -> Router:
+        router = Router()
+        for method, path, handler in [
+            ("GET", "/health", self.health),
+            ("GET", "/agents", self.agents),
+            ("POST", "/transcribe", self.transcribe),
+            ("POST", "/correct", self.correct),
+            ("POST", "/answer", self.answer),
+            ("POST", "/stream/start", self.stream_start),
+            ("POST", "/stream/audio", self.stream_audio),
+            ("POST", "/stream/finish", self.stream_finish),
+        ]:
+            router.add(method, path, _reject_when_full(handler))
+        return router
+
+    async def _agent(self, agent_id: str | None) -> DomainAgent:
+        if not agent_id or not isinstance(agent_id, str):
+            raise HTTPError(400, "Missing 'agent'")
+        try:
+            # Checking (and on change rebuilding) a cached agent stats and hashes its files
+            return await asyncio.get_running_loop().run_in_executor(
+                None, self.manager.get_domain_agent, agent_id)
+        except KeyError:
+            raise HTTPError(404, f"Unknown agent: {agent_id}")
+
+    def _agent_config(self, agent_id: str) -> AgentConfig:
+        """An agent's config only: ASR endpoints don't need an LLM client or API key."""
+        config = self.manager.get_agent(agent_id)
+        if config is None:
+            raise HTTPError(404, f"Unknown agent: {agent_id}")
+        return config
+
+    async def _asr_settings(self, agent_id: str) -> tuple[AgentConfig, DecodingBias]:
+        """An agent's config and vocabulary bias; the bias reads its files on first use."""
+        config = self._agent_config(agent_id)
+        bias = await asyncio.get_running_loop().run_in_executor(None, lambda: config.decoding_bias)
+        return config, bias
+
+    # ---------------------------
+    # Handlers
+    # ---------------------------
+    async def health(self, request: Request):
+        self._ensure_stages()
+        status = {"status": "ok", "asr": self.asr.status(), "llm": self.llm.status(),
+                  "asr_agents": {agent_id: {"requests": s.requests, "escalation_rate": s.escalation_rate,
+                                            "avg_latency_s": s.avg_latency_s}
+                                 for agent_id, s in self._asr_stats.items()}}
+        client = get_asr_client()
+        if client is not None:
+            try:
+                status["asr_daemon"] = await asyncio.get_running_loop().run_in_executor(None, client.status)
+            except OSError as e:
+                status["asr_daemon"] = {"error": str(e)}
+        return json_response(status)
+
+    async def agents(self, request: Request):
+        return json_response([
+            {"id": agent_id, "name": name, "icon": icon}
+            for agent_id, name, icon in self.manager.get_agent_names()
+        ])
+
+    async def transcribe(self, request: Request):
+        self._ensure_stages()
+        if not request.body:
+            raise HTTPError(400, "Request body must contain audio")
+        profile, bias, stats = self.default_asr, None, None
+        if request.query.get("agent"):
+            config, bias = await self._asr_settings(request.query["agent"])
+            profile = config.asr
+            stats = self._asr_stats.setdefault(config.agent_id, AsrStats())
+        try:
+            # Compressed audio is decoded off the event loop
+            prepared = await asyncio.get_running_loop().run_in_executor(None, decode_upload, request.body)
+        except ValueError as e:
+            raise HTTPError(415, str(e))
+
+        # Retries and replays of the same audio skip Whisper
+        audio_key = audio_hash(prepared)
+        cache = get_transcript_cache()
+        loop = asyncio.get_running_loop()
+        transcript = await loop.run_in_executor(None, cache.get_transcript, audio_key, profile, bias)
+        if transcript is not None:
+            return json_response({"text": transcript.text, "duration_s": prepared.duration, "asr_s": 0.0,
+                                  "model": transcript.model, "escalated": transcript.escalated, "cached": True})
+
+        async with self.asr.slot():
+            if self.batch_window_ms and get_asr_client() is None:
+                scheduler = get_scheduler(profile, bias, self.batch_window_ms, self.max_batch)
+                transcript = await asyncio.wrap_future(scheduler.submit(prepared))
+                if stats is not None:
+                    stats.record(transcript)
+            else:
+                transcript = await loop.run_in_executor(self._asr_executor, transcribe,
+                                                        prepared, profile, bias, stats)
+        await loop.run_in_executor(None, cache.put_transcript, audio_key, profile, bias, transcript)
+        return json_response({"text": transcript.text, "duration_s": prepared.duration,
+                              "asr_s": transcript.decode_s, "model": transcript.model,
+                              "escalated": transcript.escalated, "cached": False})
+
+    def _stream(self, session: str | None) -> StreamingTranscriber:
+        entry = self._streams.get(session or "")
+        if entry is None:
+            raise HTTPError(404, f"Unknown stream session: {session}")
+        self._streams[session] = (entry[0], time.monotonic())
+        return entry[0]
+
+    async def stream_start(self, request: Request):
+        now = time.monotonic()
+        for session, (_, last) in list(self._streams.items()):
+            if now - last > STREAM_IDLE_S:
+                del self._streams[session]
+        profile, bias = self.default_asr, None
+        if request.query.get("agent"):
+            config, bias = await self._asr_settings(request.query["agent"])
+            profile = config.asr
+        session = uuid.uuid4().hex
+        self._streams[session] = (StreamingTranscriber(profile, bias), now)
+        return json_response({"session": session})
+
+    async def stream_audio(self, request: Request):
+        self._ensure_stages()
+        transcriber = self._stream(request.query.get("session"))
+        try:
+            if request.body[:4] == b"RIFF":
+                prepared = decode_wav(request.body)
+            else:
+                prepared = prepare_pcm(request.body, int(request.query.get("rate", TARGET_SAMPLE_RATE)), 2,
+                                       int(request.query.get("channels", 1)))
+        except ValueError as e:
+            raise HTTPError(415, str(e))
+
+        async with self.asr.slot():
+            loop = asyncio.get_running_loop()
+            partial = await loop.run_in_executor(self._asr_executor, transcriber.add_audio,
+                                                 prepared.to_float32())
+        return json_response({"committed": partial.committed, "tentative": partial.tentative,
+                              "text": partial.text, "audio_s": partial.audio_s})
+
+    async def stream_finish(self, request: Request):
+        self._ensure_stages()
+        session = request.query.get("session")
+        transcriber = self._stream(session)
+        async with self.asr.slot():
+            loop = asyncio.get_running_loop()
+            transcript = await loop.run_in_executor(self._asr_executor, transcriber.finish)
+        self._streams.pop(session, None)
+        return json_response({"text": transcript.text, "asr_s": transcript.decode_s})
+
+    async def correct(self, request: Request):
+        self._ensure_stages()
+        data = request.json()
+        agent = await self._agent(data.get("agent"))
+        text = _required_text(data, "text")
+        async with self.llm.slot():
+            corrected = await agent.acorrect_transcript(text)
+        return json_response({"corrected": corrected})
+
+    async def answer(self, request: Request):
+        self._ensure_stages()
+        data = request.json()
+        agent = await self._agent(data.get("agent"))
+        question = _required_text(data, "question")
+
+        if not data.get("stream"):
+            async with self.llm.slot():
+                answer, stats = await agent.aanswer(question)
+            return json_response({"answer": answer, "stats": asdict(stats)})
+
+        async def events():
+            stats = AnswerStats()
+            async for delta in agent.aanswer_stream(question, stats):
+                yield sse_event({"delta": delta})
+            yield sse_event({"done": True, "stats": asdict(stats)})
+
+        # Take the slot before the 200 header is sent, so a full queue is still a clean
+        # 503; the response frees it once the stream ends or the client goes away.
+        await self.llm.acquire()
+        return StreamResponse(events(), on_close=self.llm.release)
+
+
+async def _run(args):
+    service = PipelineService(
+        model_size=args.model, asr_workers=args.asr_workers, asr_queue=args.asr_queue,
+        llm_concurrency=args.llm_concurrency, llm_queue=args.llm_queue,
+        batch_window_ms=args.batch_window_ms, max_batch=args.max_batch,
+    )
+    if args.preload and get_asr_client() is None:
+        await asyncio.get_running_loop().run_in_executor(None, get_whisper_model, service.default_asr)
+    server = await serve(service.router(), args.host, args.port)
+    print(f"Pipeline service listening on http://{args.host}:{args.port}")
+    async with server:
+        await server.serve_forever()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Headless speech-correction pipeline service")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--model", default="small", help="Whisper model size when no agent is given")
+    parser.add_argument("--asr-workers", type=int, default=1, help="Concurrent Whisper decodes")
+    parser.add_argument("--asr-queue", type=int, default=16, help="Max transcriptions waiting")
+    parser.add_argument("--llm-concurrency", type=int, default=32, help="Concurrent LLM requests")
+    parser.add_argument("--llm-queue", type=int, default=256, help="Max LLM requests waiting")
+    parser.add_argument("--batch-window-ms", type=float, default=0.0,
+                        help="Batch /transcribe requests arriving within this window (0 = off)")
+    parser.add_argument("--max-batch", type=int, default=8, help="Max recordings per ASR batch")
+    parser.add_argument("--preload", action="store_true", help="Load Whisper before serving")
+    args = parser.parse_args()
+    try:
+        asyncio.run(_run(args))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -7,7 +7,9 @@ Snowflake concepts using the FAQ knowledge base and Cerebras inference.
 
 import os
 from pathlib import Path
-from cerebras.cloud.sdk import Cerebras
+from typing import Iterator
+
+from agent_manager import AnswerStats, get_cerebras_client, stream_chat_completion
 
 # Load FAQ content at module level
 FAQ_PATH = Path(__file__).parent / "FAQ.md"
@@ -57,8 +59,9 @@ class SnowflakeAgent:
                 "Cerebras API key is required. Pass it to the constructor or "
                 "set the CEREBRAS_API_KEY environment variable."
             )
-        self.client = Cerebras(api_key=self.api_key)
+        self.client = get_cerebras_client(self.api_key)
         self.model = "llama-3.3-70b"
+        self.last_stats = AnswerStats()
 
     def answer(self, question: str) -> str:
         """
@@ -91,6 +94,27 @@ class SnowflakeAgent:
         except Exception as e:
             return f"Error communicating with the AI service: {str(e)}"
 
+    def answer_stream(self, question: str) -> Iterator[str]:
+        """
+        Answer a question about Snowflake, yielding text as it is generated.
+        
+        Args:
+            question: The user's question about Snowflake.
+            
+        Yields:
+            Text deltas of the answer. Time-to-first-token and tokens/sec
+            for the call are available in `last_stats` once exhausted.
+        """
+        self.last_stats = AnswerStats()
+        messages = [
+            {"role": "system", "content": SYSTEM_PROMPT},
+            {"role": "user", "content": question},
+        ]
+        try:
+            yield from stream_chat_completion(self.client, self.model, messages, self.last_stats)
+        except Exception as e:
+            yield f"Error communicating with the AI service: {str(e)}"
+
 
 def get_snowflake_answer(question: str, api_key: str | None = None) -> str:
     """
@@ -0,0 +1,225 @@
+"""
+Streaming ASR Module
+
+Incremental transcription of audio that arrives in chunks while the user is
+still speaking, so by the time recording stops most of the question is
+already transcribed.
+
+- Audio accumulates in a rolling window of not-yet-committed speech
+- Once --min-chunk seconds of new audio have arrived the window is
+  re-decoded with word timestamps, primed with the committed text
+- Words two consecutive decodes agree on are committed (local agreement);
+  the rest is shown as a tentative partial
+- Committed audio is dropped from the window. When VAD sees the speaker
+  pause, the whole window is committed; a window that grows past
+  max_window_s without agreement is committed up to its last word
+- `finish()` only has to decode the last uncommitted window
+
+Usage (simulates a live recording from a WAV file):
+    python streaming_asr.py question.wav --agent snowflake --chunk-ms 500
+"""
+
+import argparse
+import threading
+import time
+from dataclasses import dataclass, replace
+
+import numpy as np
+from faster_whisper.vad import VadOptions, get_speech_timestamps
+
+from audio_preprocessing import TARGET_SAMPLE_RATE, decode_wav
+from transcription import (AsrProfile, Segment, Transcript, Word, get_whisper_model, normalize_word,
+                           transcribe_detailed)
+from vocab_bias import DecodingBias
+
+
+# Words starting this close before the committed end are re-decodes of committed words
+OVERLAP_TOLERANCE_S = 0.1
+
+
+@dataclass(frozen=True)
+class StreamingConfig:
+    """Decode cadence and window limits for a streaming session."""
+    min_chunk_s: float = 1.0
+    max_window_s: float = 15.0
+    min_silence_ms: int = 500
+    # Tail of the committed text passed to Whisper as context
+    prompt_chars: int = 200
+
+
+@dataclass
+class Partial:
+    """What is known about the transcript so far."""
+    committed: str = ""
+    tentative: str = ""
+    audio_s: float = 0.0
+    decode_s: float = 0.0
+
+    @property
+    def text(self) -> str:
+        return " ".join(t for t in (self.committed, self.tentative) if t)
+
+
+def _join(words: list[Word]) -> str:
+    return "".join(w.text for w in words).strip()
+
+
+class StreamingTranscriber:
+    """
+    One live recording being transcribed incrementally.
+
+    Not shared between recordings; calls from several threads are
+    serialized. The profile's cascade is ignored, since repeated window
+    decodes need one consistent model.
+    """
+
+    def __init__(self, profile: AsrProfile | None = None, bias: DecodingBias | None = None,
+                 config: StreamingConfig | None = None):
+        self.profile = replace(profile or AsrProfile(), word_timestamps=True, cascade=None)
+        self.bias = bias
+        self.config = config or StreamingConfig()
+        self._lock = threading.Lock()
+        self._window = np.zeros(0, dtype=np.float32)
+        # Absolute start time (s) of the window within the recording
+        self._window_start = 0.0
+        self._new_samples = 0
+        self._committed: list[Segment] = []
+        self._committed_end = 0.0
+        self._previous: list[Word] = []
+        self._partial = Partial()
+        self._vad = VadOptions(min_silence_duration_ms=self.config.min_silence_ms, speech_pad_ms=100)
+
+    @property
+    def committed_text(self) -> str:
+        return " ".join(seg.text for seg in self._committed if seg.text).strip()
+
+    @property
+    def audio_s(self) -> float:
+        return self._window_start + len(self._window) / TARGET_SAMPLE_RATE
+
+    def add_audio(self, samples: np.ndarray) -> Partial:
+        """Append 16 kHz mono float32 samples; decodes once enough new audio has arrived."""
+        with self._lock:
+            self._window = np.concatenate([self._window, samples.astype(np.float32, copy=False)])
+            self._new_samples += len(samples)
+            if self._new_samples >= self.config.min_chunk_s * TARGET_SAMPLE_RATE:
+                self._step(final=False)
+            self._partial.audio_s = self.audio_s
+            return self._partial
+
+    def finish(self) -> Transcript:
+        """
+        Decode what is left of the window and return the full transcript.
+
+        `decode_s` is the time spent here, i.e. the latency after recording stopped.
+        """
+        with self._lock:
+            start = time.perf_counter()
+            if len(self._window):
+                self._step(final=True)
+            text = self.committed_text
+            return Transcript(text, list(self._committed), model=self.profile.model_size,
+                              decode_s=time.perf_counter() - start)
+
+    # ---------------------------
+    # Decoding
+    # ---------------------------
+    def _decode(self, audio: np.ndarray) -> tuple[list[Word], list[Segment]]:
+        kwargs = self.profile.transcribe_kwargs(self.bias)
+        context = self.committed_text[-self.config.prompt_chars:]
+        if context:
+            kwargs["initial_prompt"] = " ".join(p for p in (kwargs.get("initial_prompt"), context) if p)
+        transcript = transcribe_detailed(get_whisper_model(self.profile), audio, **kwargs)
+        words = [replace(w, start=w.start + self._window_start, end=w.end + self._window_start)
+                 for w in transcript.words]
+        return words, transcript.segments
+
+    def _commit(self, words: list[Word], segments: list[Segment]):
+        if not words:
+            return
+        self._committed.append(Segment(
+            _join(words),
+            min((s.avg_logprob for s in segments), default=0.0),
+            max((s.no_speech_prob for s in segments), default=0.0),
+            max((s.compression_ratio for s in segments), default=0.0),
+            list(words),
+        ))
+        self._committed_end = words[-1].end
+
+    def _drop_until(self, t: float):
+        """Discard window audio before absolute time `t`."""
+        cut = int((t - self._window_start) * TARGET_SAMPLE_RATE)
+        if cut > 0:
+            self._window = self._window[cut:]
+            self._window_start += cut / TARGET_SAMPLE_RATE
+
+    def _step(self, final: bool):
+        self._new_samples = 0
+        speech = get_speech_timestamps(self._window, self._vad)
+        window_s = len(self._window) / TARGET_SAMPLE_RATE
+        if not speech:
+            # Silence only: nothing to decode, keep a short tail in case speech starts
+            self._drop_until(self.audio_s - self.config.min_silence_ms / 1000)
+            self._previous = []
+            self._partial.tentative = ""
+            return
+
+        start = time.perf_counter()
+        words, segments = self._decode(self._window)
+        self._partial.decode_s = time.perf_counter() - start
+        words = [w for w in words if w.start >= self._committed_end - OVERLAP_TOLERANCE_S]
+
+        paused = window_s - speech[-1]["end"] / TARGET_SAMPLE_RATE >= self.config.min_silence_ms / 1000
+        if final or paused:
+            # End of an utterance: everything decoded so far is final
+            self._commit(words, segments)
+            self._drop_until(self._window_start + speech[-1]["end"] / TARGET_SAMPLE_RATE)
+            self._previous, tentative = [], []
+        else:
+            agreed = 0
+            while (agreed < min(len(words), len(self._previous))
+                   and normalize_word(words[agreed].text) == normalize_word(self._previous[agreed].text)):
+                agreed += 1
+            if window_s > self.config.max_window_s and not agreed:
+                # No agreement for a whole window: keep all but the last (possibly cut) word
+                agreed = max(len(words) - 1, 0)
+            self._commit(words[:agreed], segments)
+            tentative = words[agreed:]
+            self._previous = tentative
+            if agreed:
+                # Committed audio is never decoded again; the prompt carries its text
+                self._drop_until(self._committed_end)
+
+        self._partial.committed = self.committed_text
+        self._partial.tentative = _join(tentative)
+
+
+def main():
+    from agent_manager import get_agent_manager
+
+    parser = argparse.ArgumentParser(description="Simulate streaming transcription of a WAV file")
+    parser.add_argument("wav", help="Recording to feed in chunks")
+    parser.add_argument("--agent", default="snowflake", help="Agent whose ASR profile and vocabulary to use")
+    parser.add_argument("--chunk-ms", type=int, default=500, help="Chunk size fed per step")
+    parser.add_argument("--realtime", action="store_true", help="Sleep between chunks like a live recording")
+    args = parser.parse_args()
+
+    config = get_agent_manager().get_agent(args.agent)
+    if config is None:
+        parser.error(f"Unknown agent: {args.agent}")
+    with open(args.wav, "rb") as f:
+        samples = decode_wav(f.read()).to_float32()
+
+    transcriber = StreamingTranscriber(config.asr, config.decoding_bias)
+    step = int(TARGET_SAMPLE_RATE * args.chunk_ms / 1000)
+    for i in range(0, len(samples), step):
+        partial = transcriber.add_audio(samples[i:i + step])
+        print(f"[{partial.audio_s:6.2f}s] {partial.committed} | {partial.tentative}")
+        if args.realtime:
+            time.sleep(args.chunk_ms / 1000)
+    transcript = transcriber.finish()
+    print(f"Final ({transcript.decode_s:.2f}s after stop): {transcript.text}")
+
+
+if __name__ == "__main__":
+    main()
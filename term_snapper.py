@@ -0,0 +1,380 @@
+"""
+Term Snapper Module
+
+Local, LLM-free correction of misheard domain terms. Canonical terms come
+from the string leaves of an agent's terms YAML; transcript n-grams are
+matched against them with a Metaphone-style phonetic key index and a
+character-trigram index, e.g. "snow pipe" -> "Snowpipe".
+
+Confident matches are replaced in place. Spans that look like a term but
+fall below the confidence threshold are reported as uncertain so the
+caller can decide whether an LLM pass is still needed.
+"""
+
+import re
+from dataclasses import dataclass, field
+from difflib import SequenceMatcher
+
+import yaml
+
+
+# Spans scoring at or above this are snapped locally
+DEFAULT_THRESHOLD = 0.85
+
+# Spans scoring between this and the threshold are reported as uncertain
+MIN_CANDIDATE_SCORE = 0.65
+
+# Longest transcript span (in words) considered for a single term
+MAX_SPAN_WORDS = 4
+
+# Terms shorter than this (letters only) are matched exactly, never fuzzily
+MIN_FUZZY_CHARS = 4
+
+STOPWORDS = frozenset("""
+a an and are as at be but by can do does for from has have how i if in into is
+it its me my no not of on or our so than that the their then there these this
+to was we what when where which who why will with you your
+""".split())
+
+_WORD_RE = re.compile(r"[A-Za-z0-9][A-Za-z0-9'\-.]*[A-Za-z0-9]|[A-Za-z0-9]")
+_VOWELS = set("AEIOU")
+
+
+def extract_vocab_from_yaml(yaml_data):
+    """
+    Recursively walk the YAML structure and collect all string leaves
+    as a flat list of vocabulary terms.
+    """
+    vocab = []
+
+    def walk(node):
+        if isinstance(node, dict):
+            for v in node.values():
+                walk(v)
+        elif isinstance(node, list):
+            for item in node:
+                walk(item)
+        elif isinstance(node, str):
+            vocab.append(node)
+
+    walk(yaml_data)
+    return vocab
+
+
+def compact(text: str) -> str:
+    """Lowercase letters and digits only, so spacing and punctuation don't matter."""
+    return re.sub(r"[^a-z0-9]", "", text.lower())
+
+
+def metaphone(word: str) -> str:
+    """
+    Phonetic key for a word, following the original Metaphone rules.
+
+    Digits are kept as-is so version numbers still discriminate.
+    """
+    w = re.sub(r"[^A-Z0-9]", "", word.upper())
+    if not w:
+        return ""
+
+    # Initial exceptions
+    if w[:2] in ("KN", "GN", "PN", "AE", "WR"):
+        w = w[1:]
+    elif w[0] == "X":
+        w = "S" + w[1:]
+    elif w[:2] == "WH":
+        w = "W" + w[2:]
+
+    # Drop duplicate adjacent letters, except C
+    w = "".join(c for i, c in enumerate(w) if i == 0 or c != w[i - 1] or c == "C")
+
+    key = []
+    n = len(w)
+    for i, c in enumerate(w):
+        prev = w[i - 1] if i > 0 else ""
+        nxt = w[i + 1] if i + 1 < n else ""
+        nxt2 = w[i + 2] if i + 2 < n else ""
+
+        if c.isdigit():
+            key.append(c)
+        elif c in _VOWELS:
+            if i == 0:
+                key.append("A")
+        elif c == "B":
+            if not (prev == "M" and i == n - 1):
+                key.append("B")
+        elif c == "C":
+            if nxt == "I" and nxt2 == "A":
+                key.append("X")
+            elif nxt == "H":
+                key.append("K" if prev == "S" else "X")
+            elif nxt in ("I", "E", "Y"):
+                if prev != "S":
+                    key.append("S")
+            else:
+                key.append("K")
+        elif c == "D":
+            key.append("J" if nxt == "G" and nxt2 in ("E", "I", "Y") else "T")
+        elif c == "G":
+            if nxt == "H" and not (i + 2 >= n or nxt2 in _VOWELS):
+                continue
+            if nxt == "N" and (i + 2 == n or w[i + 2:] == "ED"):
+                continue
+            if prev == "D" and nxt in ("E", "I", "Y"):
+                continue
+            key.append("J" if nxt in ("I", "E", "Y") else "K")
+        elif c == "H":
+            if prev in ("C", "S", "P", "T", "G"):
+                continue
+            if prev in _VOWELS and nxt not in _VOWELS:
+                continue
+            key.append("H")
+        elif c == "K":
+            if prev != "C":
+                key.append("K")
+        elif c == "P":
+            key.append("F" if nxt == "H" else "P")
+        elif c == "Q":
+            key.append("K")
+        elif c == "S":
+            if nxt == "H" or (nxt == "I" and nxt2 in ("O", "A")):
+                key.append("X")
+            else:
+                key.append("S")
+        elif c == "T":
+            if nxt == "I" and nxt2 in ("O", "A"):
+                key.append("X")
+            elif nxt == "H":
+                key.append("0")
+            elif not (nxt == "C" and nxt2 == "H"):
+                key.append("T")
+        elif c == "V":
+            key.append("F")
+        elif c == "W" or c == "Y":
+            if nxt in _VOWELS:
+                key.append(c)
+        elif c == "X":
+            key.append("KS")
+        elif c == "Z":
+            key.append("S")
+        else:
+            key.append(c)
+
+    return "".join(key)
+
+
+def phonetic_key(text: str) -> str:
+    """Phonetic key for a phrase; word keys are joined without spaces."""
+    return "".join(metaphone(w) for w in re.findall(r"[A-Za-z0-9]+", text))
+
+
+def trigrams(text: str) -> set[str]:
+    """Character trigrams of the compacted text, padded at both ends."""
+    padded = f" {compact(text)} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+def canonical_forms(term: str) -> list[str]:
+    """
+    Surface forms a vocabulary leaf can be snapped to.
+
+    "Snowpipe (auto-ingest)" -> ["Snowpipe"]
+    "Search Optimization Service (SOS)" -> ["Search Optimization Service", "SOS"]
+    """
+    forms = []
+    base = re.sub(r"\s*\(.*?\)\s*", " ", term).strip()
+    if base:
+        forms.append(base)
+    for inner in re.findall(r"\(([^();]+)\)", term):
+        inner = inner.strip()
+        # Keep acronyms and short aliases, not descriptive notes
+        if inner and len(inner.split()) <= 4 and not inner.islower():
+            forms.append(inner)
+    return forms
+
+
+def _same_words(a: str, b: str) -> bool:
+    """True if two phrases have the same words, ignoring case and a trailing plural."""
+    wa = re.findall(r"[a-z0-9]+", a.lower())
+    wb = re.findall(r"[a-z0-9]+", b.lower())
+    if len(wa) != len(wb):
+        return False
+    if wa[:-1] != wb[:-1]:
+        return False
+    x, y = sorted((wa[-1], wb[-1]), key=len)
+    return y in (x, x + "s", x + "es") or (x.endswith("y") and y == x[:-1] + "ies")
+
+
+@dataclass
+class Replacement:
+    """A transcript span matched to a canonical term."""
+    start: int
+    end: int
+    original: str
+    canonical: str
+    score: float
+
+
+@dataclass
+class SnapResult:
+    """Outcome of snapping one transcript."""
+    text: str
+    replacements: list[Replacement] = field(default_factory=list)
+    uncertain: list[Replacement] = field(default_factory=list)
+
+    @property
+    def confident(self) -> bool:
+        """True when no span needs a second opinion."""
+        return not self.uncertain
+
+
+class TermSnapper:
+    """
+    Phonetic + trigram index over canonical domain terms.
+    """
+
+    def __init__(self, vocab: list[str], threshold: float = DEFAULT_THRESHOLD):
+        self.threshold = threshold
+        self.terms: list[str] = []
+        self._compact: list[str] = []
+        self._keys: list[str] = []
+        self._grams: list[set[str]] = []
+        self._by_key: dict[str, list[int]] = {}
+        self._by_gram: dict[str, list[int]] = {}
+        self._by_compact: dict[str, int] = {}
+        # Single words that appear inside known terms are never treated as mishearings
+        self._known_words: set[str] = set()
+
+        seen = set()
+        for leaf in vocab:
+            for form in canonical_forms(leaf):
+                c = compact(form)
+                if not c or c in seen:
+                    continue
+                seen.add(c)
+                self._add(form, c)
+                self._known_words.update(compact(w) for w in form.split())
+
+    @classmethod
+    def from_yaml(cls, yaml_text: str, threshold: float = DEFAULT_THRESHOLD) -> "TermSnapper":
+        try:
+            data = yaml.safe_load(yaml_text) if yaml_text else None
+        except yaml.YAMLError:
+            data = None
+        return cls(extract_vocab_from_yaml(data) if data else [], threshold=threshold)
+
+    def _add(self, form: str, c: str):
+        idx = len(self.terms)
+        key = phonetic_key(form)
+        grams = trigrams(form)
+        self.terms.append(form)
+        self._compact.append(c)
+        self._keys.append(key)
+        self._grams.append(grams)
+        self._by_compact[c] = idx
+        if len(c) >= MIN_FUZZY_CHARS:
+            self._by_key.setdefault(key, []).append(idx)
+            for g in grams:
+                self._by_gram.setdefault(g, []).append(idx)
+
+    def __len__(self) -> int:
+        return len(self.terms)
+
+    def best_match(self, span: str) -> tuple[str, float] | None:
+        """Best canonical term for a span of text, with its confidence score."""
+        c = compact(span)
+        if not c:
+            return None
+
+        exact = self._by_compact.get(c)
+        if exact is not None:
+            return self.terms[exact], 1.0
+        if len(c) < MIN_FUZZY_CHARS:
+            return None
+
+        key = phonetic_key(span)
+        grams = trigrams(span)
+
+        overlap: dict[int, int] = {}
+        for g in grams:
+            for idx in self._by_gram.get(g, ()):
+                overlap[idx] = overlap.get(idx, 0) + 1
+        candidates = {idx for idx, n in overlap.items() if n >= 2}
+        candidates.update(self._by_key.get(key, ()))
+
+        best = None
+        for idx in candidates:
+            dice = 2 * len(grams & self._grams[idx]) / (len(grams) + len(self._grams[idx]))
+            phon = 1.0 if key == self._keys[idx] else SequenceMatcher(None, key, self._keys[idx]).ratio()
+            score = 0.6 * dice + 0.4 * phon
+            if best is None or score > best[1]:
+                best = (self.terms[idx], score)
+        return best
+
+    def candidates(self, text: str, limit: int = 15) -> list[str]:
+        """Canonical terms resembling some span of `text`, best first."""
+        words = list(_WORD_RE.finditer(text))
+        best: dict[str, float] = {}
+        for i in range(len(words)):
+            for j in range(i + 1, min(i + MAX_SPAN_WORDS, len(words)) + 1):
+                match = self.best_match(text[words[i].start():words[j - 1].end()])
+                if match and match[1] >= MIN_CANDIDATE_SCORE:
+                    best[match[0]] = max(best.get(match[0], 0.0), match[1])
+        return sorted(best, key=best.get, reverse=True)[:limit]
+
+    def snap(self, text: str) -> SnapResult:
+        """Replace confidently matched spans and report uncertain ones."""
+        words = list(_WORD_RE.finditer(text))
+        found: list[Replacement] = []
+
+        for i in range(len(words)):
+            for n in range(1, MAX_SPAN_WORDS + 1):
+                j = i + n
+                if j > len(words):
+                    break
+                # Spans never cross punctuation
+                if n > 1 and text[words[j - 2].end():words[j - 1].start()].strip():
+                    break
+                first, last = words[i].group().lower(), words[j - 1].group().lower()
+                if first in STOPWORDS or last in STOPWORDS:
+                    continue
+
+                start, end = words[i].start(), words[j - 1].end()
+                span = text[start:end]
+                if n == 1 and self._is_known_word(span):
+                    continue
+
+                match = self.best_match(span)
+                if match is None or match[1] < MIN_CANDIDATE_SCORE:
+                    continue
+                canonical, score = match
+                # Already written the canonical way (modulo case/plural): keep the
+                # span as-is, but let it claim its words so sub-spans don't match
+                if _same_words(span, canonical):
+                    canonical, score = span, 1.0
+                found.append(Replacement(start, end, span, canonical, score))
+
+        # Greedy: highest score first, longer spans win ties, no overlaps
+        found.sort(key=lambda r: (-r.score, -(r.end - r.start), r.start))
+        taken: list[Replacement] = []
+        for r in found:
+            if all(r.end <= t.start or r.start >= t.end for t in taken):
+                taken.append(r)
+        taken.sort(key=lambda r: r.start)
+
+        taken = [r for r in taken if r.canonical != r.original]
+        replacements = [r for r in taken if r.score >= self.threshold]
+        uncertain = [r for r in taken if r.score < self.threshold]
+
+        out, pos = [], 0
+        for r in replacements:
+            out.append(text[pos:r.start])
+            out.append(r.canonical)
+            pos = r.end
+        out.append(text[pos:])
+
+        return SnapResult(text="".join(out), replacements=replacements, uncertain=uncertain)
+
+    def _is_known_word(self, word: str) -> bool:
+        c = compact(word)
+        return any(_same_words(c, known) for known in (c, c[:-1], c[:-2], c[:-3] + "y")
+                   if known in self._known_words)
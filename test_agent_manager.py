@@ -0,0 +1,20 @@
+"""parse_json_response on the shapes LLM responses actually come back in."""
+
+import pytest
+
+from agent_manager import parse_json_response
+
+
+@pytest.mark.parametrize("content", [
+    '{"1": "what is Snowpipe"}',
+    '```json\n{"1": "what is Snowpipe"}\n```',
+    '```\n{"1": "what is Snowpipe"}```',
+    'Here you go:\n{"1": "what is Snowpipe"}\nHope that helps.',
+])
+def test_recovers_object(content):
+    assert parse_json_response(content) == {"1": "what is Snowpipe"}
+
+
+@pytest.mark.parametrize("content", [None, "", "not json", '["a list"]', '{"unterminated": '])
+def test_returns_none_without_an_object(content):
+    assert parse_json_response(content) is None
@@ -0,0 +1,129 @@
+"""TieredCache disk tier and answer caching of failed calls."""
+
+import asyncio
+import sqlite3
+import threading
+from types import SimpleNamespace
+
+from agent_manager import DomainAgent, get_agent_manager
+from answer_cache import AnswerCache, TieredCache
+from semantic_cache import SemanticCache
+
+
+def disk_rows(path, table="cache") -> int:
+    with sqlite3.connect(str(path)) as db:
+        return db.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0]
+
+
+def test_expired_disk_rows_are_deleted_on_read(tmp_path):
+    path = tmp_path / "cache.sqlite3"
+    cache = TieredCache(path, disk_ttl_s=60)
+    cache.put("k", "v")
+    fresh = TieredCache(path, disk_ttl_s=-1)
+    assert fresh.get("k") is None
+    assert disk_rows(path) == 0
+
+
+class FailingCompletions:
+    def create(self, **request):
+        raise ConnectionError("boom")
+
+
+class AnsweringCompletions:
+    def __init__(self, answer: str):
+        self.answer = answer
+
+    def create(self, **request):
+        message = SimpleNamespace(content=self.answer)
+        return SimpleNamespace(choices=[SimpleNamespace(message=message)], usage=None)
+
+
+def make_agent(completions) -> DomainAgent:
+    config = get_agent_manager().get_agent("snowflake")
+    client = SimpleNamespace(chat=SimpleNamespace(completions=completions))
+    return DomainAgent(config, api_key="test", client=client, cache=AnswerCache(None),
+                       semantic_cache=SemanticCache())
+
+
+def test_failed_answer_is_flagged_and_not_cached():
+    agent = make_agent(FailingCompletions())
+    answer = agent.answer("What is a warehouse?")
+    assert agent.last_stats.error == "boom"
+    assert answer.startswith("Error")
+    assert agent.cached_answer("What is a warehouse?") is None
+
+
+def test_answer_starting_with_error_is_cached():
+    text = "Error tables in Snowflake record rows that failed to load."
+    agent = make_agent(AnsweringCompletions(text))
+    assert agent.answer("What are error tables?") == text
+    assert agent.last_stats.error is None
+    assert agent.cached_answer("What are error tables?") == text
+
+
+def test_disk_tier_keeps_only_newest_entries(tmp_path):
+    path = tmp_path / "cache.sqlite3"
+    cache = TieredCache(path, max_disk_entries=3)
+    for i in range(5):
+        cache.put(f"k{i}", str(i))
+    assert disk_rows(path) == 3
+    fresh = TieredCache(path, max_disk_entries=3)
+    assert fresh.get("k0") is None and fresh.get("k1") is None
+    assert fresh.get("k4") == "4"
+
+
+def test_expired_disk_rows_are_pruned_on_write(tmp_path):
+    path = tmp_path / "cache.sqlite3"
+    TieredCache(path).put("old", "v")
+    TieredCache(path, disk_ttl_s=-1).put("new", "v")
+    with sqlite3.connect(str(path)) as db:
+        assert [k for (k,) in db.execute("SELECT key FROM cache")] == []
+
+
+def test_correct_and_answer_uses_answer_cache():
+    agent = make_agent(FailingCompletions())
+    agent.store_answer("how do iceberg tables work", "cached")
+    assert agent.correct_and_answer("how do iceberg tables work") == ("how do iceberg tables work", "cached")
+    assert agent.last_stats.cache_hit
+    assert agent.correction_stats.skipped == 1 and agent.correction_stats.llm_calls == 0
+
+
+def test_correct_and_answer_records_fallback():
+    agent = make_agent(FailingCompletions())
+    corrected, answer = agent.correct_and_answer("how do iceberg tables work")
+    assert corrected == "how do iceberg tables work"
+    assert agent.last_stats.fallback == "boom" and agent.last_stats.error == "boom"
+    # The failed combined attempt is still accounted for next to the fallback calls
+    assert agent.last_stats.combined_s > 0
+    assert agent.last_stats.combined_prompt_chars > len("how do iceberg tables work")
+    assert agent.last_stats.combined_prompt_chars != agent.last_stats.prompt_chars
+    assert agent.correction_stats.llm_calls == 2
+
+
+class ThreadRecordingCache(AnswerCache):
+    def __init__(self):
+        super().__init__(None)
+        self.threads = set()
+
+    def get_answer(self, *args):
+        self.threads.add(threading.get_ident())
+        return super().get_answer(*args)
+
+    def put_answer(self, *args):
+        self.threads.add(threading.get_ident())
+        return super().put_answer(*args)
+
+
+def test_async_answer_keeps_cache_io_off_event_loop():
+    config = get_agent_manager().get_agent("snowflake")
+    cache = ThreadRecordingCache()
+    agent = DomainAgent(config, api_key="test", client=SimpleNamespace(), cache=cache,
+                        semantic_cache=SemanticCache())
+
+    async def create(**request):
+        return AnsweringCompletions("Use a warehouse.").create(**request)
+
+    agent._async_client = SimpleNamespace(chat=SimpleNamespace(completions=SimpleNamespace(create=create)))
+    answer, stats = asyncio.run(agent.aanswer("What is a warehouse?"))
+    assert answer == "Use a warehouse." and stats.error is None
+    assert cache.threads and threading.get_ident() not in cache.threads
@@ -0,0 +1,36 @@
+"""AsrDaemon admission control over its Unix socket."""
+
+import asyncio
+import json
+
+from asr_daemon import _HEADER, AsrDaemon, _encode
+
+
+async def send(path: str, header: dict, payload: bytes = b"") -> dict:
+    reader, writer = await asyncio.open_unix_connection(path)
+    writer.write(_encode(header) + payload)
+    await writer.drain()
+    (length,) = _HEADER.unpack(await reader.readexactly(_HEADER.size))
+    reply = json.loads(await reader.readexactly(length))
+    writer.close()
+    return reply
+
+
+def test_full_queue_gets_busy_reply(tmp_path):
+    path = str(tmp_path / "asr.sock")
+
+    async def scenario():
+        daemon = AsrDaemon(workers=1, max_queue=0)
+        server = await daemon.serve(path)
+        await daemon._stage.acquire()
+        try:
+            reply = await send(path, {"samples": 1}, b"\0" * 4)
+            status = await send(path, {"op": "status"})
+        finally:
+            daemon._stage.release()
+            server.close()
+        return reply, status
+
+    reply, status = asyncio.run(scenario())
+    assert reply == {"error": "ASR queue is full", "busy": True, "retry_after": 0.5}
+    assert status["active"] == 1 and status["rejected"] == 1
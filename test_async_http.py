@@ -0,0 +1,49 @@
+"""async_http request parsing."""
+
+import asyncio
+
+import pytest
+
+from async_http import MAX_BODY_BYTES, MAX_HEADER_LINES, HTTPError, _read_request
+
+
+def parse(raw: bytes):
+    async def read():
+        reader = asyncio.StreamReader()
+        reader.feed_data(raw)
+        reader.feed_eof()
+        return await _read_request(reader)
+    return asyncio.run(read())
+
+
+def test_parses_request_line_headers_query_and_body():
+    request = parse(b"post /answer?agent=snowflake&a=1&a=2 HTTP/1.1\r\n"
+                    b"Host: localhost\r\nContent-Type: application/json\r\nContent-Length: 17\r\n\r\n"
+                    b'{"question": "q"}')
+    assert request.method == "POST" and request.path == "/answer"
+    assert request.query == {"agent": "snowflake", "a": "2"}
+    assert request.headers["content-type"] == "application/json"
+    assert request.json() == {"question": "q"}
+
+
+def test_closed_connection_is_none():
+    assert parse(b"") is None
+    assert parse(b"\r\n") is None
+
+
+@pytest.mark.parametrize("raw, status", [
+    (b"GET\r\n\r\n", 400),
+    (b"GET / HTTP/1.1\r\n" + b"X: y\r\n" * MAX_HEADER_LINES, 431),
+    (b"POST / HTTP/1.1\r\nContent-Length: %d\r\n\r\n" % (MAX_BODY_BYTES + 1), 413),
+    (b"POST / HTTP/1.1\r\nContent-Length: ten\r\n\r\n", 400),
+    (b"POST / HTTP/1.1\r\nContent-Length: -5\r\n\r\n", 400),
+])
+def test_bad_requests_raise(raw, status):
+    with pytest.raises(HTTPError) as e:
+        parse(raw)
+    assert e.value.status == status
+
+
+def test_truncated_body_raises_incomplete_read():
+    with pytest.raises(asyncio.IncompleteReadError):
+        parse(b"POST / HTTP/1.1\r\nContent-Length: 10\r\n\r\nshort")
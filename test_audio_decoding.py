@@ -0,0 +1,35 @@
+"""iter_decoded on compressed recordings, including damaged ones."""
+
+import io
+
+import av
+import numpy as np
+import pytest
+
+from audio_preprocessing import TARGET_SAMPLE_RATE, decode_audio_file
+
+
+def encode(container_format: str, codec: str, seconds: float = 6.0, rate: int = 44100) -> bytes:
+    """A mono 440 Hz tone encoded in memory with PyAV."""
+    x = (0.3 * np.sin(2 * np.pi * 440 * np.arange(int(rate * seconds)) / rate)).astype(np.float32)
+    buf = io.BytesIO()
+    with av.open(buf, "w", format=container_format) as container:
+        stream = container.add_stream(codec, rate=rate)
+        stream.layout = "mono"
+        for i in range(0, len(x), 1024):
+            frame = av.AudioFrame.from_ndarray(x[None, i:i + 1024], format="flt", layout="mono")
+            frame.rate, frame.pts = rate, i
+            for packet in stream.encode(frame):
+                container.mux(packet)
+        for packet in stream.encode(None):
+            container.mux(packet)
+    return buf.getvalue()
+
+
+@pytest.mark.parametrize("container_format, codec", [("mp3", "libmp3lame"), ("adts", "aac")])
+def test_corrupt_region_loses_only_its_frames(container_format, codec):
+    data = bytearray(encode(container_format, codec))
+    mid = len(data) // 2
+    data[mid:mid + 2000] = bytes((7 * i + 13) & 0xFF for i in range(2000))
+    duration = len(decode_audio_file(bytes(data))) / TARGET_SAMPLE_RATE
+    assert duration == pytest.approx(6.0, abs=0.5)
@@ -0,0 +1,26 @@
+"""resample_poly output length and fidelity."""
+
+import numpy as np
+import pytest
+
+from audio_preprocessing import resample_poly
+
+
+def sine(rate: int, seconds: float, freq: float = 440.0) -> np.ndarray:
+    return np.sin(2 * np.pi * freq * np.arange(int(rate * seconds)) / rate).astype(np.float32)
+
+
+@pytest.mark.parametrize("orig_rate", [48000, 44100, 22050, 8000])
+def test_length_and_sine_are_preserved(orig_rate):
+    x = sine(orig_rate, 1.0)
+    y = resample_poly(x, orig_rate, 16000)
+    assert y.dtype == np.float32
+    assert len(y) == -(-len(x) * 16000 // orig_rate)
+    # Filter edges aside, the output is the same tone sampled at 16 kHz
+    error = np.abs(y - sine(16000, 1.0)[:len(y)])[200:-200]
+    assert error.max() < 0.01
+
+
+def test_same_rate_is_passthrough():
+    x = sine(16000, 0.1)
+    assert np.array_equal(resample_poly(x, 16000, 16000), x)
@@ -0,0 +1,33 @@
+"""batch.py records and resume bookkeeping."""
+
+from types import SimpleNamespace
+
+from agent_manager import DomainAgent, get_agent_manager
+from answer_cache import AnswerCache
+from batch import _correct_and_answer, _write, completed_files
+from semantic_cache import SemanticCache
+from transcription import Transcript
+
+
+class FailingCompletions:
+    def create(self, **request):
+        raise ConnectionError("boom")
+
+
+def make_agent() -> DomainAgent:
+    config = get_agent_manager().get_agent("snowflake")
+    client = SimpleNamespace(chat=SimpleNamespace(completions=FailingCompletions()))
+    return DomainAgent(config, api_key="test", client=client, cache=AnswerCache(None),
+                       semantic_cache=SemanticCache())
+
+
+def test_failed_llm_calls_are_not_completed(tmp_path):
+    out_path = tmp_path / "out.jsonl"
+    record = {"file": "a.wav", "agent": "snowflake"}
+    # "iceberg tables" is an uncertain term, so correction calls the LLM too
+    record.update(_correct_and_answer(make_agent(), Transcript("how do iceberg tables work"), correct=True))
+    assert record["error"] == "correct: boom; answer: boom"
+    with open(out_path, "w", encoding="utf-8") as out:
+        _write(out, record)
+        _write(out, {"file": "b.wav", "agent": "snowflake", "answer": "ok"})
+    assert completed_files(out_path) == {"b.wav"}
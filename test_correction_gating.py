@@ -0,0 +1,91 @@
+"""Confidence gating of transcript correction (CorrectionPlan / DomainAgent.plan_correction)."""
+
+import json
+import re
+from types import SimpleNamespace
+
+import pytest
+
+from agent_manager import DomainAgent, get_agent_manager
+from answer_cache import AnswerCache
+from semantic_cache import SemanticCache
+from transcription import Segment, Transcript, Word
+
+
+class FakeClient:
+    """Records chat-completion requests and echoes numbered fragments back as JSON."""
+
+    def __init__(self):
+        self.requests = []
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self.create))
+
+    def create(self, **request):
+        self.requests.append(request)
+        prompt = request["messages"][-1]["content"]
+        fragments = dict(re.findall(r"^(\d+)\. (.*)$", prompt, re.M))
+        content = json.dumps(fragments) if "response_format" in request else prompt.split(": ", 1)[-1]
+        message = SimpleNamespace(content=content)
+        return SimpleNamespace(choices=[SimpleNamespace(message=message)], usage=None)
+
+    def fragments(self) -> list[str]:
+        prompt = self.requests[-1]["messages"][-1]["content"]
+        return re.findall(r"^\d+\. (.*)$", prompt, re.M)
+
+
+def make_transcript(*words: tuple[str, float]) -> Transcript:
+    """A one-segment transcript from (word, probability) pairs."""
+    text = " ".join(w for w, _ in words)
+    return Transcript(text, [Segment(text, -0.2, 0.0, 1.0,
+                                     [Word(f" {w}", 0.0, 0.0, p) for w, p in words])])
+
+
+@pytest.fixture
+def agent():
+    config = get_agent_manager().get_agent("snowflake")
+    assert config.word_confidence_threshold == 0.6
+    return DomainAgent(config, api_key="test", client=FakeClient(), cache=AnswerCache(None),
+                       semantic_cache=SemanticCache())
+
+
+def test_confident_transcript_skips_llm(agent):
+    transcript = make_transcript(("How", 0.9), ("does", 0.9), ("the", 0.9), ("cost", 0.9), ("work", 0.9))
+    plan = agent.plan_correction(transcript.text, transcript)
+    assert plan.spans == [] and plan.asr_confident and not plan.needs_llm
+    assert agent.correct_transcript(transcript.text, transcript) == transcript.text
+    assert agent.client.requests == []
+
+
+def test_low_confidence_word_is_sent_even_when_snapper_is_confident(agent):
+    transcript = make_transcript(("How", 0.9), ("does", 0.9), ("the", 0.9), ("cost", 0.3), ("work", 0.9))
+    plan = agent.plan_correction(transcript.text, transcript)
+    assert plan.snapped.confident
+    assert plan.needs_llm and not plan.asr_confident
+    agent.correct_transcript(transcript.text, transcript)
+    assert any("cost" in f for f in agent.client.fragments())
+
+
+def test_uncertain_term_is_sent_even_when_asr_is_confident(agent):
+    words = "how do iceberg tables work and does the bill work?".split()
+    transcript = make_transcript(*[(w, 0.3 if w == "bill" else 0.95) for w in words])
+    plan = agent.plan_correction(transcript.text, transcript)
+    assert not plan.snapped.confident
+    agent.correct_transcript(transcript.text, transcript)
+    fragments = agent.client.fragments()
+    assert any("iceberg tables" in f for f in fragments)
+    assert any("bill" in f for f in fragments)
+
+
+def test_uncertain_term_alone_triggers_one_fragment(agent):
+    words = "how do iceberg tables work".split()
+    transcript = make_transcript(*[(w, 0.95) for w in words])
+    plan = agent.plan_correction(transcript.text, transcript)
+    assert plan.asr_confident and plan.needs_llm
+    agent.correct_transcript(transcript.text, transcript)
+    assert agent.client.fragments() == ["how do iceberg tables work"]
+
+
+def test_without_word_confidences_only_snapper_decides(agent):
+    plan = agent.plan_correction("How does the cost work")
+    assert plan.spans is None and not plan.needs_llm
+    plan = agent.plan_correction("how do iceberg tables work")
+    assert plan.spans is None and plan.needs_llm
@@ -0,0 +1,33 @@
+"""KnowledgeIndex.search token budget."""
+
+from knowledge_index import Chunk, KnowledgeIndex
+
+
+def make_index() -> KnowledgeIndex:
+    return KnowledgeIndex([
+        Chunk("Warehouses", "warehouse warehouse sizing " + "credits " * 200),
+        Chunk("Warehouse", "a warehouse runs queries"),
+        Chunk("Stages", "stages hold files to load"),
+        Chunk("Scaling", "a warehouse can scale out"),
+    ])
+
+
+def test_search_skips_over_budget_chunk_and_keeps_filling():
+    index = make_index()
+    big, small, unrelated, other = index.chunks
+    assert big.tokens > 50 and small.tokens + other.tokens <= 50
+    unbounded = index.search("warehouse", token_budget=10_000)
+    assert unbounded.chunks[0] is big
+
+    result = index.search("warehouse", token_budget=50)
+    # The best match doesn't fit, but smaller lower-scoring matches still do
+    assert result.chunks == [small, other]
+    assert sum(c.tokens for c in result.chunks) <= 50
+    assert unrelated not in result.chunks
+
+
+def test_search_respects_top_k_within_budget():
+    index = make_index()
+    result = index.search("warehouse", top_k=1, token_budget=50)
+    assert len(result.chunks) == 1
+    assert result.total_chunks == 4
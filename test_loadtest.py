@@ -0,0 +1,52 @@
+"""loadtest.py driving the real Cerebras client against mock_cerebras."""
+
+import asyncio
+import threading
+
+import pytest
+
+from async_http import serve
+from loadtest import build_agent, run_load
+from mock_cerebras import MockCerebras, MockSettings
+
+TTFT_S = 0.05
+
+
+@pytest.fixture
+def mock_url():
+    """A mock server on an ephemeral port, on its own event loop thread."""
+    mock = MockCerebras(MockSettings(ttft_ms=TTFT_S * 1000, ttft_sigma=0, tokens_per_s=2000,
+                                     completion_tokens=40, seed=0))
+    loop = asyncio.new_event_loop()
+    server = loop.run_until_complete(serve(mock.router(), "127.0.0.1", 0))
+    thread = threading.Thread(target=loop.run_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{server.sockets[0].getsockname()[1]}"
+
+    async def shutdown():
+        # Keep-alive connection handlers are still waiting for the next request
+        server.close()
+        tasks = [t for t in asyncio.all_tasks() if t is not asyncio.current_task()]
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    asyncio.run_coroutine_threadsafe(shutdown(), loop).result(5)
+    loop.call_soon_threadsafe(loop.stop)
+    thread.join(5)
+    loop.close()
+
+
+@pytest.mark.parametrize("mode", ["answer", "stream"])
+def test_reports_latency_and_ttft(mock_url, mode):
+    agent = build_agent("snowflake", mock_url, cache=False)
+    result = asyncio.run(run_load(agent, mode, ["what is a virtual warehouse"], total=1, concurrency=1))
+    summary = result.summary()
+    assert summary["requests"] == 1 and summary["errors"] == 0, summary["error_samples"]
+    latency = summary["latency_s"]["p50"]
+    assert TTFT_S <= latency < 5
+    if mode == "stream":
+        ttft = summary["ttft_s"]["p50"]
+        assert TTFT_S <= ttft <= latency
+    else:
+        assert summary["ttft_s"] is None
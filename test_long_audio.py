@@ -0,0 +1,65 @@
+"""split_chunks cutting at pauses and dedupe_overlap stitching."""
+
+import numpy as np
+import pytest
+
+import long_audio
+from audio_preprocessing import TARGET_SAMPLE_RATE as SR
+from long_audio import ChunkingConfig, dedupe_overlap, split_chunks
+
+
+def fake_speech_timestamps(audio, vad=None):
+    """Any non-silent run of samples counts as speech."""
+    loud = np.concatenate([[False], np.abs(audio) > 0.01, [False]])
+    edges = np.flatnonzero(np.diff(loud.astype(np.int8)))
+    return [{"start": int(a), "end": int(b)} for a, b in zip(edges[::2], edges[1::2])]
+
+
+@pytest.fixture(autouse=True)
+def amplitude_vad(monkeypatch):
+    monkeypatch.setattr(long_audio, "get_speech_timestamps", fake_speech_timestamps)
+
+
+def speech(seconds: float) -> np.ndarray:
+    return np.full(int(seconds * SR), 0.5, dtype=np.float32)
+
+
+def silence(seconds: float) -> np.ndarray:
+    return np.zeros(int(seconds * SR), dtype=np.float32)
+
+
+def windows(audio: np.ndarray, seconds: float = 5.0):
+    step = int(seconds * SR)
+    return (audio[i:i + step] for i in range(0, len(audio), step))
+
+
+CONFIG = ChunkingConfig(chunk_s=20.0, min_chunk_s=5.0, overlap_s=1.0)
+
+
+def test_cuts_at_latest_pause():
+    audio = np.concatenate([speech(8), silence(1), speech(8), silence(1), speech(8)])
+    chunks = list(split_chunks(windows(audio), CONFIG))
+    assert [c.start_s for c in chunks] == [0.0, 17.5]
+    assert all(c.overlap_s == 0.0 for c in chunks)
+    assert np.array_equal(np.concatenate([c.samples for c in chunks]), audio)
+
+
+def test_hard_cut_without_pause_overlaps_next_chunk():
+    chunks = list(split_chunks(windows(speech(45)), CONFIG))
+    assert [(c.start_s, c.end_s, c.overlap_s) for c in chunks] == \
+        [(0.0, 20.0, 0.0), (19.0, 39.0, 1.0), (38.0, 45.0, 1.0)]
+    assert [c.index for c in chunks] == [0, 1, 2]
+
+
+def test_silent_chunks_are_skipped():
+    audio = np.concatenate([silence(25), speech(3)])
+    chunks = list(split_chunks(windows(audio), CONFIG))
+    assert len(chunks) == 1 and chunks[0].start_s == 20.0
+    assert chunks[0].index == 0
+
+
+def test_dedupe_overlap_drops_repeated_words():
+    assert dedupe_overlap("the quick brown fox", "Brown fox, jumps over") == "jumps over"
+    assert dedupe_overlap("the quick brown fox", "jumps over") == "jumps over"
+    assert dedupe_overlap("", "jumps over") == "jumps over"
+    assert dedupe_overlap("a b c d e f g h i", "b c d e f g h i j", max_words=8) == "j"
@@ -0,0 +1,73 @@
+"""Speculative answers stream instead of blocking until complete."""
+
+import threading
+from types import SimpleNamespace
+
+import pytest
+
+from agent_manager import DomainAgent, get_agent_manager
+from answer_cache import AnswerCache
+from pipeline import SpeculativeAnswer
+from semantic_cache import SemanticCache
+
+
+def chunk(text: str):
+    delta = SimpleNamespace(content=text)
+    return SimpleNamespace(choices=[SimpleNamespace(delta=delta)], usage=None)
+
+
+class GatedStreamCompletions:
+    """Streams `first`, then waits for `gate` before streaming `rest`."""
+
+    def __init__(self, first: list[str], rest: list[str]):
+        self.first = first
+        self.rest = rest
+        self.gate = threading.Event()
+
+    def create(self, stream=False, **request):
+        assert stream
+        for text in self.first:
+            yield chunk(text)
+        assert self.gate.wait(5)
+        for text in self.rest:
+            yield chunk(text)
+
+
+def make_agent(completions) -> DomainAgent:
+    config = get_agent_manager().get_agent("snowflake")
+    client = SimpleNamespace(chat=SimpleNamespace(completions=completions))
+    return DomainAgent(config, api_key="test", client=client, cache=AnswerCache(None),
+                       semantic_cache=SemanticCache())
+
+
+def test_speculative_stream_yields_before_answer_is_complete():
+    completions = GatedStreamCompletions(["A warehouse ", "is "], ["compute."])
+    speculative = SpeculativeAnswer(make_agent(completions), "What is a warehouse?")
+    stream = speculative.stream()
+    # Buffered deltas come through while the request is still generating
+    assert next(stream) + next(stream) == "A warehouse is "
+    assert not speculative._future.done()
+    completions.gate.set()
+    assert list(stream) == ["compute."]
+    answer, stats = speculative.result(timeout=5)
+    assert answer == "A warehouse is compute."
+    assert stats.ttft_s is not None
+
+
+def test_speculative_stream_replays_cached_answer():
+    agent = make_agent(GatedStreamCompletions([], []))
+    agent.store_answer("What is a warehouse?", "Compute.")
+    speculative = SpeculativeAnswer(agent, "What is a warehouse?")
+    assert "".join(speculative.stream()) == "Compute."
+    assert speculative.result(timeout=5)[1].cache_hit
+
+
+def test_cancelled_speculative_stream_raises():
+    completions = GatedStreamCompletions(["A warehouse "], ["is compute."])
+    speculative = SpeculativeAnswer(make_agent(completions), "What is a warehouse?")
+    stream = speculative.stream()
+    assert next(stream) == "A warehouse "
+    speculative.cancel()
+    completions.gate.set()
+    with pytest.raises(RuntimeError):
+        list(stream)
@@ -0,0 +1,37 @@
+"""SemanticCache hits for paraphrases and misses for near-miss opposites."""
+
+import pytest
+
+from semantic_cache import DEFAULT_THRESHOLD, SemanticCache
+
+
+def cache_with(question: str) -> SemanticCache:
+    cache = SemanticCache()
+    cache.add("snowflake", "v1", question, "cached answer")
+    return cache
+
+
+@pytest.mark.parametrize("cached, asked", [
+    ("how does snowpipe work", "how do snow pipes work"),
+    ("What is time travel?", "what is time travel"),
+])
+def test_paraphrase_hits(cached, asked):
+    match = cache_with(cached).lookup("snowflake", "v1", asked, DEFAULT_THRESHOLD)
+    assert match is not None and match.answer == "cached answer"
+
+
+@pytest.mark.parametrize("cached, asked", [
+    ("how do I enable search optimization", "how do I disable search optimization"),
+    ("what is the max size of a warehouse", "what is the min size of a warehouse"),
+    ("how does time travel work", "how does not time travel work"),
+    ("why does my task run", "why doesn't my task run"),
+])
+def test_opposite_meaning_misses(cached, asked):
+    assert cache_with(cached).lookup("snowflake", "v1", asked, DEFAULT_THRESHOLD) is None
+
+
+def test_best_match_with_same_polarity_wins():
+    cache = cache_with("how do I disable search optimization")
+    cache.add("snowflake", "v1", "how do I enable search optimization", "enable answer")
+    match = cache.lookup("snowflake", "v1", "How do I enable search optimization?", DEFAULT_THRESHOLD)
+    assert match is not None and match.answer == "enable answer"
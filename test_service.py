@@ -0,0 +1,99 @@
+"""PipelineService handlers, called directly without a socket."""
+
+import asyncio
+import json
+
+import pytest
+
+from async_http import HTTPError, Request
+from service import PipelineService
+
+
+def request(method: str, path: str, query: dict | None = None, body=b"") -> Request:
+    if not isinstance(body, bytes):
+        body = json.dumps(body).encode("utf-8")
+    return Request(method, path, query or {}, {}, body)
+
+
+def run(coro):
+    return asyncio.run(coro)
+
+
+@pytest.fixture
+def no_api_key(monkeypatch):
+    monkeypatch.delenv("CEREBRAS_API_KEY", raising=False)
+
+
+def test_stream_start_needs_no_llm_key(no_api_key):
+    service = PipelineService()
+    response = run(service.stream_start(request("POST", "/stream/start", {"agent": "snowflake"})))
+    assert response.status == 200
+    assert "session" in json.loads(response.body)
+
+
+def test_unknown_agent_is_404_for_asr_endpoints(no_api_key):
+    service = PipelineService()
+    with pytest.raises(HTTPError) as e:
+        run(service.stream_start(request("POST", "/stream/start", {"agent": "nope"})))
+    assert e.value.status == 404
+    with pytest.raises(HTTPError) as e:
+        run(service.transcribe(request("POST", "/transcribe", {"agent": "nope"}, b"RIFF")))
+    assert e.value.status == 404
+
+
+class FakeAgent:
+    async def acorrect_transcript(self, text):
+        return text
+
+    async def aanswer_stream(self, question, stats):
+        for word in question.split():
+            yield word
+
+
+class FakeWriter:
+    def __init__(self):
+        self.data = bytearray()
+
+    def write(self, data):
+        self.data += data
+
+    async def drain(self):
+        pass
+
+
+@pytest.fixture
+def service(monkeypatch):
+    service = PipelineService(llm_concurrency=1, llm_queue=0)
+    async def agent(agent_id):
+        return FakeAgent()
+
+    monkeypatch.setattr(service, "_agent", agent)
+    return service
+
+
+@pytest.mark.parametrize("value", [None, "", "  ", 5, ["hi"], {"q": "hi"}])
+def test_text_fields_must_be_non_empty_strings(service, value):
+    with pytest.raises(HTTPError) as e:
+        run(service.correct(request("POST", "/correct", body={"agent": "a", "text": value})))
+    assert e.value.status == 400
+    with pytest.raises(HTTPError) as e:
+        run(service.answer(request("POST", "/answer", body={"agent": "a", "question": value})))
+    assert e.value.status == 400
+
+
+def test_streamed_answer_takes_llm_slot_before_headers(service):
+    body = {"agent": "a", "question": "what is snowpipe", "stream": True}
+
+    async def scenario():
+        response = await service.answer(request("POST", "/answer", body=body))
+        assert service.llm.active == 1
+        # The only slot is held and the queue is empty: reject before any header goes out
+        rejected = await service.router().dispatch(request("POST", "/answer", body=body))
+        assert rejected.status == 503 and rejected.headers == {"Retry-After": "1"}
+        writer = FakeWriter()
+        await response.write(writer, keep_alive=False)
+        assert service.llm.active == 0
+        return bytes(writer.data)
+
+    data = run(scenario())
+    assert data.startswith(b"HTTP/1.1 200") and b'"done": true' in data
@@ -0,0 +1,35 @@
+"""TermSnapper.snap against the snowflake agent's terms."""
+
+import pytest
+
+from agent_manager import get_agent_manager
+
+
+@pytest.fixture(scope="module")
+def snapper():
+    return get_agent_manager().get_agent("snowflake").term_snapper
+
+
+def test_misheard_term_is_replaced(snapper):
+    result = snapper.snap("What is SNOW PIPE?")
+    assert result.text == "What is Snowpipe?"
+    assert [(r.start, r.end, r.original, r.canonical) for r in result.replacements] == \
+        [(8, 17, "SNOW PIPE", "Snowpipe")]
+    assert result.confident
+
+
+def test_plain_text_is_untouched(snapper):
+    for text in ["how does the cost work", ""]:
+        result = snapper.snap(text)
+        assert result.text == text and result.replacements == [] and result.confident
+
+
+def test_spans_do_not_cross_punctuation(snapper):
+    assert snapper.snap("snow. pipe").text == "snow. pipe"
+
+
+def test_partial_match_is_uncertain_and_left_in_place(snapper):
+    result = snapper.snap("how do iceberg tables work")
+    assert result.text == "how do iceberg tables work"
+    assert not result.confident
+    assert [(r.original, r.canonical) for r in result.uncertain] == [("iceberg tables", "Apache Iceberg tables")]
@@ -0,0 +1,41 @@
+"""get_whisper_model's shared model cache under concurrent loads."""
+
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+import transcription
+from transcription import AsrProfile, get_whisper_model
+
+
+class FakeWhisperModel:
+    """Records constructions; loading "medium" blocks until released."""
+    loads: list[str] = []
+    release = threading.Event()
+
+    def __init__(self, model_size, **kwargs):
+        FakeWhisperModel.loads.append(model_size)
+        if model_size == "medium":
+            assert FakeWhisperModel.release.wait(5)
+
+
+@pytest.fixture(autouse=True)
+def fake_models(monkeypatch):
+    FakeWhisperModel.loads = []
+    FakeWhisperModel.release = threading.Event()
+    monkeypatch.setattr(transcription, "WhisperModel", FakeWhisperModel)
+    monkeypatch.setattr(transcription, "_models", transcription.OrderedDict())
+    monkeypatch.setattr(transcription, "_load_locks", {})
+
+
+def test_loaded_model_is_not_blocked_by_a_cold_load():
+    tiny = get_whisper_model(AsrProfile(model_size="tiny"))
+    with ThreadPoolExecutor(max_workers=3) as pool:
+        cold = [pool.submit(get_whisper_model, AsrProfile(model_size="medium")) for _ in range(2)]
+        # "medium" is still loading; the cached "tiny" comes straight back
+        assert pool.submit(get_whisper_model, AsrProfile(model_size="tiny")).result(timeout=1) is tiny
+        FakeWhisperModel.release.set()
+        first, second = (f.result(timeout=5) for f in cold)
+    assert first is second
+    assert FakeWhisperModel.loads == ["tiny", "medium"]
@@ -0,0 +1,136 @@
+"""
+Tracing Module
+
+Lightweight per-stage latency tracing for the voice pipeline. Each request
+is a `Trace` made of named spans (export, transcribe, correct, answer) with
+wall-clock start/end and stage attributes such as audio length, real-time
+factor, prompt/response sizes and cache hits.
+
+Finished traces are appended as one JSON line to `requests.jsonl` (or
+REQUEST_LOG_PATH) and folded into in-process per-stage percentiles.
+"""
+
+import json
+import os
+import threading
+import time
+import uuid
+from collections import deque
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Iterator
+
+import numpy as np
+
+
+DEFAULT_LOG_PATH = Path(__file__).parent / "requests.jsonl"
+DEFAULT_WINDOW = 1000
+
+
+@dataclass
+class Span:
+    """One timed pipeline stage."""
+    name: str
+    start: float
+    end: float | None = None
+    attrs: dict = field(default_factory=dict)
+
+    @property
+    def duration_s(self) -> float | None:
+        return None if self.end is None else self.end - self.start
+
+    def to_dict(self) -> dict:
+        return {"name": self.name, "start": round(self.start, 6),
+                "end": None if self.end is None else round(self.end, 6),
+                "duration_s": None if self.end is None else round(self.duration_s, 6),
+                **self.attrs}
+
+
+class Trace:
+    """
+    All spans for one pipeline request.
+    """
+
+    def __init__(self, **attrs):
+        self.request_id = uuid.uuid4().hex
+        self.start = time.time()
+        self.attrs = attrs
+        self.spans: list[Span] = []
+        self.finished = False
+
+    @contextmanager
+    def span(self, name: str, **attrs) -> Iterator[Span]:
+        """Time a block; attributes can be added to the yielded span inside it."""
+        span = Span(name, time.time(), attrs=attrs)
+        self.spans.append(span)
+        try:
+            yield span
+        except Exception as e:
+            span.attrs["error"] = f"{type(e).__name__}: {e}"
+            raise
+        finally:
+            span.end = time.time()
+
+    def to_record(self) -> dict:
+        end = max((s.end for s in self.spans if s.end is not None), default=self.start)
+        return {"request_id": self.request_id, "start": round(self.start, 6),
+                "total_s": round(end - self.start, 6), **self.attrs,
+                "spans": [s.to_dict() for s in self.spans]}
+
+    def finish(self, tracer: "Tracer | None" = None):
+        """Record the trace once; later calls are ignored."""
+        if not self.finished:
+            self.finished = True
+            (tracer or get_tracer()).record(self)
+
+
+class Tracer:
+    """
+    Appends finished traces to a JSONL file and keeps a rolling window of
+    durations per stage for percentile summaries.
+    """
+
+    def __init__(self, path: Path | str = DEFAULT_LOG_PATH, window: int = DEFAULT_WINDOW):
+        self.path = Path(path)
+        self.window = window
+        self._durations: dict[str, deque[float]] = {}
+        self._lock = threading.Lock()
+
+    def record(self, trace: Trace):
+        record = trace.to_record()
+        line = json.dumps(record, ensure_ascii=False) + "\n"
+        with self._lock:
+            for span in trace.spans:
+                if span.end is not None:
+                    self._durations.setdefault(span.name, deque(maxlen=self.window)).append(span.duration_s)
+            self._durations.setdefault("total", deque(maxlen=self.window)).append(record["total_s"])
+            try:
+                with open(self.path, "a", encoding="utf-8") as f:
+                    f.write(line)
+            except OSError:
+                # Tracing must never break the request it describes
+                pass
+
+    def summary(self) -> dict[str, dict[str, float]]:
+        """{stage: {"count", "p50", "p95"}} over the rolling window, in seconds."""
+        with self._lock:
+            snapshot = {name: np.fromiter(d, dtype=float) for name, d in self._durations.items() if d}
+        return {
+            name: {"count": len(values),
+                   "p50": float(np.percentile(values, 50)),
+                   "p95": float(np.percentile(values, 95))}
+            for name, values in snapshot.items()
+        }
+
+
+# Singleton instance
+_tracer: Tracer | None = None
+
+
+def get_tracer() -> Tracer:
+    """Get the process-wide tracer."""
+    global _tracer
+    if _tracer is None:
+        _tracer = Tracer(os.environ.get("REQUEST_LOG_PATH", DEFAULT_LOG_PATH))
+    return _tracer
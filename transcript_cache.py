@@ -0,0 +1,71 @@
+"""
+Transcript Cache Module
+
+Two-tier cache (see answer_cache.TieredCache) for Whisper transcripts, so
+re-runs, retries and replays of the same recording skip ASR entirely.
+
+Entries are keyed by a hash of the normalized 16 kHz int16 PCM plus
+everything that changes the decode: the full ASR profile (model, compute
+type, beam size, cascade thresholds, ...) and the vocabulary bias.
+"""
+
+import hashlib
+import json
+import os
+from dataclasses import asdict, replace
+from pathlib import Path
+
+from answer_cache import TieredCache
+from audio_preprocessing import PreparedAudio
+from transcription import AsrProfile, Transcript
+from vocab_bias import DecodingBias
+
+
+DEFAULT_CACHE_PATH = Path(__file__).parent / ".cache" / "transcripts.sqlite3"
+
+
+def audio_hash(prepared: PreparedAudio) -> str:
+    """Fast content hash of a normalized recording."""
+    digest = hashlib.blake2b(digest_size=16)
+    digest.update(str(prepared.sample_rate).encode("ascii"))
+    digest.update(memoryview(prepared.samples).cast("B"))
+    return digest.hexdigest()
+
+
+class TranscriptCache(TieredCache):
+    """
+    Transcripts keyed by audio hash, ASR profile and vocabulary bias.
+    """
+
+    def __init__(self, db_path: Path | str | None = DEFAULT_CACHE_PATH, max_entries: int = 256,
+                 max_disk_entries: int = 10_000, **kwargs):
+        super().__init__(db_path, table="transcripts", max_entries=max_entries,
+                         max_disk_entries=max_disk_entries, **kwargs)
+
+    @staticmethod
+    def make_key(audio_key: str, profile: AsrProfile, bias: DecodingBias | None = None) -> str:
+        settings = json.dumps([asdict(profile), asdict(bias) if bias else None], sort_keys=True)
+        return hashlib.sha256(f"{audio_key}\0{settings}".encode("utf-8")).hexdigest()
+
+    def get_transcript(self, audio_key: str, profile: AsrProfile,
+                       bias: DecodingBias | None = None) -> Transcript | None:
+        """A cached transcript, with `decode_s` zeroed since no decode ran."""
+        value = self.get(self.make_key(audio_key, profile, bias))
+        return replace(Transcript.from_dict(json.loads(value)), decode_s=0.0) if value else None
+
+    def put_transcript(self, audio_key: str, profile: AsrProfile, bias: DecodingBias | None,
+                       transcript: Transcript):
+        self.put(self.make_key(audio_key, profile, bias), json.dumps(transcript.to_dict()),
+                 namespace=profile.model_size)
+
+
+# Singleton instance
+_transcript_cache: TranscriptCache | None = None
+
+
+def get_transcript_cache() -> TranscriptCache:
+    """Get the process-wide transcript cache (path overridable via TRANSCRIPT_CACHE_PATH)."""
+    global _transcript_cache
+    if _transcript_cache is None:
+        _transcript_cache = TranscriptCache(os.environ.get("TRANSCRIPT_CACHE_PATH") or DEFAULT_CACHE_PATH)
+    return _transcript_cache
@@ -0,0 +1,441 @@
+"""
+Transcription Module
+
+In-memory speech-to-text for recordings captured by `audiorecorder`.
+Audio is handed to faster-whisper as a float32 NumPy array, so nothing is
+written to disk and concurrent sessions never share a temp file.
+
+Each agent can declare an `AsrProfile` (model size, quantization, decoding
+options, vocabulary bias); loaded models are shared through a small
+process-wide cache.
+
+Results come back as a `Transcript` that keeps Whisper's segment and word
+confidences, so correction can skip clean recordings and only send the
+low-confidence spans to the LLM.
+
+A profile with a `cascade` decodes with a small draft model first and only
+re-decodes with its own model when the draft looks poor; `AsrStats` tracks
+how often that happens and what it costs.
+"""
+
+import re
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import asdict, dataclass, field, replace
+
+import numpy as np
+from faster_whisper import WhisperModel
+from pydub import AudioSegment
+
+from audio_preprocessing import PreparedAudio, decode_audio_file, prepare_audio
+from vocab_bias import DEFAULT_TOKEN_BUDGET, DecodingBias
+
+
+# faster-whisper's default temperature fallback schedule
+DEFAULT_TEMPERATURES = (0.0, 0.2, 0.4, 0.6, 0.8, 1.0)
+MAX_LOADED_MODELS = 3
+VOCAB_BIAS_MODES = ("none", "initial_prompt", "hotwords")
+# Whisper's own "decoding failed" mark for a segment
+LOW_AVG_LOGPROB = -1.0
+
+
+@dataclass(frozen=True)
+class CascadeSettings:
+    """
+    When a draft transcript is good enough to skip the full model.
+
+    Thresholds follow Whisper's own fallback heuristics: a segment whose
+    average log probability is too low or whose text compresses too well
+    (repetition loops) counts as a poor decode.
+    """
+    draft_model: str = "base"
+    draft_compute_type: str = "int8"
+    min_avg_logprob: float = -0.6
+    max_compression_ratio: float = 2.4
+    # Needs word_timestamps; 0 disables the word check
+    min_word_probability: float = 0.0
+
+    @classmethod
+    def from_dict(cls, data: dict | None) -> "CascadeSettings | None":
+        """Build settings from the `asr.cascade` section; None if absent or disabled."""
+        if not data or not data.get("enabled", True):
+            return None
+        return cls(
+            draft_model=str(data.get("draft_model", "base")),
+            draft_compute_type=str(data.get("draft_compute_type", "int8")),
+            min_avg_logprob=float(data.get("min_avg_logprob", -0.6)),
+            max_compression_ratio=float(data.get("max_compression_ratio", 2.4)),
+            min_word_probability=float(data.get("min_word_probability", 0.0)),
+        )
+
+    def should_escalate(self, draft: "Transcript") -> bool:
+        """True if the draft decode looks too poor to keep."""
+        if not draft.segments:
+            # The draft heard nothing; let the full model have a go
+            return True
+        for seg in draft.segments:
+            if seg.avg_logprob < self.min_avg_logprob or seg.compression_ratio > self.max_compression_ratio:
+                return True
+            if self.min_word_probability and any(w.probability < self.min_word_probability
+                                                 for w in seg.words):
+                return True
+        return False
+
+
+@dataclass(frozen=True)
+class AsrProfile:
+    """
+    How an agent's recordings are transcribed.
+
+    The defaults match plain `WhisperModel("small").transcribe(...)`.
+    """
+    model_size: str = "small"
+    compute_type: str = "default"
+    cpu_threads: int = 0
+    beam_size: int = 5
+    language: str | None = None
+    temperatures: tuple[float, ...] = DEFAULT_TEMPERATURES
+    vad_filter: bool = False
+    vocab_bias: str = "none"
+    bias_tokens: int = DEFAULT_TOKEN_BUDGET
+    word_timestamps: bool = False
+    cascade: CascadeSettings | None = None
+
+    @classmethod
+    def from_dict(cls, data: dict | None) -> "AsrProfile":
+        """Build a profile from the `asr:` section of an agent's config.yaml."""
+        if not data:
+            return cls()
+        temperature = data.get("temperature", DEFAULT_TEMPERATURES)
+        if isinstance(temperature, (int, float)):
+            # A single temperature disables the fallback
+            temperature = (temperature,)
+        vocab_bias = str(data.get("vocab_bias", "none"))
+        return cls(
+            model_size=str(data.get("model", "small")),
+            compute_type=str(data.get("compute_type", "default")),
+            cpu_threads=int(data.get("cpu_threads", 0)),
+            beam_size=int(data.get("beam_size", 5)),
+            language=data.get("language") or None,
+            temperatures=tuple(float(t) for t in temperature),
+            vad_filter=bool(data.get("vad", False)),
+            vocab_bias=vocab_bias if vocab_bias in VOCAB_BIAS_MODES else "none",
+            bias_tokens=int(data.get("bias_tokens", DEFAULT_TOKEN_BUDGET)),
+            word_timestamps=bool(data.get("word_timestamps", False)),
+            cascade=CascadeSettings.from_dict(data.get("cascade")),
+        )
+
+    @property
+    def model_key(self) -> tuple[str, str, int]:
+        """The settings that require a separately loaded model."""
+        return (self.model_size, self.compute_type, self.cpu_threads)
+
+    @property
+    def draft_profile(self) -> "AsrProfile | None":
+        """The cascade's first-pass profile: same decoding options, smaller model."""
+        if self.cascade is None:
+            return None
+        return replace(self, model_size=self.cascade.draft_model,
+                       compute_type=self.cascade.draft_compute_type, cascade=None)
+
+    def transcribe_kwargs(self, bias: DecodingBias | None = None) -> dict:
+        """Decoding options for `WhisperModel.transcribe`, including the agent's term bias."""
+        kwargs = {
+            "beam_size": self.beam_size,
+            "language": self.language,
+            "temperature": list(self.temperatures),
+            "vad_filter": self.vad_filter,
+            "word_timestamps": self.word_timestamps,
+        }
+        if bias and self.vocab_bias == "initial_prompt":
+            kwargs["initial_prompt"] = bias.initial_prompt
+        elif bias and self.vocab_bias == "hotwords":
+            kwargs["hotwords"] = bias.hotwords
+        return kwargs
+
+
+_models: OrderedDict[tuple[str, str, int], WhisperModel] = OrderedDict()
+_models_lock = threading.Lock()
+# One per model key, held while that model loads
+_load_locks: dict[tuple[str, str, int], threading.Lock] = {}
+
+
+def get_whisper_model(profile: AsrProfile | None = None) -> WhisperModel:
+    """
+    Get a loaded Whisper model for a profile.
+
+    Profiles that differ only in decoding options share one model; the
+    least recently used model is dropped once MAX_LOADED_MODELS are loaded.
+    A cold load (seconds) only holds that model's lock, so lookups of
+    models that are already loaded never wait behind it.
+    """
+    profile = profile or AsrProfile()
+    key = profile.model_key
+    with _models_lock:
+        model = _models.get(key)
+        if model is not None:
+            _models.move_to_end(key)
+            return model
+        load_lock = _load_locks.setdefault(key, threading.Lock())
+    with load_lock:
+        with _models_lock:
+            model = _models.get(key)
+        if model is None:
+            model = WhisperModel(profile.model_size, device="cpu", compute_type=profile.compute_type,
+                                 cpu_threads=profile.cpu_threads)
+            with _models_lock:
+                _models[key] = model
+                while len(_models) > MAX_LOADED_MODELS:
+                    _models.popitem(last=False)
+    return model
+
+
+def audio_to_float32(audio: AudioSegment | PreparedAudio | np.ndarray | str) -> np.ndarray:
+    """Convert a recording (or an audio file path) to mono 16 kHz float32 samples."""
+    if isinstance(audio, np.ndarray):
+        return audio
+    if isinstance(audio, str):
+        return decode_audio_file(audio)
+    return prepare_audio(audio).to_float32()
+
+
+def normalize_word(word: str) -> str:
+    """Lowercase a word and drop punctuation, for comparing words across decodes."""
+    return re.sub(r"[^\w']", "", word.lower())
+
+
+@dataclass
+class Word:
+    """One decoded word and Whisper's probability for it."""
+    text: str
+    start: float
+    end: float
+    probability: float
+
+
+@dataclass
+class Segment:
+    """One decoded segment with its confidence signals."""
+    text: str
+    avg_logprob: float
+    no_speech_prob: float
+    compression_ratio: float
+    words: list[Word] = field(default_factory=list)
+
+
+@dataclass
+class Transcript:
+    """
+    Transcript text plus the confidences Whisper reported for it.
+
+    Word probabilities are only present when the profile decodes with
+    `word_timestamps`; without them nothing can be judged confident.
+    """
+    text: str
+    segments: list[Segment] = field(default_factory=list)
+    info: object = None
+    # Set by transcribe_with_profile
+    model: str | None = None
+    escalated: bool = False
+    decode_s: float = 0.0
+
+    @property
+    def words(self) -> list[Word]:
+        return [w for seg in self.segments for w in seg.words]
+
+    @property
+    def min_word_probability(self) -> float | None:
+        words = self.words
+        return min(w.probability for w in words) if words else None
+
+    @property
+    def avg_logprob(self) -> float | None:
+        """Mean of the segment average log probabilities."""
+        if not self.segments:
+            return None
+        return sum(s.avg_logprob for s in self.segments) / len(self.segments)
+
+    def to_dict(self) -> dict:
+        """JSON-serializable form; `info` is not kept."""
+        return {"text": self.text, "segments": [asdict(s) for s in self.segments],
+                "model": self.model, "escalated": self.escalated, "decode_s": self.decode_s}
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "Transcript":
+        segments = [Segment(**{**s, "words": [Word(**w) for w in s["words"]]}) for s in data["segments"]]
+        return cls(data["text"], segments, model=data["model"], escalated=data["escalated"],
+                   decode_s=data["decode_s"])
+
+    def _is_low(self, segment: Segment, word: Word, threshold: float) -> bool:
+        # A segment Whisper itself flags as a failed decode taints all its words
+        return word.probability < threshold or segment.avg_logprob < LOW_AVG_LOGPROB
+
+    def word_ranges(self) -> list[tuple[int, int]] | None:
+        """
+        Character range of every word within `text`.
+
+        Returns None when the words can't be aligned to the text.
+        """
+        ranges, pos = [], 0
+        for word in self.words:
+            token = word.text.strip()
+            if not token:
+                ranges.append((pos, pos))
+                continue
+            start = self.text.find(token, pos)
+            if start < 0:
+                return None
+            ranges.append((start, start + len(token)))
+            pos = start + len(token)
+        return ranges
+
+    def low_confidence_words(self, threshold: float) -> int:
+        """Number of words below `threshold` (or in a failed segment)."""
+        return sum(self._is_low(seg, w, threshold) for seg in self.segments for w in seg.words)
+
+    def is_confident(self, threshold: float) -> bool:
+        """True if Whisper was sure of every word, so correction can be skipped."""
+        return bool(self.words) and self.low_confidence_words(threshold) == 0
+
+    def low_confidence_spans(self, threshold: float, context_words: int = 2,
+                             include: list[tuple[int, int]] = ()) -> list[tuple[int, int]] | None:
+        """
+        Character ranges of `text` around low-confidence words.
+
+        Words overlapping an `include` range (e.g. a domain term the snapper
+        was unsure of) count as low-confidence too. Each such word is widened
+        by `context_words` words on both sides and overlapping or touching
+        ranges are merged. Returns None if word confidences are missing or
+        can't be aligned to the text.
+        """
+        ranges = self.word_ranges() if self.words else None
+        if ranges is None:
+            return None
+        flags = [self._is_low(seg, w, threshold) for seg in self.segments for w in seg.words]
+        for i, (start, end) in enumerate(ranges):
+            if any(a < end and b > start for a, b in include):
+                flags[i] = True
+        spans: list[tuple[int, int]] = []
+        for i, low in enumerate(flags):
+            if not low:
+                continue
+            first = max(0, i - context_words)
+            last = min(len(ranges) - 1, i + context_words)
+            start, end = ranges[first][0], ranges[last][1]
+            if spans and start <= spans[-1][1] + 1:
+                spans[-1] = (spans[-1][0], max(end, spans[-1][1]))
+            else:
+                spans.append((start, end))
+        return spans
+
+
+@dataclass
+class AsrStats:
+    """Running count of transcriptions, cascade escalations and decode time."""
+    requests: int = 0
+    escalated: int = 0
+    decode_s: float = 0.0
+    escalated_s: float = 0.0
+    _lock: threading.Lock = field(default_factory=threading.Lock, init=False, repr=False, compare=False)
+
+    def record(self, transcript: Transcript):
+        with self._lock:
+            self.requests += 1
+            self.decode_s += transcript.decode_s
+            if transcript.escalated:
+                self.escalated += 1
+                self.escalated_s += transcript.decode_s
+
+    @property
+    def escalation_rate(self) -> float:
+        return self.escalated / self.requests if self.requests else 0.0
+
+    @property
+    def avg_latency_s(self) -> float:
+        return self.decode_s / self.requests if self.requests else 0.0
+
+    @property
+    def avg_draft_latency_s(self) -> float:
+        """Average decode time when the draft was kept."""
+        kept = self.requests - self.escalated
+        return (self.decode_s - self.escalated_s) / kept if kept else 0.0
+
+
+def collect_transcript(segments, info=None) -> Transcript:
+    """Consume faster-whisper's segment generator into a Transcript."""
+    collected = []
+    for seg in segments:
+        words = [Word(w.word, w.start, w.end, w.probability) for w in (seg.words or [])]
+        collected.append(Segment(seg.text, seg.avg_logprob, seg.no_speech_prob,
+                                 seg.compression_ratio, words))
+    text = " ".join(seg.text for seg in collected).strip()
+    return Transcript(text, collected, info)
+
+
+def transcribe_detailed(model: WhisperModel, audio: AudioSegment | PreparedAudio | np.ndarray | str,
+                        **kwargs) -> Transcript:
+    """
+    Transcribe a recording without touching the filesystem.
+
+    Pass the PreparedAudio already used for playback to avoid normalizing
+    the recording a second time, and `word_timestamps=True` to get word
+    probabilities.
+    """
+    segments, info = model.transcribe(audio_to_float32(audio), **kwargs)
+    return collect_transcript(segments, info)
+
+
+def transcribe_with_profile(audio: AudioSegment | PreparedAudio | np.ndarray | str,
+                            profile: AsrProfile | None = None, bias: DecodingBias | None = None,
+                            stats: AsrStats | None = None) -> Transcript:
+    """
+    Transcribe with the cached model and decoding options of a profile.
+
+    With a cascade, the draft model decodes first and the profile's own
+    model only re-decodes when `CascadeSettings.should_escalate` says so.
+    The transcript records which model produced it; `stats` accumulates
+    escalations and latency.
+    """
+    profile = profile or AsrProfile()
+    start = time.perf_counter()
+    samples = audio_to_float32(audio)
+    draft_profile = profile.draft_profile
+    transcript = None
+    if draft_profile is not None:
+        transcript = transcribe_detailed(get_whisper_model(draft_profile), samples,
+                                         **draft_profile.transcribe_kwargs(bias))
+        transcript.model = draft_profile.model_size
+    escalated = transcript is not None and profile.cascade.should_escalate(transcript)
+    if transcript is None or escalated:
+        transcript = transcribe_detailed(get_whisper_model(profile), samples, **profile.transcribe_kwargs(bias))
+        transcript.model = profile.model_size
+        transcript.escalated = escalated
+    transcript.decode_s = time.perf_counter() - start
+    if stats is not None:
+        stats.record(transcript)
+    return transcript
+
+
+# Per-process ASR profile and vocabulary bias, set by the pool initializer
+_worker_profile: AsrProfile | None = None
+_worker_bias: DecodingBias | None = None
+
+
+def init_asr_worker(profile: AsrProfile, bias: DecodingBias | None):
+    """
+    ProcessPoolExecutor initializer for ASR worker processes.
+
+    Remembers the profile and bias for transcribe_in_worker and loads the
+    models up front (both for a cascade) so the first job isn't slower.
+    """
+    global _worker_profile, _worker_bias
+    _worker_profile, _worker_bias = profile, bias
+    if profile.draft_profile is not None:
+        get_whisper_model(profile.draft_profile)
+    get_whisper_model(profile)
+
+
+def transcribe_in_worker(audio: np.ndarray | str) -> Transcript:
+    """Transcribe in a pool worker with the profile and bias given to init_asr_worker."""
+    return transcribe_with_profile(audio, _worker_profile, _worker_bias)
@@ -0,0 +1,101 @@
+"""
+Vocabulary Bias Module
+
+Builds a per-agent decoding bias for Whisper from the agent's terms, so
+domain terms come out right at ASR time and the LLM correction call can be
+skipped. Terms are ranked by how often the knowledge base mentions them
+and how "proper" they look (kept capitalized in the knowledge base, mixed
+case, acronyms), then packed into a token budget and joined into a single
+string for `initial_prompt` or `hotwords`.
+"""
+
+import math
+import re
+from dataclasses import dataclass
+
+
+# Whisper keeps at most 223 prompt tokens; leave room for its own tokens
+DEFAULT_TOKEN_BUDGET = 150
+PROMPT_PREFIX = "Glossary:"
+
+
+def estimate_whisper_tokens(text: str) -> int:
+    """
+    Conservative token count for Whisper's BPE.
+
+    Domain terms are rarer than ordinary prose and split into more pieces,
+    so this assumes ~3 characters per token rather than the usual 4.
+    """
+    return max(1, math.ceil(len(text) / 3))
+
+
+def _occurrences(term: str, text: str, flags: int = 0) -> int:
+    return len(re.findall(r"(?<!\w)" + re.escape(term) + r"(?!\w)", text, flags))
+
+
+def term_score(term: str, knowledge: str) -> float:
+    """Rank value of one term; higher is more worth biasing towards."""
+    mentions = _occurrences(term, knowledge, re.IGNORECASE)
+    exact = _occurrences(term, knowledge)
+    if term == term.lower():
+        properness = 0.5
+    else:
+        # Proper terms keep their capitalization in the knowledge base;
+        # common words ("Database", "Schema") mostly appear lowercase
+        properness = (exact + 1) / (mentions + 1)
+    # Mixed case ("SnowSQL") and short acronyms ("QAS") are what Whisper
+    # gets wrong most; long all-caps words are ordinary words in capitals
+    shape = 1.5 if re.search(r"[a-z][A-Z]|\b[A-Z]{2,5}\b|\d", term) else 1.0
+    return (1 + math.log1p(mentions)) * properness * shape
+
+
+@dataclass(frozen=True)
+class DecodingBias:
+    """A precomputed ASR bias: the chosen terms and the string fed to Whisper."""
+    terms: tuple[str, ...] = ()
+    tokens: int = 0
+
+    @property
+    def text(self) -> str | None:
+        """Comma-separated terms, or None if there are none."""
+        return ", ".join(self.terms) if self.terms else None
+
+    @property
+    def initial_prompt(self) -> str | None:
+        return f"{PROMPT_PREFIX} {self.text}." if self.terms else None
+
+    @property
+    def hotwords(self) -> str | None:
+        return self.text
+
+    def __len__(self) -> int:
+        return len(self.terms)
+
+
+def build_bias(terms: list[str], knowledge: str = "",
+               token_budget: int = DEFAULT_TOKEN_BUDGET) -> DecodingBias:
+    """
+    Pick the highest-ranked terms that fit in `token_budget` Whisper tokens.
+
+    Terms are listed best first; a term that doesn't fit is skipped so
+    shorter, lower-ranked terms can still use the remaining budget.
+    """
+    seen = set()
+    ranked = []
+    for term in terms:
+        key = term.lower()
+        if term and key not in seen:
+            seen.add(key)
+            ranked.append((term_score(term, knowledge), term))
+    ranked.sort(key=lambda pair: (-pair[0], len(pair[1]), pair[1]))
+
+    chosen = []
+    used = estimate_whisper_tokens(PROMPT_PREFIX)
+    for _, term in ranked:
+        # ", " separator costs about one token
+        cost = estimate_whisper_tokens(term) + 1
+        if used + cost > token_budget:
+            continue
+        chosen.append(term)
+        used += cost
+    return DecodingBias(tuple(chosen), used if chosen else 0)